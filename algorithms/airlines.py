@@ -1,14 +1,46 @@
 import sys
-from typing import TypeVar
+from array import array
+from pathlib import Path
+from typing import Generator, Generic, Iterable, Optional, TypeVar
 
+from algorithms.deadline import Deadline
+from algorithms.dense import floyd_warshall_rows, has_numpy, is_dense
+from algorithms.parallel import run_batch
+from structures.m_disjoint_set import DisjointSet
+from structures.m_double_linked_list import DoubleLinkedList, DoubleNode
 from structures.m_entry import Destination, Entry
 from structures.m_extensible_list import ExtensibleList
-from structures.m_graph import Graph
+from structures.m_graph import Graph, stream_edges
+from structures.m_heap import BinaryHeap
+from structures.m_lru_cache import LRUCache
 from structures.m_map import Map
-from structures.m_pqueue import PriorityQueue
+from structures.m_stack import Stack
+from structures.m_util import TraversalFailure
 
 Datum = TypeVar("Datum")
 
+BUDGET_ENGINES: tuple[str, ...] = ("auto", "labels", "layered")
+"""Engines calculate_flight_budget can run: see iter_destinations and
+layered_destinations; "auto" picks one per query."""
+
+APSP_ENGINES: tuple[str, ...] = ("auto", "sssp", "floyd_warshall")
+"""Engines all_city_logistics can run: see distance_row and floyd_warshall_rows;
+"auto" picks one by density."""
+
+DEFAULT_ROW_BYTES: int = 64 << 20
+"""Byte budget of the rows held by a LazyCostMap by default."""
+
+UNBOUNDED_COST: int = -(1 << 63)
+"""Stands for TraversalFailure.NEGATIVE_CYCLE in the rows of a LazyCostMap."""
+
+LAYERED_MIN_STOPOVERS: int = 2
+"""Smallest stopover budget above zero for which "auto" considers the layered
+engine; with no stopovers at all it always picks it."""
+
+LAYERED_MIN_WORK: float = 8.0
+"""Smallest (stopover_budget + 1) * average degree for which "auto" picks the
+layered engine."""
+
 
 def has_cycles(graph: Graph[Datum]) -> bool:
     """
@@ -20,44 +52,59 @@ def has_cycles(graph: Graph[Datum]) -> bool:
     @returns: bool
         Whether or not the graph contains cycles
     """
-    graph_size = graph.get_num_nodes()
-    visited_nodes = ExtensibleList(graph_size)
+    return edges_have_cycle(graph.iter_edges(), graph.get_num_nodes())
 
-    for node in range(graph_size):
-        if not visited_nodes[node]:
-            if has_cycle_around(
-                graph,
-                node,
-                visited_nodes,
-                ExtensibleList(),
-            ):
-                return True
 
-    return False
+def file_has_cycles(path: Path) -> bool:
+    """
+    Cycle detection straight from a graph file (see Graph.from_file), streaming its
+    edges instead of building the graph.
 
+    @param: path
+        The graph file to process
 
-def has_cycle_around(
-    graph: Graph[Datum],
-    node: int,
-    visited_nodes: ExtensibleList,
-    visited_edges: ExtensibleList,
-    previous_node: int = None,
+    @returns: bool
+        Whether or not the graph contains cycles
+    """
+    return edges_have_cycle(stream_edges(path))
+
+
+def edges_have_cycle(
+    edges: Iterable[tuple[int, int, int]], graph_size: int = 0
 ) -> bool:
-    visited_nodes[node] = True
-
-    for neighbour in graph.get_neighbours(node):
-        neighbour = neighbour.get_id()
-        edge = (neighbour, node) if neighbour < node else (node, neighbour)
-
-        if edge not in visited_edges:
-            if not visited_nodes[neighbour]:
-                visited_edges.append(edge)
-                if has_cycle_around(
-                    graph, neighbour, visited_nodes, visited_edges, node
-                ):
-                    return True
-            elif neighbour != previous_node:
-                return True
+    """
+    Union-find cycle detection over the edges of an undirected graph, given as
+    (origin, target, weight) triples with every edge listed from both ends. Each
+    edge is taken once, from its end with the smaller ID, and the detection stops at
+    the first edge joining two nodes which are already connected. Self-loops are
+    cycles; parallel edges listed by the same origin consecutively count once.
+
+    @param: edges
+        The edges to process, e.g. Graph.iter_edges() or stream_edges(path)
+    @param: graph_size
+        The number of nodes, if known; the forest grows to fit otherwise
+
+    @returns: bool
+        Whether or not the edges contain a cycle
+    """
+    forest = DisjointSet(graph_size)
+    # The origin of the last edge taken to each target, to skip parallel edges
+    last_origins = ExtensibleList(graph_size)
+
+    for origin, target, _ in edges:
+        if origin == target:
+            return True
+        if origin > target:
+            continue
+        if target >= forest.get_size():
+            forest.extend(target + 1)
+            while last_origins.get_size() <= target:
+                last_origins.append(None)
+        if last_origins[target] == origin:
+            continue
+        last_origins[target] = origin
+        if not forest.union(origin, target):
+            return True
 
     return False
 
@@ -75,46 +122,26 @@ def enumerate_hubs(graph: Graph[Datum], min_degree: int) -> ExtensibleList:
         A list of all Node IDs corresponding to the largest subgraph
         where each vertex has a degree of at least min_degree.
     """
-    graph_size = graph.get_num_nodes()
-    degrees = ExtensibleList(graph_size)
-    deleted = ExtensibleList(graph_size)
-
-    for node in range(graph_size):
-        degrees[node] = len(graph.get_neighbours(node))
-
-    for node in range(graph_size):
-        if not deleted[node] and degrees[node] < min_degree:
-            delete_node(graph, min_degree, node, degrees, deleted)
+    # The min_degree-core is every node with a core number of min_degree or more;
+    # the core numbers are computed once per version of the graph
+    cores = graph.get_core_numbers()
 
     result = ExtensibleList()
-    for node in range(graph_size):
-        if not deleted[node]:
+    for node in range(graph.get_num_nodes()):
+        if cores[node] >= min_degree:
             result.append(node)
 
     return result
 
 
-def delete_node(
-    graph: Graph[Datum],
-    min_degree: int,
-    node: int,
-    degrees: ExtensibleList[int],
-    deleted: ExtensibleList[bool],
-):
-    deleted[node] = True
-    degrees[node] = None
-
-    for neighbour in graph.get_neighbours(node):
-        neighbour = neighbour.get_id()
-        if not deleted[neighbour]:
-            degrees[neighbour] -= 1
-            if degrees[neighbour] < min_degree:
-                delete_node(graph, min_degree, neighbour, degrees, deleted)
-
-
 def calculate_flight_budget(
-    graph: Graph[Datum], origin: int, stopover_budget: int, monetary_budget: int
-) -> ExtensibleList:
+    graph: Graph[Datum],
+    origin: int,
+    stopover_budget: int,
+    monetary_budget: int,
+    deadline: Optional[Deadline] = None,
+    engine: str = "auto",
+) -> ExtensibleList | tuple[ExtensibleList, bool]:
     """
     Task 3.3: Big Bogan Budget Bonanza
 
@@ -126,59 +153,337 @@ def calculate_flight_budget(
         The maximum number of stopovers the passenger is willing to make
     @param: monetary_budget
         The maximum amount of money the passenger is willing to spend
+    @param: deadline
+        If given, the search stops once the deadline expires and the result is a
+        (destinations, complete) pair. If complete is False, destinations holds the
+        candidates found so far; some may be missing, and with the layered engine
+        their costs may be too high. Every destination returned, complete or not,
+        is within both budgets.
+    @param: engine
+        One of BUDGET_ENGINES: "labels" for iter_destinations, "layered" for
+        layered_destinations, or "auto" to let choose_budget_engine pick.
 
     @returns: ExtensibleList
         The sorted list of viable destinations satisfying stopover and budget constraints.
         Each element of the ExtensibleList should be of type Destination - see
         m_entry.py for the definition of that type.
     """
-    graph_size = graph.get_num_nodes()
-    queue = PriorityQueue()
-    distances = ExtensibleList(graph_size)
+    if engine not in BUDGET_ENGINES:
+        raise ValueError(f"Unknown engine {engine}, expected one of {BUDGET_ENGINES}")
+    if engine == "auto":
+        engine = choose_budget_engine(graph, stopover_budget)
+    if engine == "layered":
+        results, complete = layered_destinations(
+            graph, origin, stopover_budget, monetary_budget, deadline
+        )
+        if deadline is not None:
+            return (results, complete)
+        return results
 
-    parents = Map()
+    destinations = iter_destinations(
+        graph, origin, stopover_budget, monetary_budget, deadline
+    )
+    results = ExtensibleList()
+    while True:
+        try:
+            results.append(next(destinations))
+        except StopIteration as finished:
+            complete = finished.value
+            break
 
-    queue.insert(0, origin)
+    if deadline is not None:
+        return (results, complete)
+    return results
 
-    for node in range(graph_size):
-        if node == origin:
-            distances[node] = Entry(node, 0)
-        else:
-            distances[node] = Entry(node, sys.maxsize)
+
+def iter_destinations(
+    graph: Graph[Datum],
+    origin: int,
+    stopover_budget: int,
+    monetary_budget: int,
+    deadline: Optional[Deadline] = None,
+    after: Optional[Destination] = None,
+) -> Generator[Destination, None, bool]:
+    """
+    Resource constrained shortest paths by label setting, see iter_pareto_labels.
+    The first label settled at a node is the cheapest route within the stopover
+    budget (the one with the fewest stopovers among equally cheap routes), so the
+    destinations come out already in sorted order.
+
+    @param: graph
+        The general graph to process
+    @param: origin
+        The origin from where the passenger wishes to fly
+    @param: stopover_budget
+        The maximum number of stopovers the passenger is willing to make
+    @param: monetary_budget
+        The maximum amount of money the passenger is willing to spend
+    @param: deadline
+        If given, checked every deadline.get_interval() labels settled
+    @param: after
+        If given, only destinations sorting after this one are yielded, e.g. the
+        last destination of a previous page
+
+    @returns: Generator[Destination, None, bool]
+        Yields every viable destination in sorted order. Once exhausted, the
+        generator returns True, or False if the deadline expired first.
+    """
+    labels = iter_pareto_labels(
+        graph, origin, stopover_budget, monetary_budget, deadline
+    )
+    reached = ExtensibleList(graph.get_num_nodes())
+    while True:
+        try:
+            money, stopovers, node = next(labels)
+        except StopIteration as finished:
+            return finished.value
+        if not reached[node]:
+            reached[node] = True
+            if after is None or after.get_triple() < (money, stopovers, node):
+                yield Destination(node, money, money, stopovers)
+
+
+def cheapest_destinations(
+    graph: Graph[Datum],
+    origin: int,
+    stopover_budget: int,
+    monetary_budget: int,
+    limit: int,
+    after: Optional[Destination] = None,
+    deadline: Optional[Deadline] = None,
+) -> ExtensibleList | tuple[ExtensibleList, bool]:
+    """
+    The first limit destinations calculate_flight_budget would return, found by
+    stopping the label setting search as soon as they are settled. Later pages
+    follow by passing the last destination of a page as after.
+
+    @param: graph
+        The general graph to process
+    @param: origin
+        The origin from where the passenger wishes to fly
+    @param: stopover_budget
+        The maximum number of stopovers the passenger is willing to make
+    @param: monetary_budget
+        The maximum amount of money the passenger is willing to spend
+    @param: limit
+        The maximum number of destinations to return
+    @param: after
+        If given, only destinations sorting after this one are returned
+    @param: deadline
+        If given, the search stops once the deadline expires and the result is a
+        (destinations, complete) pair, as for calculate_flight_budget
+
+    @returns: ExtensibleList
+        Up to limit viable destinations in sorted order
+    """
+    results = ExtensibleList()
+    complete = True
+    if limit > 0:
+        destinations = iter_destinations(
+            graph, origin, stopover_budget, monetary_budget, deadline, after
+        )
+        while results.get_size() < limit:
+            try:
+                results.append(next(destinations))
+            except StopIteration as finished:
+                complete = finished.value
+                break
+        destinations.close()
+
+    if deadline is not None:
+        return (results, complete)
+    return results
+
+
+def iter_pareto_labels(
+    graph: Graph[Datum],
+    origin: int,
+    stopover_budget: int = sys.maxsize,
+    monetary_budget: int = sys.maxsize,
+    deadline: Optional[Deadline] = None,
+) -> Generator[tuple[int, int, int], None, bool]:
+    """
+    Label setting over (money, stopovers). Each label is a route to a node;
+    labels are settled in lexicographic order of (money, stopovers, node), and a
+    label is discarded when a settled label at the same node is no more expensive
+    in both. Labels over either budget are never created, so the search stays
+    inside the budgets.
+
+    @param: graph
+        The general graph to process
+    @param: origin
+        The origin from where the passenger wishes to fly
+    @param: stopover_budget
+        The maximum number of stopovers of any label
+    @param: monetary_budget
+        The maximum cost of any label
+    @param: deadline
+        If given, checked every deadline.get_interval() labels settled
+
+    @returns: Generator[tuple[int, int, int], None, bool]
+        Yields the (money, stopovers, node) label of every Pareto-optimal route to
+        every node other than the origin, in lexicographic order. Once exhausted,
+        the generator returns True, or False if the deadline expired first.
+    """
+    graph_size = graph.get_num_nodes()
+    # The fewest stopovers of any label settled at each node so far. A route's
+    # stopovers are its flights minus one, so the origin's label has -1.
+    fewest_stopovers = ExtensibleList(graph_size)
+    queue = BinaryHeap()
+    queue.insert((0, -1, origin), (0, -1, origin))
+
+    # Labels left before the deadline is next checked; never reaches 0 without one
+    countdown = deadline.get_interval() if deadline is not None else -1
 
     while not queue.is_empty():
-        node = queue.remove_min()
+        countdown -= 1
+        if countdown == 0:
+            if deadline.expired():
+                return False
+            countdown = deadline.get_interval()
+
+        label = queue.remove_min()
+        money, stopovers, node = label
+        settled = fewest_stopovers[node]
+        if settled is not None and settled <= stopovers:
+            # Dominated by a label settled earlier: no cheaper, no fewer stopovers
+            continue
+        fewest_stopovers[node] = stopovers
+        if node != origin:
+            yield label
+
+        if stopovers + 1 > stopover_budget:
+            continue
         for neighbour, weight in graph.get_neighbours(node):
             neighbour = neighbour.get_id()
-            monetary_cost = distances[node].get_value() + weight
-            if monetary_cost < distances[neighbour].get_value():
-                distances[neighbour] = Entry(neighbour, monetary_cost)
-                queue.insert(monetary_cost, neighbour)
-                parents.insert_kv(neighbour, node)
+            label = (money + weight, stopovers + 1, neighbour)
+            if label[0] > monetary_budget:
+                continue
+            settled = fewest_stopovers[neighbour]
+            if settled is None or label[1] < settled:
+                queue.insert(label, label)
 
-    results = ExtensibleList()
-    for i in range(graph_size):
-        if i == origin:
-            continue
+    return True
 
-        monetary_cost = distances[i].get_value()
-        stopover_cost = 0
 
-        parent = parents[i]
+def choose_budget_engine(graph: Graph[Datum], stopover_budget: int) -> str:
+    """
+    Pick the faster engine for a budget query, going by the hub networks of
+    test_graph_algorithms.py --budget-benchmark. Without stopovers the layered
+    engine is a single sweep over the origin's flights, against a heap operation
+    per flight, and is up to 8 times faster. With one stopover the label engine
+    settles little more than the origin's neighbourhood and is 1.1 to 2 times
+    faster. Beyond that, each node tends to collect several Pareto labels, each
+    costing a heap operation, and the more so the higher the degree, while a layer
+    of the layered engine is a plain sweep over its frontier: it is about as fast
+    to 3 times faster.
+    """
+    graph_size = graph.get_num_nodes()
+    if graph_size == 0:
+        return "labels"
+    if stopover_budget == 0:
+        return "layered"
+    if stopover_budget < LAYERED_MIN_STOPOVERS:
+        return "labels"
+    average_degree = graph.get_num_edges() / graph_size
+    if (stopover_budget + 1) * average_degree >= LAYERED_MIN_WORK:
+        return "layered"
+    return "labels"
 
-        while parent != origin:
-            stopover_cost += 1
-            parent = parents[parent]
 
-        if stopover_cost <= stopover_budget and monetary_cost <= monetary_budget:
-            results.append(Destination(i, monetary_cost, monetary_cost, stopover_cost))
+def layered_destinations(
+    graph: Graph[Datum],
+    origin: int,
+    stopover_budget: int,
+    monetary_budget: int,
+    deadline: Optional[Deadline] = None,
+) -> tuple[ExtensibleList, bool]:
+    """
+    Hop-bounded Bellman-Ford: after layer h, costs[node] is the cheapest route to
+    node with at most h flights. Each layer only relaxes the edges out of the nodes
+    whose cost the previous layer lowered, reading the costs from before the layer
+    (previous) and writing the new ones (costs), so a layer never chains two of its
+    own relaxations. Only stopover_budget + 1 layers run.
 
-    results.sort()
+    @param: graph
+        The general graph to process
+    @param: origin
+        The origin from where the passenger wishes to fly
+    @param: stopover_budget
+        The maximum number of stopovers the passenger is willing to make
+    @param: monetary_budget
+        The maximum amount of money the passenger is willing to spend
+    @param: deadline
+        If given, checked every deadline.get_interval() frontier nodes
 
-    return results
+    @returns: tuple[ExtensibleList, bool]
+        1. The sorted list of viable destinations, as calculate_flight_budget;
+        2. False if the deadline expired before every layer was relaxed.
+    """
+    graph_size = graph.get_num_nodes()
+    # Cheapest cost with at most h - 1 flights, and with at most h flights
+    previous = ExtensibleList(graph_size)
+    costs = ExtensibleList(graph_size)
+    # Stopovers of the route behind each cost: the fewest among the cheapest
+    stopovers = ExtensibleList(graph_size)
+    # The layer in which each node's cost last changed
+    changed_in = ExtensibleList(graph_size)
+    previous[origin] = 0
+    costs[origin] = 0
+
+    frontier = ExtensibleList()
+    frontier.append(origin)
+    reached = ExtensibleList()
+    countdown = deadline.get_interval() if deadline is not None else -1
+    complete = True
 
+    for layer in range(1, stopover_budget + 2):
+        changed = ExtensibleList()
+        for i in range(frontier.get_size()):
+            countdown -= 1
+            if countdown == 0:
+                if deadline.expired():
+                    complete = False
+                    break
+                countdown = deadline.get_interval()
 
-def maintenance_optimisation(graph: Graph[Datum], origin: int) -> ExtensibleList:
+            node = frontier[i]
+            base = previous[node]
+            for neighbour, weight in graph.get_neighbours(node):
+                neighbour = neighbour.get_id()
+                cost = base + weight
+                if cost > monetary_budget:
+                    continue
+                if costs[neighbour] is None or cost < costs[neighbour]:
+                    if costs[neighbour] is None:
+                        reached.append(neighbour)
+                    costs[neighbour] = cost
+                    stopovers[neighbour] = layer - 1
+                    if changed_in[neighbour] != layer:
+                        changed_in[neighbour] = layer
+                        changed.append(neighbour)
+        for i in range(changed.get_size()):
+            previous[changed[i]] = costs[changed[i]]
+        if not complete or changed.is_empty():
+            break
+        frontier = changed
+
+    results = ExtensibleList()
+    for i in range(reached.get_size()):
+        node = reached[i]
+        if node != origin:
+            results.append(Destination(node, costs[node], costs[node], stopovers[node]))
+    results.sort()
+    return (results, complete)
+
+
+def maintenance_optimisation(
+    graph: Graph[Datum],
+    origin: int,
+    deadline: Optional[Deadline] = None,
+    targets: Optional[Iterable[int]] = None,
+    cutoff: Optional[int] = None,
+) -> ExtensibleList | tuple[ExtensibleList, bool]:
     """
     Task 3.4: BA Field Maintenance Optimisation
 
@@ -186,42 +491,656 @@ def maintenance_optimisation(graph: Graph[Datum], origin: int) -> ExtensibleList
         The general graph to process
     @param: origin
         The origin where the aircraft requiring maintenance is
+    @param: deadline
+        If given, the search stops once the deadline expires and the result is a
+        (distances, complete) pair. If complete is False, only the nodes settled
+        before the deadline have their true cost; every other node is left at
+        sys.maxsize, whether or not it can be reached.
+        If any edge weight is negative, the distances come from spfa_distances
+        instead, and may be TraversalFailure.NEGATIVE_CYCLE.
+    @param: targets
+        If given, only the distances to these nodes are needed; see
+        targeted_maintenance
+    @param: cutoff
+        If given, only distances up to this cost are needed; see
+        targeted_maintenance
 
     @returns: ExtensibleList
         The list of all reachable destinations with the shortest path costs.
         Please use the Entry type here, with the key being the node identifier,
-        and the value being the cost.
+        and the value being the cost. If targets or cutoff is given, the sparse
+        list of targeted_maintenance instead.
     """
+    if targets is not None or cutoff is not None:
+        return targeted_maintenance(graph, origin, targets, cutoff, deadline)
+    if graph.has_negative_weights():
+        return spfa_distances(graph, origin, deadline)
+
     graph_size = graph.get_num_nodes()
-    queue = PriorityQueue()
     distances = ExtensibleList(graph_size)
-
-    queue.insert(0, origin)
-
     for node in range(graph_size):
         if node == origin:
             distances[node] = Entry(node, 0)
         else:
             distances[node] = Entry(node, sys.maxsize)
 
+    complete = True
+    settled = iter_settled(graph, origin, deadline)
+    while True:
+        try:
+            node, distance = next(settled)
+        except StopIteration as finished:
+            complete = finished.value
+            break
+        distances[node] = Entry(node, distance)
+
+    if deadline is not None:
+        return (distances, complete)
+    return distances
+
+
+def targeted_maintenance(
+    graph: Graph[Datum],
+    origin: int,
+    targets: Optional[Iterable[int]] = None,
+    cutoff: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+) -> ExtensibleList | tuple[ExtensibleList, bool]:
+    """
+    Distances from origin to a set of maintenance bases. The search stops as soon
+    as every target is settled, or once the next node is further than cutoff, so
+    it only explores the part of the graph closer than the furthest base needed.
+    Targets outside the origin's (weakly) connected component can not be reached,
+    so they are not waited for.
+
+    @param: graph
+        The general graph to process
+    @param: origin
+        The origin where the aircraft requiring maintenance is
+    @param: targets
+        The nodes whose distances are needed, or None for every node. Raises a
+        ValueError if any is not a node ID.
+    @param: cutoff
+        If given, nodes further than this are left out
+    @param: deadline
+        If given, the search stops once the deadline expires and the result is a
+        (distances, complete) pair. If complete is False, some targets may be
+        missing.
+
+    @returns: ExtensibleList
+        An Entry(node, cost) for each target reachable within cutoff, in order of
+        increasing cost
+    """
+    if graph.has_negative_weights():
+        raise ValueError(
+            "Targeted search needs non-negative weights, use spfa_distances"
+        )
+    graph_size = graph.get_num_nodes()
+    wanted = None
+    remaining = graph_size
+    if targets is not None:
+        wanted = ExtensibleList(graph_size)
+        remaining = 0
+        for target in targets:
+            if target < 0 or target >= graph_size:
+                raise ValueError(f"No node has ID {target} but it is a target.")
+            if not wanted[target]:
+                wanted[target] = True
+                if graph.same_component(origin, target):
+                    remaining += 1
+
+    results = ExtensibleList()
+    complete = True
+    settled = iter_settled(graph, origin, deadline)
+    while remaining > 0:
+        try:
+            node, distance = next(settled)
+        except StopIteration as finished:
+            complete = finished.value
+            break
+        if cutoff is not None and distance > cutoff:
+            break
+        if wanted is None or wanted[node]:
+            results.append(Entry(node, distance))
+            remaining -= 1
+    settled.close()
+
+    if deadline is not None:
+        return (results, complete)
+    return results
+
+
+def iter_settled(
+    graph: Graph[Datum],
+    origin: int,
+    deadline: Optional[Deadline] = None,
+    potentials: Optional[ExtensibleList[int]] = None,
+    excluded: Optional[ExtensibleList[bool]] = None,
+) -> Generator[tuple[int, int], None, bool]:
+    """
+    Dijkstra's algorithm with lazy deletion: a node is queued again whenever its
+    distance improves, and the stale entries left behind are skipped when popped
+    rather than expanded again.
+
+    @param: graph
+        The general graph to process, with non-negative edge weights
+    @param: origin
+        The node to measure distances from
+    @param: deadline
+        If given, checked every deadline.get_interval() nodes popped
+    @param: potentials
+        If given, each edge (u, v) costs its weight plus potentials[u] minus
+        potentials[v] during the search, which must make every cost non-negative
+        (see JohnsonReweighting); the distances yielded are the real ones
+    @param: excluded
+        If given, marks nodes the search must not enter
+
+    @returns: Generator[tuple[int, int], None, bool]
+        Yields (node, distance) for every node reachable from origin, including
+        origin itself, in order of increasing distance. Once exhausted, the
+        generator returns True, or False if the deadline expired first.
+    """
+    distances = ExtensibleList(graph.get_num_nodes())
+    done = ExtensibleList(graph.get_num_nodes())
+    queue = BinaryHeap()
+    distances[origin] = 0
+    queue.insert(0, origin)
+
+    # Pops left before the deadline is next checked; never reaches 0 without one
+    countdown = deadline.get_interval() if deadline is not None else -1
+
     while not queue.is_empty():
+        countdown -= 1
+        if countdown == 0:
+            if deadline.expired():
+                return False
+            countdown = deadline.get_interval()
+
         node = queue.remove_min()
+        if done[node]:
+            # Stale entry: the node was settled by an earlier, shorter entry
+            continue
+        done[node] = True
+        distance = distances[node]
+        if potentials is None:
+            yield (node, distance)
+        else:
+            yield (node, distance - potentials[origin] + potentials[node])
+
         for neighbour, weight in graph.get_neighbours(node):
             neighbour = neighbour.get_id()
-            distance = distances[node].get_value() + weight
-            if distance < distances[neighbour].get_value():
-                distances[neighbour] = Entry(neighbour, distance)
-                queue.insert(distance, neighbour)
+            if excluded is not None and excluded[neighbour]:
+                continue
+            if potentials is not None:
+                weight += potentials[node] - potentials[neighbour]
+            candidate = distance + weight
+            if distances[neighbour] is None or candidate < distances[neighbour]:
+                distances[neighbour] = candidate
+                queue.insert(candidate, neighbour)
+
+    return True
+
+
+def spfa_distances(
+    graph: Graph[Datum], origin: int, deadline: Optional[Deadline] = None
+) -> ExtensibleList | tuple[ExtensibleList, bool]:
+    """
+    Shortest path costs from origin with negative edge weights allowed, by the
+    queue-based Bellman-Ford algorithm (SPFA), see run_spfa.
+
+    @param: graph
+        The general graph to process
+    @param: origin
+        The node to measure distances from
+    @param: deadline
+        If given, the search stops once the deadline expires and the result is a
+        (distances, complete) pair. If complete is False, the distances are upper
+        bounds on the shortest path costs and negative cycles may have been missed.
+
+    @returns: ExtensibleList
+        An Entry(node, cost) for every node, as for maintenance_optimisation. The
+        cost is sys.maxsize for nodes which can not be reached, and
+        TraversalFailure.NEGATIVE_CYCLE for nodes reachable through a negative
+        cycle, whose cost is unbounded below.
+    """
+    graph_size = graph.get_num_nodes()
+    poisoned = ExtensibleList(graph_size)
+    distances, complete = run_spfa(graph, (origin,), poisoned, deadline=deadline)
 
+    for node in range(graph_size):
+        if poisoned[node]:
+            distances[node] = Entry(node, TraversalFailure.NEGATIVE_CYCLE)
+        elif distances[node] is None:
+            distances[node] = Entry(node, sys.maxsize)
+        else:
+            distances[node] = Entry(node, distances[node])
+
+    if deadline is not None:
+        return (distances, complete)
     return distances
 
 
-def all_city_logistics(graph: Graph[Datum]) -> Map:
+def run_spfa(
+    graph: Graph[Datum],
+    origins: Iterable[int],
+    poisoned: ExtensibleList[bool],
+    components: Optional[ExtensibleList[int]] = None,
+    deadline: Optional[Deadline] = None,
+) -> tuple[ExtensibleList[Optional[int]], bool]:
+    """
+    Queue-based Bellman-Ford (SPFA) from one or more origins, each starting at
+    distance 0, with negative cycle detection.
+
+    A node is queued whenever its distance improves. With the small label first
+    heuristic, it joins the front of the queue rather than the back if its distance
+    is below that of the node at the front. The shortest path tree (rooted at a
+    virtual node with an edge to each origin) is kept as a list of nodes in
+    preorder with their depths, so a node's subtree is the run of deeper nodes
+    following it. When a node's distance improves, its subtree is taken out of the
+    tree (subtree disassembly): its nodes' distances are based on the old one, so
+    scanning them before they improve again would be wasted work. If the node
+    whose scan made the improvement is in that subtree, the tree edges from the
+    improved node to it plus the scanned edge form a negative cycle. Everything
+    reachable from the cycle is then poisoned and left out, and the search carries
+    on without it: no shortest path to a node outside it can pass through it.
+
+    @param: graph
+        The general graph to process
+    @param: origins
+        The nodes to measure distances from
+    @param: poisoned
+        Marks nodes reachable through a negative cycle; updated in place. Nodes
+        already marked are left out of the search entirely.
+    @param: components
+        If given, only edges between nodes with the same label are followed, both
+        when searching and when poisoning
+    @param: deadline
+        If given, checked every deadline.get_interval() nodes scanned
+
+    @returns: tuple[ExtensibleList[Optional[int]], bool]
+        The distance of every node from the nearest origin, None where unreachable
+        (meaningless for poisoned nodes), and whether the search finished before
+        the deadline expired.
+    """
+    graph_size = graph.get_num_nodes()
+    root = graph_size
+    distances = ExtensibleList(graph_size)
+    # The shortest path tree in preorder, as a circular doubly linked list through
+    # after and before starting at the root; depth is None for nodes outside it
+    after = ExtensibleList(graph_size + 1)
+    before = ExtensibleList(graph_size + 1)
+    depth = ExtensibleList(graph_size + 1)
+    queued = ExtensibleList(graph_size)
+    queue = DoubleLinkedList()
+
+    after[root] = before[root] = root
+    depth[root] = 0
+    last = root
+    for origin in origins:
+        if poisoned[origin] or depth[origin] is not None:
+            continue
+        distances[origin] = 0
+        depth[origin] = 1
+        after[last] = origin
+        before[origin] = last
+        last = origin
+        queued[origin] = True
+        queue.insert_to_back(DoubleNode(origin))
+    after[last] = root
+    before[root] = last
+
+    # Scans left before the deadline is next checked; never reaches 0 without one
+    countdown = deadline.get_interval() if deadline is not None else -1
+
+    while queue.get_size() > 0:
+        countdown -= 1
+        if countdown == 0:
+            if deadline.expired():
+                return (distances, False)
+            countdown = deadline.get_interval()
+
+        node = queue.remove_from_front().get_data()
+        queued[node] = False
+        if depth[node] is None:
+            # Disassembled or poisoned since it was queued
+            continue
+
+        for neighbour, weight in graph.get_neighbours(node):
+            neighbour = neighbour.get_id()
+            if poisoned[neighbour]:
+                continue
+            if components is not None and components[neighbour] != components[node]:
+                continue
+            candidate = distances[node] + weight
+            if distances[neighbour] is not None and candidate >= distances[neighbour]:
+                continue
+
+            if depth[neighbour] is not None:
+                # Find the end of the subtree of neighbour, checking whether it
+                # contains node
+                level = depth[neighbour]
+                cycle = neighbour == node
+                end = after[neighbour]
+                while not cycle and depth[end] > level:
+                    cycle = end == node
+                    end = after[end]
+                if cycle:
+                    # node is now poisoned along with the rest of the subtree
+                    newly_poisoned = poison_reachable(
+                        graph, neighbour, poisoned, components
+                    )
+                    for i in range(newly_poisoned.get_size()):
+                        poisoned_node = newly_poisoned[i]
+                        if depth[poisoned_node] is not None:
+                            after[before[poisoned_node]] = after[poisoned_node]
+                            before[after[poisoned_node]] = before[poisoned_node]
+                            depth[poisoned_node] = None
+                    break
+
+                # Take the subtree out of the tree
+                descendant = after[neighbour]
+                while descendant != end:
+                    depth[descendant] = None
+                    descendant = after[descendant]
+                after[before[neighbour]] = end
+                before[end] = before[neighbour]
+
+            distances[neighbour] = candidate
+            depth[neighbour] = depth[node] + 1
+            after[neighbour] = after[node]
+            before[after[node]] = neighbour
+            after[node] = neighbour
+            before[neighbour] = node
+            if not queued[neighbour]:
+                queued[neighbour] = True
+                front = queue.get_head()
+                if front is not None and candidate < distances[front.get_data()]:
+                    queue.insert_to_front(DoubleNode(neighbour))
+                else:
+                    queue.insert_to_back(DoubleNode(neighbour))
+
+    return (distances, True)
+
+
+def poison_reachable(
+    graph: Graph[Datum],
+    source: int,
+    poisoned: ExtensibleList[bool],
+    components: Optional[ExtensibleList[int]] = None,
+) -> ExtensibleList[int]:
+    """
+    Marks every node reachable from source, including source, as poisoned and
+    returns the nodes which were not poisoned already. If components is given, only
+    edges between nodes with the same label are followed.
+    """
+    newly_poisoned = ExtensibleList()
+    if poisoned[source]:
+        return newly_poisoned
+    poisoned[source] = True
+    stack = Stack()
+    stack.push(source)
+    while not stack.is_empty():
+        node = stack.pop()
+        newly_poisoned.append(node)
+        for neighbour in graph.get_neighbour_ids(node):
+            if components is not None and components[neighbour] != components[node]:
+                continue
+            if not poisoned[neighbour]:
+                poisoned[neighbour] = True
+                stack.push(neighbour)
+    return newly_poisoned
+
+
+class JohnsonReweighting(Generic[Datum]):
+    """
+    Johnson's algorithm for all pairs shortest paths with negative edge weights:
+    one Bellman-Ford search finds a potential h for every node such that
+    w(u, v) + h(u) - h(v) >= 0 for every edge, after which each origin needs only
+    Dijkstra's algorithm on these reweighted edges. A path's reweighted cost is its
+    real cost plus h(origin) - h(target), so the real distances are recovered.
+
+    Negative cycles are found first: a strongly connected component contains one
+    exactly when run_spfa confined to the component's own edges detects it, and
+    then every node of the component reaches and is reached from that cycle. The
+    potentials are computed with these cyclic nodes left out. Paths through them
+    are handled separately: a target is TraversalFailure.NEGATIVE_CYCLE for an
+    origin exactly when some cyclic node lies between them.
+    """
+
+    def __init__(self, graph: Graph[Datum]) -> None:
+        self._graph = graph
+        graph_size = graph.get_num_nodes()
+        everything = range(graph_size)
+
+        self._cyclic = ExtensibleList(graph_size)
+        run_spfa(graph, everything, self._cyclic, graph.get_strong_component_index())
+        self._num_cyclic = 0
+        for node in everything:
+            if self._cyclic[node]:
+                self._num_cyclic += 1
+
+        # No negative cycle is left once the cyclic nodes are left out
+        excluded = self._cyclic.copy(0, graph_size)
+        self._potentials, _ = run_spfa(graph, everything, excluded)
+
+        # The nodes which can reach a cyclic node, found by searching backwards
+        self._upstream = ExtensibleList(graph_size)
+        if self._num_cyclic > 0:
+            reverse = ExtensibleList(graph_size)
+            for node in everything:
+                reverse[node] = ExtensibleList()
+            for origin, target, _ in graph.iter_edges():
+                reverse[target].append(origin)
+            stack = Stack()
+            for node in everything:
+                if self._cyclic[node]:
+                    self._upstream[node] = True
+                    stack.push(node)
+            while not stack.is_empty():
+                node = stack.pop()
+                predecessors = reverse[node]
+                for i in range(predecessors.get_size()):
+                    if not self._upstream[predecessors[i]]:
+                        self._upstream[predecessors[i]] = True
+                        stack.push(predecessors[i])
+
+    def get_potentials(self) -> ExtensibleList[Optional[int]]:
+        """
+        Returns the potential of every node, None for the cyclic nodes.
+        """
+        return self._potentials
+
+    def get_num_cyclic(self) -> int:
+        """
+        Returns the number of nodes in strongly connected components with a
+        negative cycle.
+        """
+        return self._num_cyclic
+
+    def distance_row(self, origin: int) -> ExtensibleList:
+        """
+        Returns the shortest path cost from origin to every node as for
+        distance_row: sys.maxsize for nodes which can not be reached and
+        TraversalFailure.NEGATIVE_CYCLE for nodes reachable through a negative cycle.
+        """
+        graph = self._graph
+        graph_size = graph.get_num_nodes()
+        row = ExtensibleList(graph_size)
+        for node in range(graph_size):
+            row[node] = sys.maxsize
+
+        if not self._cyclic[origin]:
+            settled = iter_settled(
+                graph, origin, potentials=self._potentials, excluded=self._cyclic
+            )
+            for node, distance in settled:
+                row[node] = distance
+        if not self._upstream[origin]:
+            return row
+
+        # Every node reachable from a cyclic node reachable from origin
+        reached = ExtensibleList(graph_size)
+        unbounded = ExtensibleList(graph_size)
+        reached[origin] = True
+        stack = Stack()
+        stack.push(origin)
+        sources = Stack()
+        while not stack.is_empty():
+            node = stack.pop()
+            if self._cyclic[node]:
+                unbounded[node] = True
+                sources.push(node)
+                continue
+            for neighbour in graph.get_neighbour_ids(node):
+                if not reached[neighbour]:
+                    reached[neighbour] = True
+                    stack.push(neighbour)
+        while not sources.is_empty():
+            node = sources.pop()
+            row[node] = TraversalFailure.NEGATIVE_CYCLE
+            for neighbour in graph.get_neighbour_ids(node):
+                if not unbounded[neighbour]:
+                    unbounded[neighbour] = True
+                    sources.push(neighbour)
+        return row
+
+
+def get_reweighting(graph: Graph[Datum]) -> JohnsonReweighting[Datum]:
+    """
+    Returns the JohnsonReweighting of graph, cached on the graph until it changes.
+    Computing it before run_batch starts the pool lets the workers receive it with
+    the graph rather than recompute it.
+    """
+    return graph.get_derived("johnson", JohnsonReweighting)
+
+
+class LazyCostMap(Generic[Datum]):
+    """
+    A read-only stand-in for the Map returned by all_city_logistics which computes
+    nothing up front. Looking up "a_b" computes the distance row of a with
+    distance_row on first access, stores it as a compact array of 64-bit integers
+    and keeps it in an LRUCache bounded by a byte budget, so memory follows the
+    origins being queried rather than growing with the square of the graph size.
+    The rows are dropped whenever the graph changes.
+    """
+
+    def __init__(
+        self, graph: Graph[Datum], max_bytes: Optional[int] = DEFAULT_ROW_BYTES
+    ) -> None:
+        """
+        @param: graph
+            The general graph to process
+        @param: max_bytes
+            The most bytes of rows to hold at once, or None for no limit
+        """
+        self._graph = graph
+        self._rows = LRUCache(max_bytes=max_bytes, sizer=sys.getsizeof)
+        self._version = graph.get_version()
+
+    def get_row(self, origin: int) -> array:
+        """
+        Returns the encoded distance row of origin, computing it if it is not held:
+        sys.maxsize for targets which can not be reached and UNBOUNDED_COST for
+        targets reachable through a negative cycle.
+        """
+        if self._version != self._graph.get_version():
+            self._rows.clear()
+            self._version = self._graph.get_version()
+        row = self._rows.find(origin)
+        if row is None:
+            costs = distance_row(self._graph, origin)
+            row = array("q", bytes(8 * costs.get_size()))
+            for target in range(costs.get_size()):
+                cost = costs[target]
+                if cost == TraversalFailure.NEGATIVE_CYCLE:
+                    cost = UNBOUNDED_COST
+                row[target] = cost
+            self._rows.insert_kv(origin, row)
+        return row
+
+    def find(self, key: str) -> Optional[int | TraversalFailure]:
+        """
+        Returns the cost of the pair named by an "a_b" key, as all_city_logistics
+        would store it; None if the key names no pair of nodes.
+        """
+        if not isinstance(key, str):
+            return None
+        origin, separator, target = key.partition("_")
+        if separator != "_" or not origin.isdecimal() or not target.isdecimal():
+            return None
+        origin = int(origin)
+        target = int(target)
+        graph_size = self._graph.get_num_nodes()
+        if origin >= graph_size or target >= graph_size:
+            return None
+
+        cost = self.get_row(origin)[target]
+        if cost == sys.maxsize:
+            return TraversalFailure.DISCONNECTED
+        if cost == UNBOUNDED_COST:
+            return TraversalFailure.NEGATIVE_CYCLE
+        return cost
+
+    def __getitem__(self, key: str) -> Optional[int | TraversalFailure]:
+        """
+        Alternative for find.
+        """
+        return self.find(key)
+
+    def get_size(self) -> int:
+        """
+        Returns the number of pairs the map answers for.
+        """
+        return self._graph.get_num_nodes() ** 2
+
+    def is_empty(self) -> bool:
+        return self._graph.get_num_nodes() == 0
+
+    def get_num_rows(self) -> int:
+        return self._rows.get_size()
+
+    def get_bytes(self) -> int:
+        return self._rows.get_bytes()
+
+    def get_hits(self) -> int:
+        return self._rows.get_hits()
+
+    def get_misses(self) -> int:
+        return self._rows.get_misses()
+
+    def get_evictions(self) -> int:
+        return self._rows.get_evictions()
+
+
+def all_city_logistics(
+    graph: Graph[Datum],
+    workers: Optional[int] = None,
+    engine: str = "auto",
+    lazy: bool = False,
+    start_method: Optional[str] = None,
+) -> Map | LazyCostMap:
     """
     Task 3.5: All City Logistics
 
+    With the "sssp" engine, one single source search per node, run across a pool
+    of worker processes by run_batch: Dijkstra's algorithm, or Johnson's algorithm
+    (see JohnsonReweighting) if any edge weight is negative. The graph reaches
+    each worker once when the pool starts, and each task returns one distance row
+    which is then spread across the map here. With the "floyd_warshall" engine,
+    the rows come from floyd_warshall_rows instead, which needs numpy.
+
     @param: graph
         The general graph to process
+    @param: workers
+        The number of worker processes; defaults to the number of CPUs
+    @param: engine
+        One of APSP_ENGINES; "auto" picks "floyd_warshall" for dense graphs (see
+        is_dense) if numpy is installed, and "sssp" otherwise
+    @param: lazy
+        If True, a LazyCostMap is returned instead, which computes each origin's
+        row on first lookup; workers and engine are then ignored
+    @param: start_method
+        The start method of the worker processes, see BatchRunner
 
     @returns: Map
         The map containing node pairs as keys and the cost of the shortest path
@@ -231,5 +1150,54 @@ def all_city_logistics(graph: Graph[Datum]) -> Map:
         value should be an integer (cost of the path), or a TraversalFailure
         enumeration.
     """
+    if engine not in APSP_ENGINES:
+        raise ValueError(f"Unknown engine {engine}, expected one of {APSP_ENGINES}")
+    if lazy:
+        return LazyCostMap(graph)
+    if engine == "auto":
+        engine = "floyd_warshall" if has_numpy() and is_dense(graph) else "sssp"
+
+    graph_size = graph.get_num_nodes()
+    if engine == "floyd_warshall":
+        rows = floyd_warshall_rows(graph)
+    else:
+        if graph.has_negative_weights():
+            # Before the pool starts, so that the workers receive it with the graph
+            get_reweighting(graph)
+        rows = run_batch(
+            graph,
+            distance_row,
+            [(origin,) for origin in range(graph_size)],
+            workers,
+            start_method=start_method,
+        )
+
+    costs = Map()
+    for origin in range(graph_size):
+        row = rows[origin]
+        for target in range(graph_size):
+            cost = row[target]
+            if cost == sys.maxsize:
+                cost = TraversalFailure.DISCONNECTED
+            costs.insert_kv(f"{origin}_{target}", cost)
+    return costs
+
+
+def distance_row(graph: Graph[Datum], origin: int) -> ExtensibleList[int]:
+    """
+    Returns the shortest path cost from origin to every node, indexed by node ID,
+    with sys.maxsize for nodes which can not be reached. With negative weights the
+    row comes from the graph's JohnsonReweighting instead, and may hold
+    TraversalFailure.NEGATIVE_CYCLE. Module-level so that worker processes can run
+    it.
+    """
+    if graph.has_negative_weights():
+        return get_reweighting(graph).distance_row(origin)
 
-    pass
+    row = ExtensibleList(graph.get_num_nodes())
+    for node in range(graph.get_num_nodes()):
+        row[node] = sys.maxsize
+    settled = iter_settled(graph, origin)
+    for node, distance in settled:
+        row[node] = distance
+    return row
@@ -0,0 +1,207 @@
+from typing import Generic, Optional, TypeVar
+
+from algorithms.airlines import iter_destinations, iter_pareto_labels
+from structures.m_entry import Destination
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import Graph
+from structures.m_lru_cache import LRUCache
+
+Datum = TypeVar("Datum")
+
+DEFAULT_MAX_ORIGINS: int = 64
+"""Number of per-origin frontiers held by a FlightBudgetPlanner by default."""
+
+
+class BudgetFrontier(Generic[Datum]):
+    """
+    Every Pareto-optimal (money, stopovers) route from one origin to every other
+    node, found with a single unbounded run of iter_pareto_labels and kept in
+    lexicographic order.
+
+    For a given stopover budget, the answer to calculate_flight_budget is the first
+    label of each node with few enough stopovers; those answers are sorted already,
+    so a monetary budget just cuts the list short. The list for each stopover
+    budget is built the first time it is asked for and kept.
+    """
+
+    def __init__(self, graph: Graph[Datum], origin: int) -> None:
+        self._graph_size = graph.get_num_nodes()
+        self._origin = origin
+        self._labels = ExtensibleList()
+        self._max_stopovers = -1
+        labels = iter_pareto_labels(graph, origin)
+        for label in labels:
+            self._labels.append(label)
+            self._max_stopovers = max(self._max_stopovers, label[1])
+        # Destinations sorted by (money, stopovers, key) for each stopover budget
+        self._answers = ExtensibleList(self._max_stopovers + 1)
+
+    def get_origin(self) -> int:
+        return self._origin
+
+    def get_num_labels(self) -> int:
+        return self._labels.get_size()
+
+    def get_max_stopovers(self) -> int:
+        """
+        Returns the most stopovers any Pareto-optimal route makes; larger stopover
+        budgets all have the same answer.
+        """
+        return self._max_stopovers
+
+    def __answers(self, stopover_budget: int) -> ExtensibleList[Destination]:
+        answers = self._answers[stopover_budget]
+        if answers is None:
+            answers = ExtensibleList()
+            reached = ExtensibleList(self._graph_size)
+            for i in range(self._labels.get_size()):
+                money, stopovers, node = self._labels[i]
+                if stopovers <= stopover_budget and not reached[node]:
+                    reached[node] = True
+                    answers.append(Destination(node, money, money, stopovers))
+            self._answers[stopover_budget] = answers
+        return answers
+
+    def query(self, stopover_budget: int, monetary_budget: int) -> ExtensibleList:
+        """
+        Returns the same destinations as calculate_flight_budget with these budgets,
+        in O(output) once the stopover budget's list exists. The Destinations are
+        shared between queries and must not be mutated.
+        """
+        results = ExtensibleList()
+        if stopover_budget < 0 or self._max_stopovers < 0:
+            return results
+        answers = self.__answers(min(stopover_budget, self._max_stopovers))
+
+        # Binary search for the first destination over the monetary budget
+        low, high = 0, answers.get_size()
+        while low < high:
+            mid = (low + high) // 2
+            if answers[mid].get_cost_money() <= monetary_budget:
+                low = mid + 1
+            else:
+                high = mid
+        for i in range(low):
+            results.append(answers[i])
+        return results
+
+
+class FlightBudgetPlanner(Generic[Datum]):
+    """
+    Answers many calculate_flight_budget queries over one graph. The frontier of
+    each origin is computed on its first query and held in an LRUCache, so further
+    budgets for a recently queried origin skip the search entirely. The cache is
+    emptied whenever the graph changes.
+    """
+
+    def __init__(
+        self, graph: Graph[Datum], max_origins: Optional[int] = DEFAULT_MAX_ORIGINS
+    ) -> None:
+        """
+        @param: graph
+            The general graph to process
+        @param: max_origins
+            The number of origins whose frontier is held, or None for no limit
+        """
+        self._graph = graph
+        self._frontiers = LRUCache(max_origins)
+        self._version = graph.get_version()
+
+    def get_frontier(self, origin: int) -> BudgetFrontier[Datum]:
+        """
+        Returns the frontier of origin, computing it if it is not cached.
+        """
+        if self._version != self._graph.get_version():
+            self._frontiers.clear()
+            self._version = self._graph.get_version()
+        frontier = self._frontiers.find(origin)
+        if frontier is None:
+            frontier = BudgetFrontier(self._graph, origin)
+            self._frontiers.insert_kv(origin, frontier)
+        return frontier
+
+    def query(
+        self, origin: int, stopover_budget: int, monetary_budget: int
+    ) -> ExtensibleList:
+        """
+        Returns the same destinations as calculate_flight_budget(graph, origin,
+        stopover_budget, monetary_budget).
+        """
+        return self.get_frontier(origin).query(stopover_budget, monetary_budget)
+
+    def get_hits(self) -> int:
+        return self._frontiers.get_hits()
+
+    def get_misses(self) -> int:
+        return self._frontiers.get_misses()
+
+    def get_evictions(self) -> int:
+        return self._frontiers.get_evictions()
+
+
+class DestinationCursor(Generic[Datum]):
+    """
+    Pages through the destinations calculate_flight_budget would return, in the
+    same order, by keeping one iter_destinations search suspended between pages.
+    Each page only settles the labels it needs.
+
+    The pages are only consistent while the graph is unchanged: once it changes,
+    destinations already returned may have moved past the last one or disappeared,
+    and unreturned ones may now sort before it. The cursor is then stale and
+    next_page raises a ValueError; to carry on regardless, pass get_last() as after
+    to cheapest_destinations, or start a new cursor.
+    """
+
+    def __init__(
+        self,
+        graph: Graph[Datum],
+        origin: int,
+        stopover_budget: int,
+        monetary_budget: int,
+    ) -> None:
+        self._graph = graph
+        self._origin = origin
+        self._last = None
+        self._exhausted = False
+        self._destinations = iter_destinations(
+            graph, origin, stopover_budget, monetary_budget
+        )
+        self._version = graph.get_version()
+
+    def next_page(self, size: int) -> ExtensibleList:
+        """
+        Returns the next size destinations, or fewer once the search runs out.
+        Raises a ValueError if the graph changed since the cursor was created.
+        """
+        if self.is_stale():
+            raise ValueError(
+                f"The graph changed since the cursor from {self._origin} was created"
+            )
+        page = ExtensibleList()
+        if self._exhausted:
+            return page
+        while page.get_size() < size:
+            try:
+                page.append(next(self._destinations))
+            except StopIteration:
+                self._exhausted = True
+                break
+        if not page.is_empty():
+            self._last = page[page.get_size() - 1]
+        return page
+
+    def get_last(self) -> Optional[Destination]:
+        """
+        Returns the last destination returned, which cheapest_destinations accepts
+        as after to resume from the same point without this cursor.
+        """
+        return self._last
+
+    def is_exhausted(self) -> bool:
+        return self._exhausted
+
+    def is_stale(self) -> bool:
+        """
+        Returns whether the graph changed since the cursor was created.
+        """
+        return self._version != self._graph.get_version()
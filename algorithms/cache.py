@@ -0,0 +1,131 @@
+import sys
+from typing import Callable, Optional, TypeVar
+
+from structures.m_entry import Entry
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import Graph, LatticeGraph
+from structures.m_lru_cache import LRUCache
+from structures.m_map import Map
+
+Datum = TypeVar("Datum")
+
+DEFAULT_MAX_ENTRIES: int = 1024
+"""Number of results held by a QueryCache when no budget is given."""
+
+# Returned by LRUCache.find on a miss, so that cached None results are still hits
+_MISSING = object()
+
+
+def estimate_size(value) -> int:
+    """
+    Estimate the number of bytes held by a query result: tuples, ExtensibleLists and
+    Entries are walked, anything else is measured with sys.getsizeof.
+    """
+    if isinstance(value, tuple):
+        size = sys.getsizeof(value)
+        for item in value:
+            size += estimate_size(item)
+        return size
+    if isinstance(value, ExtensibleList):
+        size = sys.getsizeof(value) + sys.getsizeof(value._data)
+        for i in range(value.get_size()):
+            size += estimate_size(value[i])
+        return size
+    if isinstance(value, Entry):
+        return (
+            sys.getsizeof(value)
+            + estimate_size(value.get_key())
+            + estimate_size(value.get_value())
+        )
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """
+    Memoises the entry points of algorithms/pathfinding.py and algorithms/airlines.py.
+
+    Results are keyed on (algorithm, graph uid, graph version, arguments) and held in
+    an LRUCache bounded by an entry and/or byte budget. Whenever a graph is seen with
+    a newer version than before, every result computed on the older version is
+    dropped. Cached results are shared between callers and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        """
+        @param: max_entries
+            The maximum number of results to hold, or None for no entry limit.
+        @param: max_bytes
+            The maximum estimated size of the held results, or None for no limit.
+        """
+        self._results = LRUCache(
+            max_entries, max_bytes, estimate_size if max_bytes is not None else None
+        )
+        # Maps graph uid to the version the cached results were computed on
+        self._versions = Map()
+        self._invalidations = 0
+
+    def query(
+        self,
+        algorithm: Callable,
+        graph: Graph[Datum] | LatticeGraph[Datum],
+        *args,
+    ):
+        """
+        Return algorithm(graph, *args), computing it only if the same query has not
+        been answered on the current version of graph. The arguments must be
+        hashable by the Map (integers, strings, tuples of these...).
+        """
+        self.__check_version(graph)
+        key = (algorithm.__module__, algorithm.__qualname__, graph.get_uid()) + args
+        result = self._results.find(key, _MISSING)
+        if result is _MISSING:
+            result = algorithm(graph, *args)
+            self._results.insert_kv(key, result)
+        return result
+
+    def __check_version(self, graph: Graph[Datum] | LatticeGraph[Datum]) -> None:
+        """
+        Drop the results computed on an older version of graph.
+        """
+        uid = graph.get_uid()
+        version = graph.get_version()
+        seen = self._versions.find(uid)
+        if seen is not None and seen != version:
+            self._invalidations += self._results.remove_if(lambda key: key[2] == uid)
+        if seen != version:
+            self._versions.insert_kv(uid, version)
+
+    def invalidate(self, graph: Optional[Graph[Datum] | LatticeGraph[Datum]] = None):
+        """
+        Drop every result computed on graph, or every result if graph is None.
+        """
+        if graph is None:
+            self._invalidations += self._results.get_size()
+            self._results.clear()
+            self._versions = Map()
+            return
+        uid = graph.get_uid()
+        self._invalidations += self._results.remove_if(lambda key: key[2] == uid)
+        self._versions.remove(uid)
+
+    def get_size(self) -> int:
+        return self._results.get_size()
+
+    def get_bytes(self) -> int:
+        return self._results.get_bytes()
+
+    def get_hits(self) -> int:
+        return self._results.get_hits()
+
+    def get_misses(self) -> int:
+        return self._results.get_misses()
+
+    def get_evictions(self) -> int:
+        return self._results.get_evictions()
+
+    def get_invalidations(self) -> int:
+        return self._invalidations
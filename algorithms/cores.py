@@ -0,0 +1,213 @@
+from typing import Generic, Optional, TypeVar
+
+from structures.m_double_linked_list import DoubleLinkedList, DoubleNode
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import Graph
+from structures.m_stack import Stack
+
+Datum = TypeVar("Datum")
+
+
+class CoreIndex(Generic[Datum]):
+    """
+    Core numbers of an undirected Graph (see Graph.get_core_numbers), kept up to
+    date as edges are added and removed through this index.
+
+    Adding or removing an edge (u, v) changes core numbers by at most one, and only
+    for nodes with core number K = min(core(u), core(v)) that are connected to u or
+    v through such nodes (the K-subcore). Updates therefore only traverse that
+    subcore: an insertion peels the subcore to find the nodes that rise to K + 1, a
+    deletion propagates drops to K - 1 outwards from the endpoints.
+
+    Nodes are also kept in one bucket per core number, so hub queries cost
+    O(output) plus the number of core numbers above the queried one.
+    """
+
+    def __init__(self, graph: Graph[Datum]) -> None:
+        """
+        Index graph, whose adjacency lists must list every edge from both ends.
+        """
+        self._graph = graph
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Recompute every core number from scratch, e.g. after the graph was changed
+        other than through this index.
+        """
+        graph = self._graph
+        self._cores = graph.get_core_numbers().copy(0, graph.get_num_nodes())
+        self._buckets = ExtensibleList()
+        self._handles = ExtensibleList()
+        # Per-update scratch space: a node's degree is valid, and a node is evicted,
+        # only if the stamp stored for it is the current update's
+        self._stamp = 0
+        self._seen = ExtensibleList()
+        self._degrees = ExtensibleList()
+        self._evicted = ExtensibleList()
+        for node in range(graph.get_num_nodes()):
+            self.__append_node(node)
+        self._version = graph.get_version()
+
+    def __append_node(self, node: int) -> None:
+        self._handles.append(DoubleNode(node))
+        self.__bucket(self._cores[node]).insert_to_back(self._handles[node])
+        self._seen.append(0)
+        self._degrees.append(0)
+        self._evicted.append(0)
+
+    def __bucket(self, core: int) -> DoubleLinkedList:
+        while self._buckets.get_size() <= core:
+            self._buckets.append(DoubleLinkedList())
+        return self._buckets[core]
+
+    def __set_core(self, node: int, core: int) -> None:
+        handle = self._handles[node]
+        self._buckets[self._cores[node]].remove_node(handle)
+        self.__bucket(core).insert_to_back(handle)
+        self._cores[node] = core
+
+    def __check_version(self) -> None:
+        if self._version != self._graph.get_version():
+            self.rebuild()
+
+    def get_core_number(self, node: int) -> int:
+        self.__check_version()
+        return self._cores[node]
+
+    def get_hubs(self, min_degree: int) -> ExtensibleList:
+        """
+        Returns the same nodes as enumerate_hubs(graph, min_degree), grouped by core
+        number from highest to lowest rather than sorted by ID.
+        """
+        self.__check_version()
+        hubs = ExtensibleList()
+        for core in range(self._buckets.get_size() - 1, max(min_degree, 0) - 1, -1):
+            handle = self._buckets[core].get_head()
+            while handle is not None:
+                hubs.append(handle.get_data())
+                handle = handle.get_next()
+        return hubs
+
+    def add_node(self, data: Optional[Datum] = None) -> int:
+        """
+        Add an isolated node to the graph and return its ID.
+        """
+        self.__check_version()
+        node = self._graph.add_node(data)
+        self._cores.append(0)
+        self.__append_node(node)
+        self._version = self._graph.get_version()
+        return node
+
+    def add_edge(self, origin: int, target: int, weight: int = 1) -> None:
+        """
+        Add an undirected edge to the graph and raise the core numbers it affects.
+        """
+        self.__check_version()
+        graph = self._graph
+        graph.add_edge(origin, target, weight)
+        if origin != target:
+            graph.add_edge(target, origin, weight)
+        self._version = graph.get_version()
+
+        cores = self._cores
+        seen = self._seen
+        degrees = self._degrees
+        evicted = self._evicted
+        self._stamp += 1
+        stamp = self._stamp
+        level = min(cores[origin], cores[target])
+
+        # Collect the subcore: the nodes at this level reachable from the endpoints
+        # at this level through nodes at this level
+        subcore = ExtensibleList()
+        stack = Stack()
+        for root in (origin, target):
+            if cores[root] == level and seen[root] != stamp:
+                seen[root] = stamp
+                stack.push(root)
+        while not stack.is_empty():
+            node = stack.pop()
+            subcore.append(node)
+            for neighbour in graph.get_neighbour_ids(node):
+                if cores[neighbour] == level and seen[neighbour] != stamp:
+                    seen[neighbour] = stamp
+                    stack.push(neighbour)
+
+        # Degree of each subcore node counting only neighbours which could be in
+        # the (level + 1)-core, then peel those which can not reach level + 1
+        for i in range(subcore.get_size()):
+            node = subcore[i]
+            degrees[node] = self.__count_at_least(node, level)
+            if degrees[node] <= level:
+                evicted[node] = stamp
+                stack.push(node)
+        while not stack.is_empty():
+            node = stack.pop()
+            for neighbour in graph.get_neighbour_ids(node):
+                if seen[neighbour] == stamp and evicted[neighbour] != stamp:
+                    degrees[neighbour] -= 1
+                    if degrees[neighbour] <= level:
+                        evicted[neighbour] = stamp
+                        stack.push(neighbour)
+
+        for i in range(subcore.get_size()):
+            if evicted[subcore[i]] != stamp:
+                self.__set_core(subcore[i], level + 1)
+
+    def remove_edge(self, origin: int, target: int) -> bool:
+        """
+        Remove an undirected edge from the graph and lower the core numbers it
+        affects. Returns whether such an edge existed.
+        """
+        self.__check_version()
+        graph = self._graph
+        if not graph.remove_edge(origin, target):
+            return False
+        if origin != target:
+            graph.remove_edge(target, origin)
+        self._version = graph.get_version()
+
+        cores = self._cores
+        seen = self._seen
+        degrees = self._degrees
+        self._stamp += 1
+        stamp = self._stamp
+        level = min(cores[origin], cores[target])
+        if level == 0:
+            return True
+
+        # Degree of each examined node at this level counting only neighbours still
+        # at this level or above; a node drops once it falls below the level. The
+        # degree is counted on first sight, before the node that prompted the count
+        # has its own core number lowered, and decremented for it thereafter.
+        stack = Stack()
+        for root in (origin, target):
+            if cores[root] == level and seen[root] != stamp:
+                seen[root] = stamp
+                degrees[root] = self.__count_at_least(root, level)
+                if degrees[root] < level:
+                    stack.push(root)
+        while not stack.is_empty():
+            node = stack.pop()
+            if cores[node] != level:
+                continue
+            for neighbour in graph.get_neighbour_ids(node):
+                if cores[neighbour] != level or neighbour == node:
+                    continue
+                if seen[neighbour] != stamp:
+                    seen[neighbour] = stamp
+                    degrees[neighbour] = self.__count_at_least(neighbour, level)
+                degrees[neighbour] -= 1
+                if degrees[neighbour] < level:
+                    stack.push(neighbour)
+            self.__set_core(node, level - 1)
+        return True
+
+    def __count_at_least(self, node: int, level: int) -> int:
+        count = 0
+        for neighbour in self._graph.get_neighbour_ids(node):
+            if self._cores[neighbour] >= level:
+                count += 1
+        return count
@@ -0,0 +1,64 @@
+import time
+from typing import Optional
+
+DEFAULT_CHECK_INTERVAL: int = 256
+"""Number of expansions between two checks of a Deadline."""
+
+
+class SearchCancelled(Exception):
+    """
+    Thrown into a lazy traversal to stop it; the traversal returns its best partial
+    result instead of finishing.
+    """
+
+
+class Deadline:
+    """
+    A cooperative cancellation token with an optional time limit. Searches that take
+    one check it every get_interval() expansions, so checking costs nothing per
+    expansion in between. Call cancel() (e.g. from another thread) to stop a search
+    early regardless of the time limit.
+    """
+
+    def __init__(
+        self,
+        seconds: Optional[float] = None,
+        interval: int = DEFAULT_CHECK_INTERVAL,
+    ) -> None:
+        """
+        @param: seconds
+            The time budget from now, or None to only stop when cancelled
+        @param: interval
+            The number of expansions between two checks
+        """
+        if interval < 1:
+            raise ValueError("The check interval must be at least 1.")
+        self._expires = time.monotonic() + seconds if seconds is not None else None
+        self._interval = interval
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def get_interval(self) -> int:
+        return self._interval
+
+    def expired(self) -> bool:
+        """
+        Whether the search should stop: the deadline was cancelled or has passed.
+        """
+        if self._cancelled:
+            return True
+        return self._expires is not None and time.monotonic() >= self._expires
+
+    def remaining(self) -> Optional[float]:
+        """
+        Returns the seconds left before the deadline passes, or None if it has no
+        time limit.
+        """
+        if self._expires is None:
+            return None
+        return max(0.0, self._expires - time.monotonic())
@@ -0,0 +1,210 @@
+import sys
+from typing import Optional, TypeVar
+
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import Graph
+from structures.m_util import TraversalFailure
+
+try:
+    import numpy
+except ImportError:
+    # Optional: without it the engines here are unavailable and all_city_logistics
+    # always searches from each origin instead
+    numpy = None
+
+Datum = TypeVar("Datum")
+
+INFINITY: int = 1 << 60
+"""Matrix entry for pairs without a path. Real path costs must stay well below it
+in magnitude; with negative weights, entries at or above INFINITY // 2 are taken
+to be unreachable, and entries are clamped at -(INFINITY // 2)."""
+
+DEFAULT_BLOCK_SIZE: int = 64
+"""Side of the tiles the blocked variant works on; a tile update needs a
+temporary of block_size ** 3 integers, which should fit in cache."""
+
+DENSE_MIN_DENSITY: float = 0.1
+"""Smallest fraction of possible directed edges present for which
+all_city_logistics picks Floyd-Warshall over one search per origin."""
+
+
+def has_numpy() -> bool:
+    """
+    Whether numpy could be imported, and so whether the engines here can run.
+    """
+    return numpy is not None
+
+
+def is_dense(graph: Graph[Datum]) -> bool:
+    """
+    Whether graph has enough edges for Floyd-Warshall's O(V^3) vectorised work to
+    beat V single source searches, see DENSE_MIN_DENSITY.
+    """
+    graph_size = graph.get_num_nodes()
+    if graph_size < 2:
+        return False
+    density = graph.get_num_edges() / (graph_size * (graph_size - 1))
+    return density >= DENSE_MIN_DENSITY
+
+
+def floyd_warshall_matrix(graph: Graph[Datum], block_size: Optional[int] = None):
+    """
+    Floyd-Warshall over an int64 distance matrix: for each pivot k, every entry
+    (i, j) becomes min(d[i, j], d[i, k] + d[k, j]), one broadcast numpy operation
+    over the whole matrix per pivot.
+
+    With block_size, the blocked variant is used instead. The pivots are taken a
+    block at a time: the diagonal tile is closed first, then the tiles in its row
+    and column, and then every other tile gets the min-plus product of its row
+    and column tiles in one operation, while the tiles are in cache.
+
+    @param: graph
+        The general graph to process
+    @param: block_size
+        If given, the side of the tiles of the blocked variant
+
+    @returns: numpy.ndarray
+        The V x V matrix of shortest path costs, INFINITY where there is no path.
+        Where negative cycles are involved the entries are meaningless, but a
+        node lies on a negative cycle exactly when its diagonal entry is negative.
+    """
+    if numpy is None:
+        raise ImportError("Floyd-Warshall needs numpy, which is not installed")
+    graph_size = graph.get_num_nodes()
+    negative = graph.has_negative_weights()
+
+    distances = numpy.full((graph_size, graph_size), INFINITY, dtype=numpy.int64)
+    numpy.fill_diagonal(distances, 0)
+    origins = ExtensibleList()
+    targets = ExtensibleList()
+    weights = ExtensibleList()
+    for origin, target, weight in graph.iter_edges():
+        origins.append(origin)
+        targets.append(target)
+        weights.append(weight)
+    if not origins.is_empty():
+        size = origins.get_size()
+        # Parallel edges keep the cheapest weight
+        numpy.minimum.at(
+            distances,
+            (
+                numpy.fromiter((origins[i] for i in range(size)), numpy.int64, size),
+                numpy.fromiter((targets[i] for i in range(size)), numpy.int64, size),
+            ),
+            numpy.fromiter((weights[i] for i in range(size)), numpy.int64, size),
+        )
+
+    if block_size is None:
+        for pivot in range(graph_size):
+            relax_pivot(distances, distances, pivot, negative)
+    else:
+        floyd_warshall_blocked(distances, block_size, negative)
+    return distances
+
+
+def relax_pivot(target, panel, pivot: int, negative: bool) -> None:
+    """
+    target[i, j] = min(target[i, j], panel[i, pivot] + panel[pivot, j]) for a
+    square target, or a tile whose row and column run through the pivot in panel.
+    """
+    candidates = panel[:, pivot : pivot + 1] + panel[pivot : pivot + 1, :]
+    numpy.minimum(target, candidates, out=target)
+    if negative:
+        clamp(target)
+
+
+def clamp(distances) -> None:
+    """
+    Restore the infinity sentinel where a negative weight was added to it, and
+    stop costs around negative cycles from overflowing.
+    """
+    distances[distances >= INFINITY // 2] = INFINITY
+    numpy.maximum(distances, -(INFINITY // 2), out=distances)
+
+
+def floyd_warshall_blocked(distances, block_size: int, negative: bool) -> None:
+    """
+    The blocked variant of floyd_warshall_matrix, updating distances in place.
+    """
+    graph_size = distances.shape[0]
+    for start in range(0, graph_size, block_size):
+        end = min(start + block_size, graph_size)
+        pivots = slice(start, end)
+
+        # Phase 1: close the diagonal tile over its own pivots
+        diagonal = distances[pivots, pivots]
+        for pivot in range(end - start):
+            relax_pivot(diagonal, diagonal, pivot, negative)
+
+        # Phase 2: the tiles in the pivots' rows and columns, using the diagonal
+        for pivot in range(end - start):
+            row = distances[start + pivot : start + pivot + 1, :]
+            column = distances[:, start + pivot : start + pivot + 1]
+            numpy.minimum(
+                distances[pivots, :],
+                distances[pivots, start + pivot : start + pivot + 1] + row,
+                out=distances[pivots, :],
+            )
+            numpy.minimum(
+                distances[:, pivots],
+                column + distances[start + pivot : start + pivot + 1, pivots],
+                out=distances[:, pivots],
+            )
+            if negative:
+                clamp(distances[pivots, :])
+                clamp(distances[:, pivots])
+
+        # Phase 3: every other tile, through the min-plus product of the tile in
+        # its row of the pivot columns and the tile in its column of the pivot rows
+        for row_start in range(0, graph_size, block_size):
+            if row_start == start:
+                continue
+            rows = slice(row_start, min(row_start + block_size, graph_size))
+            left = distances[rows, pivots]
+            for column_start in range(0, graph_size, block_size):
+                if column_start == start:
+                    continue
+                columns = slice(
+                    column_start, min(column_start + block_size, graph_size)
+                )
+                right = distances[pivots, columns]
+                tile = distances[rows, columns]
+                product = (left[:, :, None] + right[None, :, :]).min(axis=1)
+                numpy.minimum(tile, product, out=tile)
+                if negative:
+                    clamp(tile)
+
+
+def floyd_warshall_rows(
+    graph: Graph[Datum], block_size: Optional[int] = None
+) -> ExtensibleList:
+    """
+    All pairs shortest path costs by floyd_warshall_matrix, as one row per origin
+    in the format of distance_row: sys.maxsize for nodes which can not be
+    reached, and TraversalFailure.NEGATIVE_CYCLE for nodes reachable from the
+    origin through a negative cycle.
+    """
+    distances = floyd_warshall_matrix(graph, block_size)
+    graph_size = distances.shape[0]
+    reachable = distances < INFINITY
+    cyclic = numpy.diagonal(distances) < 0
+
+    unbounded = None
+    if cyclic.any():
+        # (i, j) is unbounded when i reaches some cyclic k which reaches j
+        via = reachable[:, cyclic].astype(numpy.int64)
+        unbounded = (via @ reachable[cyclic, :].astype(numpy.int64)) > 0
+
+    rows = ExtensibleList(graph_size)
+    for origin in range(graph_size):
+        costs = distances[origin].tolist()
+        row = ExtensibleList(graph_size)
+        for target in range(graph_size):
+            if unbounded is not None and unbounded[origin, target]:
+                row[target] = TraversalFailure.NEGATIVE_CYCLE
+            elif costs[target] >= INFINITY:
+                row[target] = sys.maxsize
+            else:
+                row[target] = costs[target]
+        rows[origin] = row
+    return rows
@@ -0,0 +1,219 @@
+from pathlib import Path
+from typing import Generic, Iterable, Optional, TypeVar
+
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import LatticeGraph, LatticeNode
+from structures.m_util import TraversalFailure
+
+Datum = TypeVar("Datum")
+
+NORTH: int = 0
+"""Next step follows LatticeNode.get_north."""
+
+EAST: int = 1
+"""Next step follows LatticeNode.get_east."""
+
+SOUTH: int = 2
+"""Next step follows LatticeNode.get_south."""
+
+WEST: int = 3
+"""Next step follows LatticeNode.get_west."""
+
+NO_DIRECTION: int = -1
+"""Direction stored for goals and for cells which can not reach any goal."""
+
+
+def step(node: LatticeNode[Datum], direction: int) -> Optional[LatticeNode[Datum]]:
+    """
+    Returns the neighbour of node in the given direction.
+    """
+    if direction == NORTH:
+        return node.get_north()
+    if direction == EAST:
+        return node.get_east()
+    if direction == SOUTH:
+        return node.get_south()
+    if direction == WEST:
+        return node.get_west()
+    return None
+
+
+class FlowField(Generic[Datum]):
+    """
+    A flow field over a LatticeGraph: for every cell, the BFS distance to the nearest
+    of a set of goals and the direction of the next step towards it. It is built with
+    a single multi-source BFS from the goals, after which the path from any origin is
+    read off by following directions, in O(path length).
+
+    The field remembers the lattice version it was built for; once the lattice
+    changes it is invalid and is rebuilt on the next query.
+    """
+
+    def __init__(self, graph: LatticeGraph[Datum], goals: Iterable[int]) -> None:
+        """
+        Build the flow field towards goals over graph.
+        """
+        self._graph = graph
+        self._goals = ExtensibleList()
+        for goal in goals:
+            self._goals.append(goal)
+        self.build()
+
+    def build(self) -> None:
+        """
+        (Re)build the field with a breadth first search outwards from every goal.
+        """
+        graph = self._graph
+        size = graph.get_num_nodes()
+        self._version = graph.get_version()
+        self._distances = ExtensibleList(size)
+        self._directions = ExtensibleList(size)
+
+        # FIFO queue: nodes are never removed, only passed by the head index
+        queue = ExtensibleList()
+        for i in range(self._goals.get_size()):
+            goal = self._goals[i]
+            if self._distances[goal] is None:
+                self._distances[goal] = 0
+                self._directions[goal] = NO_DIRECTION
+                queue.append(goal)
+
+        head = 0
+        while head < queue.get_size():
+            node = graph.get_node(queue[head])
+            head += 1
+            distance = self._distances[node.get_id()] + 1
+            for neighbour in node.get_adjacent():
+                index = neighbour.get_id()
+                if self._distances[index] is None:
+                    self._distances[index] = distance
+                    self._directions[index] = direction_to(neighbour, node)
+                    queue.append(index)
+
+        for node in range(size):
+            if self._distances[node] is None:
+                self._directions[node] = NO_DIRECTION
+
+    def is_valid(self) -> bool:
+        """
+        Whether the lattice is unchanged since the field was built.
+        """
+        return self._version == self._graph.get_version()
+
+    def get_goals(self) -> ExtensibleList[int]:
+        return self._goals
+
+    def get_distance(self, node: int) -> Optional[int]:
+        """
+        Returns the number of steps from node to the nearest goal, or None if no goal
+        can be reached.
+        """
+        if not self.is_valid():
+            self.build()
+        return self._distances[node]
+
+    def get_direction(self, node: int) -> int:
+        """
+        Returns the direction of the next step from node towards the nearest goal, or
+        NO_DIRECTION if node is a goal or can not reach one.
+        """
+        if not self.is_valid():
+            self.build()
+        return self._directions[node]
+
+    def path_from(self, origin: int) -> ExtensibleList | TraversalFailure:
+        """
+        Follow the field from origin to the nearest goal.
+
+        @param: origin
+            The ID of the node from which to start
+
+        @returns: ExtensibleList
+            The ordered path between the origin and the nearest goal in node IDs.
+        @returns: TraversalFailure
+            Signals that no goal can be reached from the origin.
+        """
+        if not self.is_valid():
+            self.build()
+        if self._distances[origin] is None:
+            return TraversalFailure.DISCONNECTED
+
+        path = ExtensibleList()
+        node = self._graph.get_node(origin)
+        path.append(origin)
+        while self._directions[node.get_id()] != NO_DIRECTION:
+            node = step(node, self._directions[node.get_id()])
+            path.append(node.get_id())
+        return path
+
+    def to_file(self, path: Path) -> None:
+        """
+        Write the field in a plain text format: a line listing the goals, then one
+        "ID: distance,direction" line per node (distance -1 if unreachable).
+        """
+        if type(path) == str:
+            path = Path(path)
+        if not self.is_valid():
+            self.build()
+
+        goals = [str(self._goals[i]) for i in range(self._goals.get_size())]
+        lines = ["goals: " + " ".join(goals)]
+        for node in range(self._distances.get_size()):
+            distance = self._distances[node]
+            lines.append(
+                f"{node}: {distance if distance is not None else -1},"
+                f"{self._directions[node]}"
+            )
+        with path.open("w") as ofile:
+            ofile.write("\n".join(lines))
+
+    @classmethod
+    def from_file(cls, graph: LatticeGraph[Datum], path: Path) -> "FlowField[Datum]":
+        """
+        Load a field written by to_file. The field must have been built over the same
+        lattice as graph, in its current state.
+        """
+        if type(path) == str:
+            path = Path(path)
+        with path.open("r") as ifile:
+            contents = ifile.readlines()
+
+        chunks = contents[0].strip().split(":")
+        if len(chunks) != 2 or chunks[0].strip() != "goals":
+            raise ValueError(f"Can not interpret FlowField in {path}")
+        if len(contents) - 1 != graph.get_num_nodes():
+            raise ValueError(
+                f"FlowField in {path} has {len(contents) - 1} nodes but the graph "
+                f"has {graph.get_num_nodes()}."
+            )
+
+        field = cls.__new__(cls)
+        field._graph = graph
+        field._version = graph.get_version()
+        field._goals = ExtensibleList()
+        for goal in chunks[1].split():
+            field._goals.append(int(goal))
+        field._distances = ExtensibleList(graph.get_num_nodes())
+        field._directions = ExtensibleList(graph.get_num_nodes())
+        for line in contents[1:]:
+            node, values = line.strip().split(":")
+            distance, direction = values.strip().split(",")
+            node, distance = int(node), int(distance)
+            field._distances[node] = distance if distance >= 0 else None
+            field._directions[node] = int(direction)
+        return field
+
+
+def direction_to(node: LatticeNode[Datum], neighbour: LatticeNode[Datum]) -> int:
+    """
+    Returns the direction of the pointer from node to its neighbour.
+    """
+    if node.get_north() is neighbour:
+        return NORTH
+    if node.get_east() is neighbour:
+        return EAST
+    if node.get_south() is neighbour:
+        return SOUTH
+    if node.get_west() is neighbour:
+        return WEST
+    return NO_DIRECTION
@@ -0,0 +1,523 @@
+from typing import Generic, Optional, TypeVar
+
+from algorithms.pathfinding import distance
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import Graph, LatticeGraph, LatticeNode
+from structures.m_heap import BinaryHeap
+from structures.m_map import Map
+from structures.m_stack import Stack
+from structures.m_util import TraversalFailure
+
+Datum = TypeVar("Datum")
+
+DEFAULT_CLUSTER_SIZE: int = 16
+"""Side length, in cells, of the square clusters the lattice is partitioned into."""
+
+ENTRANCE_SPLIT: int = 6
+"""Border openings at least this wide get an entrance at each end, not one in the middle."""
+
+
+class HierarchicalPlanner(Generic[Datum]):
+    """
+    HPA* over a LatticeGraph. The lattice is partitioned into square clusters; every
+    opening in the border between two clusters contributes entrance cells, which
+    become the nodes of an abstract Graph. Abstract edges join the two sides of each
+    entrance (cost 1) and every pair of entrances of a cluster that can reach each
+    other inside it (cost equal to the in-cluster BFS distance).
+
+    Queries connect the origin and goal to the entrances of their clusters, run A*
+    over the abstract graph and then refine each abstract edge along a BFS tree
+    confined to a single cluster. Paths are near-optimal rather than optimal.
+
+    The abstraction follows changes to the lattice (e.g. LatticeNode.disconnect): on
+    the next query, only the clusters around the changed cells are rebuilt.
+
+    Queries are not sub-millisecond: on a 201x301 maze (34k cells) with the default
+    cluster size, building takes about 1s and a query 11-15ms. Refinement reuses
+    the BFS trees built for the abstract edges, so a query only searches the
+    origin's and goal's clusters (about 1ms); the rest is the A* over the abstract
+    graph, which expands around a sixth of its nodes because the Manhattan
+    distance is a weak estimate in a maze.
+    """
+
+    def __init__(
+        self, graph: LatticeGraph[Datum], cluster_size: int = DEFAULT_CLUSTER_SIZE
+    ) -> None:
+        """
+        Partition graph into clusters of cluster_size by cluster_size cells and build
+        the abstract graph.
+        """
+        self._graph = graph
+        self._size = cluster_size
+        rows, cols = graph.get_dimensions()
+        self._cluster_rows = -(-rows // cluster_size)
+        self._cluster_cols = -(-cols // cluster_size)
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Build the whole abstraction from scratch.
+        """
+        clusters = self._cluster_rows * self._cluster_cols
+        self._version = self._graph.get_version()
+        self._abstract = Graph()
+        # Maps each lattice node ID to its abstract node ID, if it is an entrance
+        self._abstract_ids = ExtensibleList(self._graph.get_num_nodes())
+        # Entrance (a, b) pairs across the border with the next cluster along a row
+        self._horizontal = ExtensibleList(clusters)
+        # Entrance (a, b) pairs across the border with the next cluster along a column
+        self._vertical = ExtensibleList(clusters)
+        # Abstract (a, b) node ID pairs joined by an edge inside each cluster
+        self._intra = ExtensibleList(clusters)
+        # The IDs of the entrance cells inside each cluster
+        self._entrances = ExtensibleList(clusters)
+        # Maps each entrance cell's ID to the BFS tree of its cluster rooted at it,
+        # see __local_bfs, used to refine abstract edges without searching again
+        self._trees = ExtensibleList(self._graph.get_num_nodes())
+        # Reusable per-query search state, see __begin_search
+        self._search = 0
+        self._stamps = ExtensibleList()
+        self._closed = ExtensibleList()
+        self._costs = ExtensibleList()
+        self._parents = ExtensibleList()
+
+        for cluster in range(clusters):
+            self.__build_borders(cluster)
+        for cluster in range(clusters):
+            self.__build_intra(cluster)
+
+    def rebuild_cluster(self, cluster_row: int, cluster_col: int) -> None:
+        """
+        Rebuild the entrances on the borders of a single cluster, and the abstract
+        edges inside it and its four neighbours.
+        """
+        cluster = cluster_row * self._cluster_cols + cluster_col
+        neighbours = ExtensibleList()
+        if cluster_col > 0:
+            neighbours.append(cluster - 1)
+        if cluster_col < self._cluster_cols - 1:
+            neighbours.append(cluster + 1)
+        if cluster_row > 0:
+            neighbours.append(cluster - self._cluster_cols)
+        if cluster_row < self._cluster_rows - 1:
+            neighbours.append(cluster + self._cluster_cols)
+
+        self.__clear_intra(cluster)
+        for i in range(neighbours.get_size()):
+            self.__clear_intra(neighbours[i])
+
+        self.__clear_border(self._horizontal, cluster)
+        self.__clear_border(self._vertical, cluster)
+        if cluster_col > 0:
+            self.__clear_border(self._horizontal, cluster - 1)
+        if cluster_row > 0:
+            self.__clear_border(self._vertical, cluster - self._cluster_cols)
+
+        self.__build_borders(cluster)
+        if cluster_col > 0:
+            self.__build_borders(cluster - 1, vertical=False)
+        if cluster_row > 0:
+            self.__build_borders(cluster - self._cluster_cols, horizontal=False)
+
+        self.__build_intra(cluster)
+        for i in range(neighbours.get_size()):
+            self.__build_intra(neighbours[i])
+
+    def refresh(self) -> None:
+        """
+        Bring the abstraction up to date with every change made to the lattice since
+        it was last built, rebuilding only the clusters containing changed cells.
+        """
+        if self._version == self._graph.get_version():
+            return
+        changed = self._graph.get_changes_since(self._version)
+        if changed is None:
+            self.rebuild()
+            return
+
+        rebuilt = Map()
+        for i in range(changed.get_size()):
+            row, col = self._graph.get_node(changed[i]).get_coordinates()
+            cluster_row, cluster_col = row // self._size, col // self._size
+            cluster = cluster_row * self._cluster_cols + cluster_col
+            if rebuilt.find(cluster) is None:
+                rebuilt.insert_kv(cluster, True)
+                self.rebuild_cluster(cluster_row, cluster_col)
+        self._version = self._graph.get_version()
+
+    def get_abstract_graph(self) -> Graph[int]:
+        """
+        Returns the abstract graph. Each node's data is the ID of the lattice node it
+        stands for; nodes for cells which stopped being entrances are left isolated.
+        """
+        return self._abstract
+
+    def find_path(self, origin: int, goal: int) -> ExtensibleList | TraversalFailure:
+        """
+        Find a path between two lattice nodes.
+
+        @param: origin
+            The ID of the node from which to start traversal
+        @param: goal
+            The ID of the target node
+
+        @returns: ExtensibleList
+            The ordered path between the origin and the goal in node IDs.
+        @returns: TraversalFailure
+            Signals that the path between the origin and the target can not be found.
+        """
+        self.refresh()
+        graph = self._graph
+        if origin == goal:
+            path = ExtensibleList()
+            path.append(origin)
+            return path
+
+        origin_cluster = self.__cluster_of(origin)
+
+        # Temporary abstract nodes for the origin and goal
+        size = self._abstract.get_num_nodes()
+        start = size
+        finish = size + 1
+        self.__begin_search(size + 2)
+
+        # Paths from the origin to its cluster's entrances, and from the goal's
+        # cluster's entrances to the goal (the lattice is undirected)
+        origin_tree = self.__local_bfs(origin)
+        goal_tree = self.__local_bfs(goal)
+        direct = self.__cost_to(goal_tree, origin)
+        to_goal = Map()
+        goal_edges = self.__entrance_edges(self.__cluster_of(goal), goal_tree)
+        for i in range(goal_edges.get_size()):
+            to_goal.insert_kv(*goal_edges[i])
+
+        goal_coordinates = graph.get_node(goal).get_coordinates()
+        queue = BinaryHeap()
+        self.__relax(start, None, 0)
+        queue.insert(0, start)
+
+        while not queue.is_empty():
+            node = queue.remove_min()
+            if node == finish:
+                break
+            if self._closed[node] == self._search:
+                # A stale queue entry for a node already expanded at a lower cost
+                continue
+            self._closed[node] = self._search
+            cost = self._costs[node]
+
+            if node == start:
+                edges = self.__entrance_edges(origin_cluster, origin_tree)
+                if direct is not None:
+                    edges.append((finish, direct))
+            else:
+                edges = ExtensibleList()
+                for neighbour, weight in self._abstract.get_neighbours(node):
+                    edges.append((neighbour.get_id(), weight))
+                cost_to_goal = to_goal.find(node)
+                if cost_to_goal is not None:
+                    edges.append((finish, cost_to_goal))
+
+            for i in range(edges.get_size()):
+                neighbour, weight = edges[i]
+                if self.__relax(neighbour, node, cost + weight):
+                    if neighbour == finish:
+                        estimate = 0
+                    else:
+                        cell = self._abstract.get_node(neighbour).get_data()
+                        estimate = distance(
+                            graph.get_node(cell).get_coordinates(), goal_coordinates
+                        )
+                    queue.insert(cost + weight + estimate, neighbour)
+        else:
+            return TraversalFailure.DISCONNECTED
+
+        # Walk the abstract path back from the goal, then refine each abstract edge
+        waypoints = Stack()
+        waypoints.push(goal)
+        node = self._parents[finish]
+        while node != start:
+            waypoints.push(self._abstract.get_node(node).get_data())
+            node = self._parents[node]
+
+        path = ExtensibleList()
+        path.append(origin)
+        previous = origin
+        while not waypoints.is_empty():
+            cell = waypoints.pop()
+            if cell == previous:
+                continue
+            if self.__cluster_of(cell) != self.__cluster_of(previous):
+                path.append(cell)
+            elif cell == goal:
+                # The goal's tree leads from previous to the goal
+                segment = self.__tree_path(goal_tree, previous)
+                for i in range(1, segment.get_size()):
+                    path.append(segment[i])
+            else:
+                # The tree rooted at previous leads from cell back to it
+                tree = origin_tree if previous == origin else self._trees[previous]
+                segment = self.__tree_path(tree, cell)
+                for i in range(segment.get_size() - 2, -1, -1):
+                    path.append(segment[i])
+            previous = cell
+        return path
+
+    def __begin_search(self, size: int) -> None:
+        """
+        Invalidate the search state of the previous query in O(1) by moving to a new
+        stamp, growing the state to cover size abstract nodes.
+        """
+        self._search += 1
+        while self._stamps.get_size() < size:
+            self._stamps.append(0)
+            self._closed.append(0)
+            self._costs.append(None)
+            self._parents.append(None)
+
+    def __relax(self, node: int, parent: Optional[int], cost: int) -> bool:
+        """
+        Record cost as the best known cost of node, reached from parent, if it
+        improves on the current one. Returns whether it did.
+        """
+        if self._stamps[node] == self._search and self._costs[node] <= cost:
+            return False
+        self._stamps[node] = self._search
+        self._costs[node] = cost
+        self._parents[node] = parent
+        return True
+
+    def __entrance_edges(
+        self, cluster: int, tree: tuple[ExtensibleList, ExtensibleList, int]
+    ) -> ExtensibleList:
+        """
+        Returns (abstract ID, cost) pairs for the entrances of cluster found in tree.
+        """
+        edges = ExtensibleList()
+        entrances = self._entrances[cluster]
+        for i in range(entrances.get_size()):
+            cost = self.__cost_to(tree, entrances[i])
+            if cost is not None:
+                edges.append((self._abstract_ids[entrances[i]], cost))
+        return edges
+
+    def __cluster_of(self, node: int) -> int:
+        row, col = self._graph.get_node(node).get_coordinates()
+        return (row // self._size) * self._cluster_cols + col // self._size
+
+    def __cluster_bounds(self, cluster: int) -> tuple[int, int, int, int]:
+        """
+        Returns the first row, first column, end row and end column of a cluster.
+        """
+        rows, cols = self._graph.get_dimensions()
+        row = (cluster // self._cluster_cols) * self._size
+        col = (cluster % self._cluster_cols) * self._size
+        return row, col, min(row + self._size, rows), min(col + self._size, cols)
+
+    def __abstract_id(self, cell: int) -> int:
+        """
+        Returns the abstract node standing for a lattice node, creating it if needed.
+        """
+        index = self._abstract_ids[cell]
+        if index is None:
+            index = self._abstract.add_node(cell)
+            self._abstract_ids[cell] = index
+        return index
+
+    def __build_borders(
+        self, cluster: int, horizontal: bool = True, vertical: bool = True
+    ) -> None:
+        """
+        Find the entrances on the borders shared with the next cluster along the row
+        and/or the next cluster along the column, and add the abstract edges crossing
+        them.
+        """
+        rows, cols = self._graph.get_dimensions()
+        top, left, bottom, right = self.__cluster_bounds(cluster)
+        if horizontal:
+            pairs = ExtensibleList()
+            if right < cols:
+                for row in range(top, bottom):
+                    pairs.append(
+                        (
+                            self._graph.get_node_at(row, right - 1),
+                            self._graph.get_node_at(row, right),
+                        )
+                    )
+            self._horizontal[cluster] = self.__choose_entrances(pairs)
+        if vertical:
+            pairs = ExtensibleList()
+            if bottom < rows:
+                for col in range(left, right):
+                    pairs.append(
+                        (
+                            self._graph.get_node_at(bottom - 1, col),
+                            self._graph.get_node_at(bottom, col),
+                        )
+                    )
+            self._vertical[cluster] = self.__choose_entrances(pairs)
+
+    def __choose_entrances(self, pairs: ExtensibleList) -> ExtensibleList:
+        """
+        Given the facing cells along a border, returns the (a, b) node ID pairs chosen
+        as entrances for each maximal run of linked pairs, and adds their edges.
+        """
+        entrances = ExtensibleList()
+        run_start = None
+        for i in range(pairs.get_size() + 1):
+            linked = i < pairs.get_size() and is_linked(*pairs[i])
+            if linked and run_start is None:
+                run_start = i
+            elif not linked and run_start is not None:
+                if i - run_start >= ENTRANCE_SPLIT:
+                    entrances.append(pairs[run_start])
+                    entrances.append(pairs[i - 1])
+                else:
+                    entrances.append(pairs[(run_start + i - 1) // 2])
+                run_start = None
+
+        result = ExtensibleList()
+        for i in range(entrances.get_size()):
+            a, b = entrances[i]
+            a, b = a.get_id(), b.get_id()
+            result.append((a, b))
+            self._abstract.add_edge(self.__abstract_id(a), self.__abstract_id(b), 1)
+            self._abstract.add_edge(self.__abstract_id(b), self.__abstract_id(a), 1)
+        return result
+
+    def __clear_border(self, borders: ExtensibleList, cluster: int) -> None:
+        pairs = borders[cluster]
+        for i in range(pairs.get_size()):
+            a, b = pairs[i]
+            self._abstract.remove_edge(self._abstract_ids[a], self._abstract_ids[b])
+            self._abstract.remove_edge(self._abstract_ids[b], self._abstract_ids[a])
+        borders[cluster] = ExtensibleList()
+
+    def __entrances(self, cluster: int) -> ExtensibleList[int]:
+        """
+        Returns the IDs of the entrance cells lying inside a cluster.
+        """
+        entrances = ExtensibleList()
+        seen = Map()
+
+        def add(cell: int) -> None:
+            if seen.find(cell) is None:
+                seen.insert_kv(cell, True)
+                entrances.append(cell)
+
+        sides = ExtensibleList()
+        sides.append((self._horizontal[cluster], 0))
+        sides.append((self._vertical[cluster], 0))
+        if cluster % self._cluster_cols > 0:
+            sides.append((self._horizontal[cluster - 1], 1))
+        if cluster >= self._cluster_cols:
+            sides.append((self._vertical[cluster - self._cluster_cols], 1))
+        for i in range(sides.get_size()):
+            pairs, side = sides[i]
+            for j in range(pairs.get_size()):
+                add(pairs[j][side])
+        return entrances
+
+    def __build_intra(self, cluster: int) -> None:
+        """
+        Add abstract edges between every pair of entrances of a cluster which can
+        reach each other without leaving it.
+        """
+        entrances = self.__entrances(cluster)
+        edges = ExtensibleList()
+        for i in range(entrances.get_size()):
+            tree = self.__local_bfs(entrances[i])
+            self._trees[entrances[i]] = tree
+            for j in range(i + 1, entrances.get_size()):
+                cost = self.__cost_to(tree, entrances[j])
+                if cost is not None:
+                    a = self.__abstract_id(entrances[i])
+                    b = self.__abstract_id(entrances[j])
+                    self._abstract.add_edge(a, b, cost)
+                    self._abstract.add_edge(b, a, cost)
+                    edges.append((a, b))
+        self._intra[cluster] = edges
+        self._entrances[cluster] = entrances
+
+    def __clear_intra(self, cluster: int) -> None:
+        edges = self._intra[cluster]
+        for i in range(edges.get_size()):
+            a, b = edges[i]
+            self._abstract.remove_edge(a, b)
+            self._abstract.remove_edge(b, a)
+        self._intra[cluster] = ExtensibleList()
+
+    def __local_bfs(self, source: int) -> tuple[ExtensibleList, ExtensibleList, int]:
+        """
+        Breadth first search from source which never leaves its cluster. Returns the
+        ID of each reached cell's parent (None for source) and its BFS depth, both
+        indexed by the cell's position within the cluster (None where unreachable),
+        along with the cluster. Read it with __cost_to and __tree_path.
+        """
+        cluster = self.__cluster_of(source)
+        top, left, bottom, right = self.__cluster_bounds(cluster)
+        width = right - left
+        parents = ExtensibleList((bottom - top) * width)
+        depths = ExtensibleList((bottom - top) * width)
+        order = ExtensibleList()
+
+        row, col = self._graph.get_node(source).get_coordinates()
+        depths[(row - top) * width + col - left] = 0
+        order.append(source)
+        head = 0
+        while head < order.get_size():
+            node = self._graph.get_node(order[head])
+            row, col = node.get_coordinates()
+            depth = depths[(row - top) * width + col - left] + 1
+            for adj in node.get_adjacent():
+                row, col = adj.get_coordinates()
+                if top <= row < bottom and left <= col < right:
+                    position = (row - top) * width + col - left
+                    if depths[position] is None:
+                        depths[position] = depth
+                        parents[position] = order[head]
+                        order.append(adj.get_id())
+            head += 1
+        return parents, depths, cluster
+
+    def __cost_to(
+        self, tree: tuple[ExtensibleList, ExtensibleList, int], cell: int
+    ) -> Optional[int]:
+        """
+        Returns the distance to cell in the result of __local_bfs, or None if cell is
+        unreachable or lies in another cluster.
+        """
+        _, depths, cluster = tree
+        top, left, bottom, right = self.__cluster_bounds(cluster)
+        row, col = self._graph.get_node(cell).get_coordinates()
+        if top <= row < bottom and left <= col < right:
+            return depths[(row - top) * (right - left) + col - left]
+        return None
+
+    def __tree_path(
+        self, tree: tuple[ExtensibleList, ExtensibleList, int], cell: int
+    ) -> ExtensibleList:
+        """
+        Returns the shortest path from cell, which must be reachable in the result of
+        __local_bfs, back to the source of the search.
+        """
+        parents, _, cluster = tree
+        top, left, _, right = self.__cluster_bounds(cluster)
+        path = ExtensibleList()
+        while cell is not None:
+            path.append(cell)
+            row, col = self._graph.get_node(cell).get_coordinates()
+            cell = parents[(row - top) * (right - left) + col - left]
+        return path
+
+
+def is_linked(a: Optional[LatticeNode], b: Optional[LatticeNode]) -> bool:
+    """
+    Whether two (possibly missing) lattice nodes are adjacent to each other.
+    """
+    if a is None or b is None:
+        return False
+    for adj in a.get_adjacent():
+        if adj is b:
+            return True
+    return False
@@ -0,0 +1,211 @@
+import sys
+from typing import Generic, TypeVar
+
+from algorithms.pathfinding import distance
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import LatticeGraph
+from structures.m_pqueue import PriorityQueue
+from structures.m_util import TraversalFailure
+
+Datum = TypeVar("Datum")
+
+INFINITY: int = sys.maxsize
+"""Cost of a node from which the goal can not be reached."""
+
+
+class DStarLitePlanner(Generic[Datum]):
+    """
+    D* Lite over a LatticeGraph. The search runs backwards from the goal, so its
+    state (the g and rhs estimates of the distance to the goal) stays valid while the
+    origin moves along the path. When cells are disconnected or reconnected, only the
+    estimates of the changed cells are re-examined and the search repairs the part of
+    the tree that depended on them, instead of starting again from scratch.
+
+    The planner notices changes through the lattice's change log (see
+    Graph.get_changes_since); if the log can not say what changed, the search is
+    restarted.
+    """
+
+    def __init__(self, graph: LatticeGraph[Datum], origin: int, goal: int) -> None:
+        """
+        @param: graph
+            The lattice to plan over
+        @param: origin
+            The ID of the node the agent starts from
+        @param: goal
+            The ID of the node the agent is heading to
+        """
+        self._graph = graph
+        self._goal = goal
+        self._origin = origin
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forget all search state and start the search again from the goal.
+        """
+        size = self._graph.get_num_nodes()
+        # Distance-to-goal estimates: None stands for INFINITY
+        self._g = ExtensibleList(size)
+        self._rhs = ExtensibleList(size)
+        # The key each node is currently queued with, or None if it is not queued;
+        # queue entries whose key no longer matches are stale and skipped
+        self._keys = ExtensibleList(size)
+        self._queue = PriorityQueue()
+        self._modifier = 0
+        self._last = self._origin
+        self._version = self._graph.get_version()
+        self._expansions = 0
+
+        self._rhs[self._goal] = 0
+        self.__push(self._goal)
+
+    def get_origin(self) -> int:
+        return self._origin
+
+    def get_goal(self) -> int:
+        return self._goal
+
+    def get_expansions(self) -> int:
+        """
+        Returns the number of nodes expanded since the planner was last reset.
+        """
+        return self._expansions
+
+    def move_to(self, origin: int) -> None:
+        """
+        Move the agent to origin, e.g. a node along the last planned path.
+        """
+        self._origin = origin
+
+    def plan(self) -> ExtensibleList | TraversalFailure:
+        """
+        Bring the search up to date with the lattice and return the shortest path
+        from the current origin to the goal.
+
+        @returns: ExtensibleList
+            The ordered path between the origin and the goal in node IDs.
+        @returns: TraversalFailure
+            Signals that the goal can not be reached from the origin.
+        """
+        self.__apply_changes()
+        self.__compute()
+
+        if self.__g(self._origin) == INFINITY:
+            return TraversalFailure.DISCONNECTED
+
+        path = ExtensibleList()
+        node = self._origin
+        path.append(node)
+        while node != self._goal:
+            here = self.__g(node)
+            best, step = INFINITY, node
+            for neighbour in self._graph.get_node(node).get_adjacent():
+                cost = self.__g(neighbour.get_id())
+                if cost < best:
+                    best, step = cost, neighbour.get_id()
+            if best >= here:
+                # No neighbour is closer to the goal: the estimates are inconsistent,
+                # so no path can be read off them
+                return TraversalFailure.DISCONNECTED
+            node = step
+            path.append(node)
+        return path
+
+    def __g(self, node: int) -> int:
+        value = self._g[node]
+        return INFINITY if value is None else value
+
+    def __rhs(self, node: int) -> int:
+        value = self._rhs[node]
+        return INFINITY if value is None else value
+
+    def __key(self, node: int) -> tuple[int, int]:
+        cost = min(self.__g(node), self.__rhs(node))
+        if cost == INFINITY:
+            return (INFINITY, INFINITY)
+        origin = self._graph.get_node(self._origin).get_coordinates()
+        here = self._graph.get_node(node).get_coordinates()
+        return (cost + int(distance(origin, here)) + self._modifier, cost)
+
+    def __push(self, node: int) -> None:
+        key = self.__key(node)
+        self._keys[node] = key
+        self._queue.insert(key, (key, node))
+
+    def __top(self) -> tuple[tuple[int, int], int] | None:
+        """
+        Discard stale queue entries and return the live one with the smallest key.
+        """
+        while not self._queue.is_empty():
+            key, node = self._queue.get_min()
+            if self._keys[node] == key:
+                return key, node
+            self._queue.remove_min()
+        return None
+
+    def __update(self, node: int) -> None:
+        """
+        Recompute the one-step lookahead estimate of node and (de)queue it depending
+        on whether it is locally consistent.
+        """
+        if node != self._goal:
+            best = INFINITY
+            for neighbour in self._graph.get_node(node).get_adjacent():
+                cost = self.__g(neighbour.get_id())
+                if cost < best:
+                    best = cost
+            self._rhs[node] = best + 1 if best != INFINITY else None
+
+        self._keys[node] = None
+        if self.__g(node) != self.__rhs(node):
+            self.__push(node)
+
+    def __apply_changes(self) -> None:
+        """
+        Account for the agent having moved and for the lattice having changed since
+        the last plan.
+        """
+        if self._last != self._origin:
+            last = self._graph.get_node(self._last).get_coordinates()
+            here = self._graph.get_node(self._origin).get_coordinates()
+            self._modifier += int(distance(last, here))
+            self._last = self._origin
+
+        version = self._graph.get_version()
+        if version == self._version:
+            return
+        changed = self._graph.get_changes_since(self._version)
+        if changed is None or self._graph.get_num_nodes() != self._g.get_size():
+            self.reset()
+            return
+        self._version = version
+        for i in range(changed.get_size()):
+            self.__update(changed[i])
+
+    def __compute(self) -> None:
+        origin = self._origin
+        while True:
+            top = self.__top()
+            if top is None:
+                break
+            key, node = top
+            if not (key < self.__key(origin) or self.__rhs(origin) != self.__g(origin)):
+                break
+
+            self._queue.remove_min()
+            self._keys[node] = None
+            self._expansions += 1
+
+            fresh = self.__key(node)
+            if key < fresh:
+                self.__push(node)
+            elif self.__g(node) > self.__rhs(node):
+                self._g[node] = self._rhs[node]
+                for neighbour in self._graph.get_node(node).get_adjacent():
+                    self.__update(neighbour.get_id())
+            else:
+                self._g[node] = None
+                self.__update(node)
+                for neighbour in self._graph.get_node(node).get_adjacent():
+                    self.__update(neighbour.get_id())
@@ -0,0 +1,138 @@
+from typing import Optional, TypeVar
+
+from algorithms.deadline import Deadline
+from algorithms.pathfinding import collect_traversal, iter_dfs
+from structures.m_double_linked_list import DoubleLinkedList, DoubleNode
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import LatticeGraph
+from structures.m_stack import Stack
+from structures.m_util import TraversalFailure
+
+Datum = TypeVar("Datum")
+
+
+def long_path_traversal(
+    graph: LatticeGraph[Datum],
+    origin: int,
+    goal: int,
+    record_visits: bool = True,
+    deadline: Optional[Deadline] = None,
+) -> (
+    tuple[ExtensibleList, Optional[ExtensibleList]]
+    | tuple[TraversalFailure, Optional[ExtensibleList]]
+    | tuple[ExtensibleList | TraversalFailure, Optional[ExtensibleList], bool]
+):
+    """
+    Find a long simple path between the origin and the goal, e.g. for an inspection
+    tour covering as much of the lattice as possible.
+
+    A depth first search gives the initial path. It is then lengthened by detour
+    insertion: wherever two consecutive path cells u, v have neighbours c, d off the
+    path with c adjacent to d, the step u -> v becomes u -> c -> d -> v. Each new
+    step is examined once, and the off-path cells only dwindle, so a step that can
+    not take a detour never will; the whole pass is linear in the size of the
+    lattice. On open areas it fills in most cells; in a perfect maze the only simple
+    path is the one DFS finds.
+
+    @param: graph
+        The lattice graph to process
+    @param: origin
+        The ID of the node from which to start
+    @param: goal
+        The ID of the target node
+    @param: record_visits
+        Whether to record the nodes visited by the depth first search. If False, the
+        second element of the result is None.
+    @param: deadline
+        If given, the search stops once the deadline expires and the result gains a
+        third element, as with collect_traversal: False if the deadline expired
+        before the path stopped growing, in which case it is the longest path found
+        so far, or may not reach the goal if the depth first search was cut short.
+
+    @returns: tuple[ExtensibleList, ExtensibleList]
+        1. A simple path between the origin and the goal in node IDs;
+        2. The IDs of the nodes visited by the initial depth first search, in the
+           order they were visited. Its size is the visited count to report against
+           the path's size: the path can be longer, as detours take in cells the
+           search never reached.
+    @returns: tuple[TraversalFailure, ExtensibleList]
+        1. TraversalFailure signals that the path between the origin and the target can not be found;
+        2. The IDs of all nodes in the order they were visited.
+    """
+    if deadline is None:
+        initial, visited_order = collect_traversal(
+            iter_dfs(graph, origin, goal), record_visits
+        )
+        complete = True
+    else:
+        initial, visited_order, complete = collect_traversal(
+            iter_dfs(graph, origin, goal), record_visits, deadline
+        )
+    if initial == TraversalFailure.DISCONNECTED or not complete:
+        if deadline is None:
+            return (initial, visited_order)
+        return (initial, visited_order, complete)
+
+    on_path = ExtensibleList(graph.get_num_nodes())
+    path = DoubleLinkedList()
+    # Path cells whose step to the next cell has not been examined yet
+    pending = Stack()
+    for i in range(initial.get_size()):
+        cell = DoubleNode(initial[i])
+        path.insert_to_back(cell)
+        on_path[initial[i]] = True
+        pending.push(cell)
+
+    interval = deadline.get_interval() if deadline is not None else -1
+    countdown = interval
+    while not pending.is_empty():
+        countdown -= 1
+        if countdown == 0:
+            countdown = interval
+            if deadline.expired():
+                complete = False
+                break
+
+        cell = pending.pop()
+        after = cell.get_next()
+        if after is None:
+            continue
+        detour = find_detour(graph, cell.get_data(), after.get_data(), on_path)
+        if detour is None:
+            continue
+
+        first = DoubleNode(detour[0])
+        second = DoubleNode(detour[1])
+        path.insert_after(cell, first)
+        path.insert_after(first, second)
+        on_path[detour[0]] = True
+        on_path[detour[1]] = True
+        pending.push(second)
+        pending.push(first)
+        pending.push(cell)
+
+    result = ExtensibleList()
+    cell = path.get_head()
+    while cell is not None:
+        result.append(cell.get_data())
+        cell = cell.get_next()
+    if deadline is None:
+        return (result, visited_order)
+    return (result, visited_order, complete)
+
+
+def find_detour(
+    graph: LatticeGraph[Datum], before: int, after: int, on_path: ExtensibleList
+) -> Optional[tuple[int, int]]:
+    """
+    Returns two adjacent cells off the path, the first adjacent to before and the
+    second adjacent to after, or None if there are none.
+    """
+    target = graph.get_node(after)
+    for first in graph.get_node(before).get_adjacent():
+        if on_path[first.get_id()]:
+            continue
+        for second in first.get_adjacent():
+            if not on_path[second.get_id()] and target in second.get_adjacent():
+                return (first.get_id(), second.get_id())
+    return None
@@ -0,0 +1,155 @@
+import multiprocessing
+from typing import Callable, Iterable, Optional, TypeVar
+
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import Graph, LatticeGraph
+
+Datum = TypeVar("Datum")
+
+DEFAULT_CHUNK_SIZE: int = 16
+"""Number of queries handed to a worker process at a time."""
+
+# The graph the worker processes run queries against, set in each worker by
+# install_graph
+_shared_graph = None
+
+
+def install_graph(graph: Graph[Datum] | LatticeGraph[Datum]) -> None:
+    """
+    Pool initializer making graph the one queries run against in this process.
+    """
+    global _shared_graph
+    _shared_graph = graph
+
+
+def run_chunk(task: tuple[Callable, list[tuple]]) -> list:
+    """
+    Run algorithm(graph, *args) for each argument tuple of a chunk against the
+    shared graph, in order.
+    """
+    algorithm, chunk = task
+    return [algorithm(_shared_graph, *args) for args in chunk]
+
+
+class BatchRunner:
+    """
+    Runs batches of queries (bfs_traversal, maintenance_optimisation, ...) against a
+    single graph across a pool of worker processes, side-stepping the GIL.
+
+    The graph reaches each worker once, through the pool's initializer, including
+    any worker the pool starts to replace one: with the fork start method workers
+    inherit it copy-on-write, otherwise it is pickled once per worker. Tasks only
+    carry the algorithm (by reference) and the query arguments. If the graph is
+    mutated, the pool is restarted before the next batch so the workers never
+    answer queries against a stale copy.
+
+    Use it as a context manager, or call close() when done.
+    """
+
+    def __init__(
+        self,
+        graph: Graph[Datum] | LatticeGraph[Datum],
+        workers: Optional[int] = None,
+        start_method: Optional[str] = None,
+    ) -> None:
+        """
+        @param: graph
+            The graph every query runs against
+        @param: workers
+            The number of worker processes; defaults to the number of CPUs
+        @param: start_method
+            The multiprocessing start method of the workers, e.g. "fork" or "spawn";
+            defaults to "fork" where it is available
+        """
+        if start_method is None:
+            available = multiprocessing.get_all_start_methods()
+            start_method = "fork" if "fork" in available else available[0]
+        self._graph = graph
+        self._workers = workers if workers is not None else multiprocessing.cpu_count()
+        self._start_method = start_method
+        self._pool = None
+        self._version = None
+
+    def __enter__(self) -> "BatchRunner":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shut the worker processes down.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __start(self) -> None:
+        if self._pool is not None and self._version == self._graph.get_version():
+            return
+        self.close()
+
+        self._version = self._graph.get_version()
+        context = multiprocessing.get_context(self._start_method)
+        self._pool = context.Pool(
+            self._workers, initializer=install_graph, initargs=(self._graph,)
+        )
+
+    def run(
+        self,
+        algorithm: Callable,
+        queries: Iterable[tuple],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> ExtensibleList:
+        """
+        Run algorithm(graph, *args) for every argument tuple in queries.
+
+        @param: algorithm
+            A module-level function taking the graph as its first argument
+        @param: queries
+            The remaining arguments of each query, e.g. (origin, goal) pairs
+        @param: chunk_size
+            The number of queries sent to a worker at a time
+
+        @returns: ExtensibleList
+            The result of each query, in the same order as queries.
+        """
+        chunks = []
+        chunk = []
+        for args in queries:
+            chunk.append(args)
+            if len(chunk) == chunk_size:
+                chunks.append((algorithm, chunk))
+                chunk = []
+        if len(chunk) > 0:
+            chunks.append((algorithm, chunk))
+
+        results = ExtensibleList()
+        if self._workers <= 1 or len(chunks) <= 1:
+            # Not worth the round trip to another process
+            for task in chunks:
+                for args in task[1]:
+                    results.append(algorithm(self._graph, *args))
+            return results
+
+        self.__start()
+        for chunk_results in self._pool.imap(run_chunk, chunks):
+            for result in chunk_results:
+                results.append(result)
+        return results
+
+
+def run_batch(
+    graph: Graph[Datum] | LatticeGraph[Datum],
+    algorithm: Callable,
+    queries: Iterable[tuple],
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    start_method: Optional[str] = None,
+) -> ExtensibleList:
+    """
+    Run a single batch of queries in parallel, see BatchRunner and BatchRunner.run.
+    """
+    with BatchRunner(graph, workers, start_method) as runner:
+        return runner.run(algorithm, queries, chunk_size)
@@ -1,6 +1,8 @@
 import sys
-from typing import TypeVar
+from typing import Generator, Iterable, Optional, TypeVar
 
+from algorithms.deadline import Deadline, SearchCancelled
+from structures.m_entry import Entry
 from structures.m_extensible_list import ExtensibleList
 from structures.m_graph import Graph, LatticeGraph
 from structures.m_map import Map
@@ -12,8 +14,16 @@ Datum = TypeVar("Datum")
 
 
 def dfs_traversal(
-    graph: Graph[Datum] | LatticeGraph[Datum], origin: int, goal: int
-) -> tuple[ExtensibleList, ExtensibleList] | tuple[TraversalFailure, ExtensibleList]:
+    graph: Graph[Datum] | LatticeGraph[Datum],
+    origin: int,
+    goal: int,
+    record_visits: bool = True,
+    deadline: Optional[Deadline] = None,
+) -> (
+    tuple[ExtensibleList, Optional[ExtensibleList]]
+    | tuple[TraversalFailure, Optional[ExtensibleList]]
+    | tuple[ExtensibleList | TraversalFailure, Optional[ExtensibleList], bool]
+):
     """
     Task 2.1: Depth First Search
 
@@ -23,6 +33,12 @@ def dfs_traversal(
         The ID of the node from which to start traversal
     @param: goal
         The ID of the target node
+    @param: record_visits
+        Whether to record the order in which nodes are visited. If False, the second
+        element of the result is None and no per-visit memory is used.
+    @param: deadline
+        If given, the search stops once the deadline expires and the result gains a
+        third element, see collect_traversal.
 
     @returns: tuple[ExtensibleList, ExtensibleList]
         1. The ordered path between the origin and the goal in node IDs;
@@ -31,57 +47,95 @@ def dfs_traversal(
         1. TraversalFailure signals that the path between the origin and the target can not be found;
         2. The IDs of all nodes in the order they were visited.
     """
-    # Stores the keys of the nodes in the order they were visited
-    visited_order = ExtensibleList()
-    # Stores the path from the origin to the goal
-    path = Stack()
-    # Stores the nodes that have been visited
-    visited = ExtensibleList(graph.get_num_nodes())
+    return collect_traversal(iter_dfs(graph, origin, goal), record_visits, deadline)
 
-    path_or_failure, visited_order = dfs_helper(
-        graph, origin, goal, visited, visited_order, path
-    )
-    if isinstance(path_or_failure, TraversalFailure):
-        return (path_or_failure, visited_order)
 
-    reversed_path = ExtensibleList()
-    while not path.is_empty():
-        reversed_path.append(path.pop())
+def iter_dfs(
+    graph: Graph[Datum] | LatticeGraph[Datum], origin: int, goal: int
+) -> Generator[int, None, ExtensibleList | TraversalFailure]:
+    """
+    Lazy depth first search. Visits nodes in the same order as dfs_traversal, keeping
+    only the current branch (which doubles as the path) on an explicit stack rather
+    than recursing.
+
+    @param: graph
+        The general graph or lattice graph to process
+    @param: origin
+        The ID of the node from which to start traversal
+    @param: goal
+        The ID of the target node
 
-    return (reversed_path, visited_order)
+    @returns: Generator[int, None, ExtensibleList | TraversalFailure]
+        Yields the IDs of the nodes in the order they are visited. Once exhausted, the
+        generator returns the ordered path between the origin and the goal in node
+        IDs, or TraversalFailure if the path can not be found. Nothing is visited if
+        the graph's component index shows the origin and goal are disconnected.
+    """
+    if not graph.may_connect(origin, goal):
+        return TraversalFailure.DISCONNECTED
 
+    # Stores the nodes that have been visited
+    visited = ExtensibleList(graph.get_num_nodes())
+    # Stores the current branch as (node, remaining neighbours) pairs
+    branch = Stack()
 
-def dfs_helper(
-    graph: Graph[Datum] | LatticeGraph[Datum],
-    origin: int,
-    goal: int,
-    visited: ExtensibleList,
-    visited_order: ExtensibleList,
-    path: Stack,
-) -> tuple[Stack, ExtensibleList] | tuple[TraversalFailure, ExtensibleList]:
     visited.set_at(origin, True)
-    visited_order.append(origin)
-
+    try:
+        yield origin
+    except SearchCancelled:
+        return build_branch_path(branch, origin)
     if origin == goal:
-        path.push(origin)
-        return (path, visited_order)
-
-    for neighbour in reversed(graph.get_neighbours(origin)):
-        neighbour = neighbour.get_id()
-        if not visited.get_at(neighbour):
-            path_or_failure, visited_order = dfs_helper(
-                graph, neighbour, goal, visited, visited_order, path
-            )
-            if isinstance(path_or_failure, Stack):
-                path.push(origin)
-                return (path_or_failure, visited_order)
+        return build_branch_path(branch, origin)
+    branch.push((origin, iter(reversed(graph.get_neighbours(origin)))))
 
-    return (TraversalFailure.DISCONNECTED, visited_order)
+    while not branch.is_empty():
+        _, neighbours = branch.peek()
+        for neighbour in neighbours:
+            neighbour = neighbour.get_id()
+            if not visited.get_at(neighbour):
+                visited.set_at(neighbour, True)
+                try:
+                    yield neighbour
+                except SearchCancelled:
+                    return build_branch_path(branch, neighbour)
+                if neighbour == goal:
+                    return build_branch_path(branch, neighbour)
+                branch.push(
+                    (neighbour, iter(reversed(graph.get_neighbours(neighbour))))
+                )
+                break
+        else:
+            branch.pop()
+
+    return TraversalFailure.DISCONNECTED
+
+
+def build_branch_path(branch: Stack, goal: int) -> ExtensibleList:
+    """
+    Returns the path made of the nodes on the DFS branch followed by the goal.
+    """
+    reversed_path = Stack()
+    reversed_path.push(goal)
+    while not branch.is_empty():
+        reversed_path.push(branch.pop()[0])
+
+    path = ExtensibleList()
+    while not reversed_path.is_empty():
+        path.append(reversed_path.pop())
+    return path
 
 
 def bfs_traversal(
-    graph: Graph[Datum] | LatticeGraph[Datum], origin: int, goal: int
-) -> tuple[ExtensibleList, ExtensibleList] | tuple[TraversalFailure, ExtensibleList]:
+    graph: Graph[Datum] | LatticeGraph[Datum],
+    origin: int,
+    goal: int,
+    record_visits: bool = True,
+    deadline: Optional[Deadline] = None,
+) -> (
+    tuple[ExtensibleList, Optional[ExtensibleList]]
+    | tuple[TraversalFailure, Optional[ExtensibleList]]
+    | tuple[ExtensibleList | TraversalFailure, Optional[ExtensibleList], bool]
+):
     """
     Task 2.1: Breadth First Search
 
@@ -91,6 +145,12 @@ def bfs_traversal(
         The ID of the node from which to start traversal
     @param: goal
         The ID of the target node
+    @param: record_visits
+        Whether to record the order in which nodes are visited. If False, the second
+        element of the result is None and no per-visit memory is used.
+    @param: deadline
+        If given, the search stops once the deadline expires and the result gains a
+        third element, see collect_traversal.
 
     @returns: tuple[ExtensibleList, ExtensibleList]
         1. The ordered path between the origin and the goal in node IDs;
@@ -99,8 +159,31 @@ def bfs_traversal(
         1. TraversalFailure signals that the path between the origin and the target can not be found;
         2. The IDs of all nodes in the order they were visited.
     """
-    # Stores the keys of the nodes in the order they were visited
-    visited_order = ExtensibleList()
+    return collect_traversal(iter_bfs(graph, origin, goal), record_visits, deadline)
+
+
+def iter_bfs(
+    graph: Graph[Datum] | LatticeGraph[Datum], origin: int, goal: int
+) -> Generator[int, None, ExtensibleList | TraversalFailure]:
+    """
+    Lazy breadth first search, visiting nodes in the same order as bfs_traversal.
+
+    @param: graph
+        The general graph or lattice graph to process
+    @param: origin
+        The ID of the node from which to start traversal
+    @param: goal
+        The ID of the target node
+
+    @returns: Generator[int, None, ExtensibleList | TraversalFailure]
+        Yields the IDs of the nodes in the order they are visited. Once exhausted, the
+        generator returns the ordered path between the origin and the goal in node
+        IDs, or TraversalFailure if the path can not be found. Nothing is visited if
+        the graph's component index shows the origin and goal are disconnected.
+    """
+    if not graph.may_connect(origin, goal):
+        return TraversalFailure.DISCONNECTED
+
     # Stores the keys of the nodes that have been visited
     visited = ExtensibleList(graph.get_num_nodes())
     # Stores the parent of each node
@@ -112,7 +195,12 @@ def bfs_traversal(
     while not queue.is_empty():
         node = queue.remove_min()
         visited.set_at(node, True)
-        visited_order.append(node)
+        try:
+            yield node
+        except SearchCancelled:
+            return build_path(
+                parents, origin, closest_visited(graph, visited, goal, node)
+            )
 
         if node == goal:
             break
@@ -123,24 +211,22 @@ def bfs_traversal(
                 queue.insert_fifo(neighbour)
                 parents.insert_kv(neighbour, node)
     else:
-        return (TraversalFailure.DISCONNECTED, visited_order)
+        return TraversalFailure.DISCONNECTED
 
-    stack = Stack()
-    while node != origin:
-        stack.push(node)
-        node = parents.find(node)
-
-    path = ExtensibleList()
-    path.append(origin)
-    while not stack.is_empty():
-        path.append(stack.pop())
-
-    return (path, visited_order)
+    return build_path(parents, origin, node)
 
 
 def greedy_traversal(
-    graph: LatticeGraph[Datum], origin: int, goal: int
-) -> tuple[ExtensibleList, ExtensibleList] | tuple[TraversalFailure, ExtensibleList]:
+    graph: LatticeGraph[Datum],
+    origin: int,
+    goal: int,
+    record_visits: bool = True,
+    deadline: Optional[Deadline] = None,
+) -> (
+    tuple[ExtensibleList, Optional[ExtensibleList]]
+    | tuple[TraversalFailure, Optional[ExtensibleList]]
+    | tuple[ExtensibleList | TraversalFailure, Optional[ExtensibleList], bool]
+):
     """
     Task 2.2: Greedy Traversal
 
@@ -150,6 +236,12 @@ def greedy_traversal(
         The ID of the node from which to start traversal
     @param: goal
         The ID of the target node
+    @param: record_visits
+        Whether to record the order in which nodes are visited. If False, the second
+        element of the result is None and no per-visit memory is used.
+    @param: deadline
+        If given, the search stops once the deadline expires and the result gains a
+        third element, see collect_traversal.
 
     @returns: tuple[ExtensibleList, ExtensibleList]
         1. The ordered path between the origin and the goal in node IDs;
@@ -158,8 +250,31 @@ def greedy_traversal(
         1. TraversalFailure signals that the path between the origin and the target can not be found;
         2. The IDs of all nodes in the order they were visited.
     """
-    # Stores the keys of the nodes in the order they were visited
-    visited_order = ExtensibleList()
+    return collect_traversal(iter_greedy(graph, origin, goal), record_visits, deadline)
+
+
+def iter_greedy(
+    graph: LatticeGraph[Datum], origin: int, goal: int
+) -> Generator[int, None, ExtensibleList | TraversalFailure]:
+    """
+    Lazy greedy traversal, visiting nodes in the same order as greedy_traversal.
+
+    @param: graph
+        The lattice graph to process
+    @param: origin
+        The ID of the node from which to start traversal
+    @param: goal
+        The ID of the target node
+
+    @returns: Generator[int, None, ExtensibleList | TraversalFailure]
+        Yields the IDs of the nodes in the order they are visited. Once exhausted, the
+        generator returns the ordered path between the origin and the goal in node
+        IDs, or TraversalFailure if the path can not be found. Nothing is visited if
+        the graph's component index shows the origin and goal are disconnected.
+    """
+    if not graph.may_connect(origin, goal):
+        return TraversalFailure.DISCONNECTED
+
     # Stores the keys of the nodes that have been visited
     visited = ExtensibleList(graph.get_num_nodes())
     # Stores the parent of each node
@@ -171,7 +286,12 @@ def greedy_traversal(
     while not queue.is_empty():
         node = queue.remove_min()
         visited.set_at(node, True)
-        visited_order.append(node)
+        try:
+            yield node
+        except SearchCancelled:
+            return build_path(
+                parents, origin, closest_visited(graph, visited, goal, node)
+            )
 
         if node == goal:
             break
@@ -188,19 +308,9 @@ def greedy_traversal(
                 )
                 parents.insert_kv(neighbour, node)
     else:
-        return (TraversalFailure.DISCONNECTED, visited_order)
+        return TraversalFailure.DISCONNECTED
 
-    stack = Stack()
-    while node != origin:
-        stack.push(node)
-        node = parents.find(node)
-
-    path = ExtensibleList()
-    path.append(origin)
-    while not stack.is_empty():
-        path.append(stack.pop())
-
-    return (path, visited_order)
+    return build_path(parents, origin, node)
 
 
 def distance(p: tuple[int, int], q: tuple[int, int]) -> float:
@@ -212,8 +322,16 @@ def distance(p: tuple[int, int], q: tuple[int, int]) -> float:
 
 
 def max_traversal(
-    graph: LatticeGraph[Datum], origin: int, goal: int
-) -> tuple[ExtensibleList, ExtensibleList] | tuple[TraversalFailure, ExtensibleList]:
+    graph: LatticeGraph[Datum],
+    origin: int,
+    goal: int,
+    record_visits: bool = True,
+    deadline: Optional[Deadline] = None,
+) -> (
+    tuple[ExtensibleList, Optional[ExtensibleList]]
+    | tuple[TraversalFailure, Optional[ExtensibleList]]
+    | tuple[ExtensibleList | TraversalFailure, Optional[ExtensibleList], bool]
+):
     """
     Task 2.3: Maximize vertex visits traversal
 
@@ -223,6 +341,12 @@ def max_traversal(
         The ID of the node from which to start traversal
     @param: goal
         The ID of the target node
+    @param: record_visits
+        Whether to record the order in which nodes are visited. If False, the second
+        element of the result is None and no per-visit memory is used.
+    @param: deadline
+        If given, the search stops once the deadline expires and the result gains a
+        third element, see collect_traversal.
 
     @returns: tuple[ExtensibleList, ExtensibleList]
         1. The ordered path between the origin and the goal in node IDs;
@@ -231,8 +355,31 @@ def max_traversal(
         1. TraversalFailure signals that the path between the origin and the target can not be found;
         2. The IDs of all nodes in the order they were visited.
     """
-    # Stores the keys of the nodes in the order they were visited
-    visited_order = ExtensibleList()
+    return collect_traversal(iter_max(graph, origin, goal), record_visits, deadline)
+
+
+def iter_max(
+    graph: LatticeGraph[Datum], origin: int, goal: int
+) -> Generator[int, None, ExtensibleList | TraversalFailure]:
+    """
+    Lazy maximum traversal, visiting nodes in the same order as max_traversal.
+
+    @param: graph
+        The lattice graph to process
+    @param: origin
+        The ID of the node from which to start traversal
+    @param: goal
+        The ID of the target node
+
+    @returns: Generator[int, None, ExtensibleList | TraversalFailure]
+        Yields the IDs of the nodes in the order they are visited. Once exhausted, the
+        generator returns the ordered path between the origin and the goal in node
+        IDs, or TraversalFailure if the path can not be found. Nothing is visited if
+        the graph's component index shows the origin and goal are disconnected.
+    """
+    if not graph.may_connect(origin, goal):
+        return TraversalFailure.DISCONNECTED
+
     # Stores the keys of the nodes that have been visited
     visited = ExtensibleList(graph.get_num_nodes())
     # Stores the parent of each node
@@ -244,7 +391,12 @@ def max_traversal(
     while not queue.is_empty():
         node = queue.remove_min()
         visited.set_at(node, True)
-        visited_order.append(node)
+        try:
+            yield node
+        except SearchCancelled:
+            return build_path(
+                parents, origin, closest_visited(graph, visited, goal, node)
+            )
 
         if node == goal:
             break
@@ -264,16 +416,313 @@ def max_traversal(
                     )
                 parents.insert_kv(neighbour, node)
     else:
+        return TraversalFailure.DISCONNECTED
+
+    return build_path(parents, origin, node)
+
+
+def bitset_bfs_traversal(
+    graph: LatticeGraph[Datum],
+    origin: int,
+    goal: int,
+    record_visits: bool = True,
+) -> (
+    tuple[ExtensibleList, Optional[ExtensibleList]]
+    | tuple[TraversalFailure, Optional[ExtensibleList]]
+):
+    """
+    Bit-parallel breadth first search over a lattice. Each BFS layer is a bitmask
+    over the whole lattice (see LatticeGraph.get_cell_mask), and the next layer is
+    the current one shifted one cell in each direction, masked by the connected
+    cells not yet visited. The path is recovered by walking back from the goal
+    through the layers. Assumes adjacent connected cells are linked to each other,
+    as in lattices loaded with from_file; otherwise falls back to bfs_traversal.
+
+    @param: graph
+        The lattice graph to process
+    @param: origin
+        The ID of the node from which to start traversal
+    @param: goal
+        The ID of the target node
+    @param: record_visits
+        Whether to record the visited nodes. If True, they are listed layer by layer,
+        which costs one pass over every layer's bits; if False, the second element
+        of the result is None.
+
+    @returns: tuple[ExtensibleList, ExtensibleList]
+        1. A shortest path between the origin and the goal in node IDs;
+        2. The IDs of all nodes visited, in order of distance from the origin.
+    @returns: tuple[TraversalFailure, ExtensibleList]
+        1. TraversalFailure signals that the path between the origin and the target can not be found;
+        2. The IDs of all nodes visited, in order of distance from the origin.
+    """
+    visited_order = ExtensibleList() if record_visits else None
+    if not graph.may_connect(origin, goal):
+        return (TraversalFailure.DISCONNECTED, visited_order)
+
+    cells, stride = graph.get_cell_mask()
+    row, col = graph.get_node(origin).get_coordinates()
+    frontier = 1 << (row * stride + col)
+    row, col = graph.get_node(goal).get_coordinates()
+    target = 1 << (row * stride + col)
+
+    visited = frontier
+    layers = ExtensibleList()
+    layers.append(frontier)
+    while not frontier & target:
+        frontier = (
+            (frontier << 1)
+            | (frontier >> 1)
+            | (frontier << stride)
+            | (frontier >> stride)
+        ) & cells
+        frontier &= ~visited
+        if not frontier:
+            break
+        visited |= frontier
+        layers.append(frontier)
+
+    if record_visits:
+        for i in range(layers.get_size()):
+            bits = bin(layers[i])[:1:-1]
+            bit = bits.find("1")
+            while bit != -1:
+                visited_order.append(
+                    graph.get_node_at(bit // stride, bit % stride).get_id()
+                )
+                bit = bits.find("1", bit + 1)
+
+    if not frontier & target:
         return (TraversalFailure.DISCONNECTED, visited_order)
 
+    # Walk back from the goal, stepping to any neighbour in the previous layer
+    stack = Stack()
+    node = graph.get_node(goal)
+    stack.push(goal)
+    for i in range(layers.get_size() - 2, -1, -1):
+        for adj in node.get_adjacent():
+            row, col = adj.get_coordinates()
+            if layers[i] >> (row * stride + col) & 1:
+                node = adj
+                break
+        else:
+            # The lattice's links do not match its geometry
+            return bfs_traversal(graph, origin, goal, record_visits)
+        stack.push(node.get_id())
+
+    path = ExtensibleList()
+    while not stack.is_empty():
+        path.append(stack.pop())
+    return (path, visited_order)
+
+
+def nearest_goals_traversal(
+    graph: Graph[Datum] | LatticeGraph[Datum],
+    origin: int,
+    goals: Iterable[int],
+    k: int = 1,
+    record_visits: bool = True,
+) -> (
+    tuple[ExtensibleList, Optional[ExtensibleList]]
+    | tuple[TraversalFailure, Optional[ExtensibleList]]
+):
+    """
+    Multi-goal breadth first search: finds the k goals nearest to the origin (by
+    number of edges) with a single shared frontier, so a query over many goals costs
+    about as much as a query for the nearest one.
+
+    @param: graph
+        The general graph or lattice graph to process
+    @param: origin
+        The ID of the node from which to start traversal
+    @param: goals
+        The IDs of the candidate goal nodes
+    @param: k
+        The number of goals to find; the search stops once the k-th is reached
+    @param: record_visits
+        Whether to record the order in which nodes are visited. If False, the second
+        element of the result is None and no per-visit memory is used.
+
+    @returns: tuple[ExtensibleList, ExtensibleList]
+        1. Up to k Entry(goal ID, path) pairs, nearest goal first, where each path is
+           the ordered path between the origin and that goal in node IDs;
+        2. The IDs of all nodes in the order they were visited.
+    @returns: tuple[TraversalFailure, ExtensibleList]
+        1. TraversalFailure signals that none of the goals can be reached;
+        2. The IDs of all nodes in the order they were visited.
+    """
+    return collect_traversal(iter_nearest_goals(graph, origin, goals, k), record_visits)
+
+
+def iter_nearest_goals(
+    graph: Graph[Datum] | LatticeGraph[Datum],
+    origin: int,
+    goals: Iterable[int],
+    k: int = 1,
+) -> Generator[int, None, ExtensibleList | TraversalFailure]:
+    """
+    Lazy multi-goal breadth first search, see nearest_goals_traversal.
+
+    @param: graph
+        The general graph or lattice graph to process
+    @param: origin
+        The ID of the node from which to start traversal
+    @param: goals
+        The IDs of the candidate goal nodes
+    @param: k
+        The number of goals to find
+
+    @returns: Generator[int, None, ExtensibleList | TraversalFailure]
+        Yields the IDs of the nodes in the order they are visited. Once exhausted, the
+        generator returns up to k Entry(goal ID, path) pairs, nearest goal first, or
+        TraversalFailure if none of the goals can be reached.
+    """
+    graph_size = graph.get_num_nodes()
+    # Marks the goals which could be reached, see Graph.may_connect; on a directed
+    # graph (or after edges were removed) some of them may still be unreachable
+    is_goal = ExtensibleList(graph_size)
+    reachable = 0
+    for goal in goals:
+        if not is_goal[goal] and graph.may_connect(origin, goal):
+            is_goal[goal] = True
+            reachable += 1
+    wanted = min(k, reachable)
+    if wanted == 0:
+        return TraversalFailure.DISCONNECTED
+
+    # Stores the nodes that have been discovered
+    visited = ExtensibleList(graph_size)
+    # Stores the parent of each discovered node
+    parents = ExtensibleList(graph_size)
+    found = ExtensibleList()
+
+    queue = PriorityQueue()
+    queue.insert_fifo(origin)
+    visited.set_at(origin, True)
+
+    while not queue.is_empty():
+        node = queue.remove_min()
+        yield node
+
+        if is_goal[node]:
+            found.append(Entry(node, build_path(parents, origin, node)))
+            if found.get_size() == wanted:
+                break
+
+        for neighbour in graph.get_neighbour_ids(node):
+            if not visited.get_at(neighbour):
+                visited.set_at(neighbour, True)
+                parents.set_at(neighbour, node)
+                queue.insert_fifo(neighbour)
+
+    if found.is_empty():
+        return TraversalFailure.DISCONNECTED
+    return found
+
+
+def collect_traversal(
+    visits: Generator[int, None, ExtensibleList | TraversalFailure],
+    record_visits: bool,
+    deadline: Optional[Deadline] = None,
+) -> (
+    tuple[ExtensibleList, Optional[ExtensibleList]]
+    | tuple[TraversalFailure, Optional[ExtensibleList]]
+    | tuple[ExtensibleList | TraversalFailure, Optional[ExtensibleList], bool]
+):
+    """
+    Drives a lazy traversal to completion, optionally recording the visited order.
+
+    If a deadline is given, it is checked every deadline.get_interval() visits. Once
+    it expires, the traversal is stopped and returns its best partial path: the path
+    to the node closest to the goal found so far (the current branch for depth first
+    search). The result then has a third element, True if the traversal finished and
+    False if it was stopped, in which case the path may not reach the goal.
+    """
+    if deadline is not None:
+        return collect_until(visits, record_visits, deadline)
+
+    # Stores the keys of the nodes in the order they were visited
+    visited_order = ExtensibleList() if record_visits else None
+    while True:
+        try:
+            node = next(visits)
+        except StopIteration as finished:
+            return (finished.value, visited_order)
+        if record_visits:
+            visited_order.append(node)
+
+
+def collect_until(
+    visits: Generator[int, None, ExtensibleList | TraversalFailure],
+    record_visits: bool,
+    deadline: Deadline,
+) -> tuple[ExtensibleList | TraversalFailure, Optional[ExtensibleList], bool]:
+    """
+    Drives a lazy traversal until it finishes or the deadline expires, see
+    collect_traversal.
+    """
+    visited_order = ExtensibleList() if record_visits else None
+    interval = deadline.get_interval()
+    countdown = interval
+    while True:
+        try:
+            node = next(visits)
+        except StopIteration as finished:
+            return (finished.value, visited_order, True)
+        if record_visits:
+            visited_order.append(node)
+
+        countdown -= 1
+        if countdown == 0:
+            countdown = interval
+            if deadline.expired():
+                try:
+                    visits.throw(SearchCancelled())
+                except StopIteration as stopped:
+                    return (stopped.value, visited_order, False)
+
+
+def closest_visited(
+    graph: Graph[Datum] | LatticeGraph[Datum],
+    visited: ExtensibleList,
+    goal: int,
+    last: int,
+) -> int:
+    """
+    Returns the visited node nearest to the goal by Manhattan distance if graph is a
+    lattice, or the last visited node otherwise.
+    """
+    if not isinstance(graph, LatticeGraph):
+        return last
+    target = graph.get_node(goal).get_coordinates()
+    best = last
+    best_distance = distance(graph.get_node(last).get_coordinates(), target)
+    for node in range(visited.get_size()):
+        if visited[node]:
+            node_distance = distance(graph.get_node(node).get_coordinates(), target)
+            if node_distance < best_distance:
+                best, best_distance = node, node_distance
+    return best
+
+
+def build_path(parents: Map | ExtensibleList, origin: int, goal: int) -> ExtensibleList:
+    """
+    Returns the path from the origin to the goal by following the parent of each node
+    back from the goal. Parents may be held in a Map or in an ExtensibleList indexed
+    by node ID. Raises ValueError if the walk runs out of parents before reaching
+    the origin, i.e. the goal was never reached.
+    """
     stack = Stack()
+    node = goal
     while node != origin:
         stack.push(node)
-        node = parents.find(node)
+        node = parents[node]
+        if node is None:
+            raise ValueError(f"Node {goal} was not reached from node {origin}")
 
     path = ExtensibleList()
     path.append(origin)
     while not stack.is_empty():
         path.append(stack.pop())
 
-    return (path, visited_order)
+    return path
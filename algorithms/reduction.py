@@ -0,0 +1,308 @@
+from typing import Generic, Iterable, TypeVar
+
+from structures.m_extensible_list import ExtensibleList
+from structures.m_graph import Graph, LatticeGraph, Node
+from structures.m_pqueue import PriorityQueue
+from structures.m_stack import Stack
+from structures.m_util import TraversalFailure
+
+Datum = TypeVar("Datum")
+
+
+class ReducedLattice(Generic[Datum]):
+    """
+    A preprocessed view of a LatticeGraph for repeated searches between a fixed set
+    of kept cells (e.g. an origin and a goal).
+
+    Dead ends are pruned first: cells with a single open neighbour are removed, and
+    removal repeats until every remaining cell has two or more neighbours or is
+    kept. No path between kept cells passes through a pruned cell. Then every chain
+    of degree 2 cells (a corridor) is contracted into one weighted edge of a reduced
+    Graph whose nodes are the remaining junctions, dead-end tips and kept cells.
+    Each reduced node holds its lattice ID as its data, and each edge remembers the
+    corridor it replaced, so paths found in the reduced graph expand back into
+    lattice IDs.
+
+    The reduction describes the lattice at the version it was built for; check
+    is_valid() after mutating the lattice.
+    """
+
+    def __init__(self, graph: LatticeGraph[Datum], keep: Iterable[int] = ()) -> None:
+        """
+        @param: graph
+            The lattice to reduce
+        @param: keep
+            The IDs of the cells which must survive the reduction as reduced nodes
+        """
+        self._graph = graph
+        self._keep = ExtensibleList()
+        for node in keep:
+            self._keep.append(node)
+        self.build()
+
+    def build(self) -> None:
+        """
+        (Re)build the reduction from the current state of the lattice.
+        """
+        graph = self._graph
+        size = graph.get_num_nodes()
+        self._version = graph.get_version()
+
+        kept = ExtensibleList(size)
+        for i in range(self._keep.get_size()):
+            kept[self._keep[i]] = True
+
+        # Prune dead ends: a cell leaves once fewer than two neighbours remain
+        degrees = ExtensibleList(size)
+        removed = ExtensibleList(size)
+        dead_ends = Stack()
+        self._cells = 0
+        for node in range(size):
+            degrees[node] = len(graph.get_node(node).get_adjacent())
+            if degrees[node] > 0 or kept[node]:
+                self._cells += 1
+            if degrees[node] < 2 and not kept[node]:
+                removed[node] = True
+                dead_ends.push(node)
+        while not dead_ends.is_empty():
+            node = dead_ends.pop()
+            for neighbour in graph.get_node(node).get_adjacent():
+                neighbour = neighbour.get_id()
+                if not removed[neighbour]:
+                    degrees[neighbour] -= 1
+                    if degrees[neighbour] < 2 and not kept[neighbour]:
+                        removed[neighbour] = True
+                        dead_ends.push(neighbour)
+
+        self._pruned = 0
+        for node in range(size):
+            if removed[node] and degrees[node] > 0:
+                self._pruned += 1
+
+        # Every cell that is kept or is not in the middle of a corridor is a junction
+        self._reduced_ids = ExtensibleList(size)
+        self._lattice_ids = ExtensibleList()
+        # Adjacency of the reduced graph, and the (corridor index, reversed) pair
+        # behind each of its edges
+        self._edges = []
+        self._edge_corridors = []
+        for node in range(size):
+            if not removed[node] and (kept[node] or degrees[node] != 2):
+                self.__add_junction(node)
+
+        # Walk every corridor leaving a junction. A corridor is recorded once, from
+        # its end with the smaller lattice ID, and shared by the edges both ways.
+        self._corridors = ExtensibleList()
+        covered = ExtensibleList(size)
+        junction = 0
+        while True:
+            while junction < self._lattice_ids.get_size():
+                self.__walk_corridors(self._lattice_ids[junction], removed, covered)
+                junction += 1
+            # Any corridor cell left uncovered lies on a cycle with no junction at all
+            for node in range(size):
+                if (
+                    not removed[node]
+                    and not covered[node]
+                    and self._reduced_ids[node] is None
+                ):
+                    self.__add_junction(node)
+                    break
+            else:
+                break
+
+        self._contracted = 0
+        for i in range(self._corridors.get_size()):
+            self._contracted += self._corridors[i].get_size()
+
+        nodes = [
+            Node(i, self._lattice_ids[i]) for i in range(self._lattice_ids.get_size())
+        ]
+        self._reduced = Graph(nodes, self._edges, weighted=True)
+
+    def __add_junction(self, node: int) -> None:
+        self._reduced_ids[node] = self._lattice_ids.get_size()
+        self._lattice_ids.append(node)
+        self._edges.append([])
+        self._edge_corridors.append([])
+
+    def __walk_corridors(
+        self, junction: int, removed: ExtensibleList, covered: ExtensibleList
+    ) -> None:
+        graph = self._graph
+        for first in graph.get_node(junction).get_adjacent():
+            previous, node = junction, first.get_id()
+            if removed[node]:
+                continue
+            corridor = ExtensibleList()
+            while self._reduced_ids[node] is None:
+                covered[node] = True
+                corridor.append(node)
+                for adj in graph.get_node(node).get_adjacent():
+                    adj = adj.get_id()
+                    if adj != previous and not removed[adj]:
+                        previous, node = node, adj
+                        break
+            if node == junction or node < junction:
+                # A loop back to the junction, or recorded from the other end
+                continue
+
+            origin = self._reduced_ids[junction]
+            target = self._reduced_ids[node]
+            weight = corridor.get_size() + 1
+            index = self._corridors.get_size()
+            self._corridors.append(corridor)
+            self._edges[origin].append((target, weight))
+            self._edge_corridors[origin].append((index, False))
+            self._edges[target].append((origin, weight))
+            self._edge_corridors[target].append((index, True))
+
+    def is_valid(self) -> bool:
+        """
+        Whether the lattice is unchanged since the reduction was built.
+        """
+        return self._version == self._graph.get_version()
+
+    def get_reduced_graph(self) -> Graph[int]:
+        """
+        Returns the reduced graph. Node i holds the lattice ID it stands for as its
+        data, and edge weights count lattice steps.
+        """
+        return self._reduced
+
+    def get_reduced_id(self, node: int) -> int | None:
+        """
+        Returns the reduced node standing for the given lattice cell, or None if the
+        cell was pruned or contracted into a corridor.
+        """
+        return self._reduced_ids[node]
+
+    def get_lattice_id(self, node: int) -> int:
+        """
+        Returns the lattice cell the given reduced node stands for.
+        """
+        return self._lattice_ids[node]
+
+    def get_num_cells(self) -> int:
+        """
+        Returns the number of open cells of the lattice, i.e. the cells with at least
+        one neighbour.
+        """
+        return self._cells
+
+    def get_num_pruned(self) -> int:
+        """
+        Returns the number of open cells removed as dead ends.
+        """
+        return self._pruned
+
+    def get_num_contracted(self) -> int:
+        """
+        Returns the number of cells contracted into corridor edges.
+        """
+        return self._contracted
+
+    def get_reduction_ratio(self) -> float:
+        """
+        Returns the number of reduced nodes per open cell of the lattice: the smaller
+        the ratio, the less a search over the reduced graph has to expand.
+        """
+        if self._cells == 0:
+            return 1.0
+        return self._lattice_ids.get_size() / self._cells
+
+    def expand_edge(self, origin: int, target: int) -> ExtensibleList:
+        """
+        Returns the lattice cells strictly between two adjacent reduced nodes, in
+        order from origin to target, along the shortest corridor joining them.
+        """
+        best = None
+        neighbours = self._edges[origin]
+        for i in range(len(neighbours)):
+            if neighbours[i][0] == target and (
+                best is None or neighbours[i][1] < neighbours[best][1]
+            ):
+                best = i
+        if best is None:
+            raise ValueError(f"Reduced nodes {origin} and {target} are not adjacent.")
+
+        index, backwards = self._edge_corridors[origin][best]
+        corridor = self._corridors[index]
+        if not backwards:
+            return corridor
+        cells = ExtensibleList()
+        for i in range(corridor.get_size() - 1, -1, -1):
+            cells.append(corridor[i])
+        return cells
+
+    def expand_path(self, path: ExtensibleList) -> ExtensibleList:
+        """
+        Expand a path of reduced node IDs into the path of lattice IDs it stands for.
+        """
+        cells = ExtensibleList()
+        if path.get_size() == 0:
+            return cells
+        cells.append(self._lattice_ids[path[0]])
+        for i in range(1, path.get_size()):
+            corridor = self.expand_edge(path[i - 1], path[i])
+            for j in range(corridor.get_size()):
+                cells.append(corridor[j])
+            cells.append(self._lattice_ids[path[i]])
+        return cells
+
+    def find_path(self, origin: int, goal: int) -> ExtensibleList | TraversalFailure:
+        """
+        Find a shortest path between two kept lattice cells with Dijkstra's algorithm
+        over the reduced graph, then expand it back into lattice IDs.
+
+        @param: origin
+            The lattice ID of the cell from which to start
+        @param: goal
+            The lattice ID of the target cell
+
+        @returns: ExtensibleList
+            The ordered path between the origin and the goal in lattice IDs.
+        @returns: TraversalFailure
+            Signals that the path between the origin and the goal can not be found.
+        """
+        if not self.is_valid():
+            self.build()
+        start = self._reduced_ids[origin]
+        finish = self._reduced_ids[goal]
+        if start is None or finish is None:
+            raise ValueError(
+                f"Cells {origin} and {goal} must both be kept by the reduction."
+            )
+
+        size = self._lattice_ids.get_size()
+        costs = ExtensibleList(size)
+        parents = ExtensibleList(size)
+        costs[start] = 0
+        queue = PriorityQueue()
+        queue.insert(0, (0, start))
+
+        while not queue.is_empty():
+            cost, node = queue.remove_min()
+            if cost != costs[node]:
+                # A stale entry superseded by a cheaper one
+                continue
+            if node == finish:
+                break
+            for neighbour, weight in self._edges[node]:
+                if costs[neighbour] is None or cost + weight < costs[neighbour]:
+                    costs[neighbour] = cost + weight
+                    parents[neighbour] = node
+                    queue.insert(cost + weight, (cost + weight, neighbour))
+        else:
+            return TraversalFailure.DISCONNECTED
+
+        stack = Stack()
+        node = finish
+        while node != start:
+            stack.push(node)
+            node = parents[node]
+        path = ExtensibleList()
+        path.append(start)
+        while not stack.is_empty():
+            path.append(stack.pop())
+        return self.expand_path(path)
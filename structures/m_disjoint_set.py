@@ -0,0 +1,77 @@
+from structures.m_extensible_list import ExtensibleList
+
+
+class DisjointSet:
+    """
+    A disjoint-set (union-find) forest over the integers [0, n) using union by rank
+    and path compression, so each operation costs O(α(n)) amortised. Both operations
+    are iterative, so arbitrarily deep forests are fine.
+    """
+
+    def __init__(self, size: int = 0) -> None:
+        """
+        Construct the forest with every element in [0, size) in its own set.
+        """
+        self._parents = ExtensibleList()
+        self._ranks = ExtensibleList()
+        self._sets = 0
+        self.extend(size)
+
+    def extend(self, size: int) -> None:
+        """
+        Grow the forest so that it covers [0, size), adding each new element in its
+        own set.
+        """
+        for element in range(self._parents.get_size(), size):
+            self._parents.append(element)
+            self._ranks.append(0)
+            self._sets += 1
+
+    def find(self, element: int) -> int:
+        """
+        Return the representative of the set containing element.
+        """
+        parents = self._parents
+        root = element
+        while parents[root] != root:
+            root = parents[root]
+        # Compress the path so every node on it points straight at the root
+        while parents[element] != root:
+            parents[element], element = root, parents[element]
+        return root
+
+    def union(self, a: int, b: int) -> bool:
+        """
+        Merge the sets containing a and b. Returns False if they were already in the
+        same set.
+        """
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return False
+
+        if self._ranks[root_a] < self._ranks[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parents[root_b] = root_a
+        if self._ranks[root_a] == self._ranks[root_b]:
+            self._ranks[root_a] += 1
+        self._sets -= 1
+        return True
+
+    def connected(self, a: int, b: int) -> bool:
+        """
+        Whether a and b are in the same set.
+        """
+        return self.find(a) == self.find(b)
+
+    def get_size(self) -> int:
+        """
+        Returns the number of elements in the forest.
+        """
+        return self._parents.get_size()
+
+    def get_num_sets(self) -> int:
+        """
+        Returns the number of disjoint sets in the forest.
+        """
+        return self._sets
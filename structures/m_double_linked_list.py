@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from typing import Generic, Optional, TypeVar
+
+Datum = TypeVar("Datum")
+
+
+class DoubleNode(Generic[Datum]):
+    """
+    A simple type to hold data as well as next and previous pointers.
+    """
+
+    def __init__(self, data: Datum) -> None:
+        self._data = data
+        self._next = None
+        self._prev = None
+
+    def set_data(self, data: Datum) -> None:
+        self._data = data
+
+    def get_data(self) -> Datum:
+        return self._data
+
+    def set_next(self, node: Optional[DoubleNode[Datum]]) -> None:
+        self._next = node
+
+    def get_next(self) -> Optional[DoubleNode[Datum]]:
+        return self._next
+
+    def set_prev(self, node: Optional[DoubleNode[Datum]]) -> None:
+        self._prev = node
+
+    def get_prev(self) -> Optional[DoubleNode[Datum]]:
+        return self._prev
+
+
+class DoubleLinkedList(Generic[Datum]):
+    """
+    Doubly linked list. Unlike the SingleLinkedList, nodes can be unlinked from any
+    position in constant time given a reference to the node itself.
+    """
+
+    def __init__(self) -> None:
+        self._head = None
+        self._tail = None
+        self._size = 0
+
+    def __str__(self) -> str:
+        """
+        Convert the list to a string
+        """
+        string_rep = ""
+        cur = self.get_head()
+        while cur is not None:
+            string_rep += str(cur.get_data()) + " <-> "
+            cur = cur.get_next()
+        string_rep += "[EOL]"
+        return string_rep
+
+    def get_size(self) -> int:
+        return self._size
+
+    def get_head(self) -> Optional[DoubleNode[Datum]]:
+        return self._head
+
+    def get_tail(self) -> Optional[DoubleNode[Datum]]:
+        return self._tail
+
+    def insert_to_front(self, node: DoubleNode[Datum]) -> None:
+        """
+        Insert a node to the front of the list.
+        """
+        node.set_prev(None)
+        node.set_next(self._head)
+        if self._head is not None:
+            self._head.set_prev(node)
+        else:
+            self._tail = node
+        self._head = node
+        self._size += 1
+
+    def insert_to_back(self, node: DoubleNode[Datum]) -> None:
+        """
+        Insert a node to the back of the list.
+        """
+        node.set_next(None)
+        node.set_prev(self._tail)
+        if self._tail is not None:
+            self._tail.set_next(node)
+        else:
+            self._head = node
+        self._tail = node
+        self._size += 1
+
+    def insert_after(self, node: DoubleNode[Datum], new: DoubleNode[Datum]) -> None:
+        """
+        Insert new directly after a node which is known to be in this list.
+        """
+        nex = node.get_next()
+        new.set_prev(node)
+        new.set_next(nex)
+        node.set_next(new)
+        if nex is not None:
+            nex.set_prev(new)
+        else:
+            self._tail = new
+        self._size += 1
+
+    def remove_node(self, node: DoubleNode[Datum]) -> DoubleNode[Datum]:
+        """
+        Unlink and return a node which is known to be in this list.
+        """
+        prev = node.get_prev()
+        nex = node.get_next()
+        if prev is not None:
+            prev.set_next(nex)
+        else:
+            self._head = nex
+        if nex is not None:
+            nex.set_prev(prev)
+        else:
+            self._tail = prev
+        node.set_next(None)
+        node.set_prev(None)
+        self._size -= 1
+        return node
+
+    def remove_from_front(self) -> Optional[DoubleNode[Datum]]:
+        """
+        Remove and return the front element.
+        """
+        if self._head is None:
+            return None
+        return self.remove_node(self._head)
+
+    def remove_from_back(self) -> Optional[DoubleNode[Datum]]:
+        """
+        Remove and return the back element.
+        """
+        if self._tail is None:
+            return None
+        return self.remove_node(self._tail)
+
+    def move_to_front(self, node: DoubleNode[Datum]) -> None:
+        """
+        Move a node which is known to be in this list to the front.
+        """
+        if node is self._head:
+            return
+        self.remove_node(node)
+        self.insert_to_front(node)
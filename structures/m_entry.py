@@ -1,3 +1,4 @@
+from enum import Enum
 from typing import Generic, TypeVar
 
 from structures.m_util import Hashable
@@ -5,6 +6,36 @@ from structures.m_util import Hashable
 Key = TypeVar("Key")
 Value = TypeVar("Value")
 
+HASH_BASE: int = 31
+"""Multiplier used by the polynomial rolling hash."""
+
+HASH_MODULUS: int = (1 << 61) - 1
+"""Mersenne prime modulus keeping polynomial hashes bounded."""
+
+
+def hash_key(key) -> int:
+    """
+    Returns an integer hash for the key types used throughout the project: integers
+    (including booleans), strings, None, enumerations and tuples of these.
+    """
+    if key is None:
+        return 0
+    if isinstance(key, int):
+        return key
+    if isinstance(key, str):
+        result = 0
+        for character in key:
+            result = (result * HASH_BASE + ord(character)) % HASH_MODULUS
+        return result
+    if isinstance(key, tuple):
+        result = len(key)
+        for item in key:
+            result = (result * HASH_BASE + hash_key(item)) % HASH_MODULUS
+        return result
+    if isinstance(key, Enum):
+        return hash_key(key.value)
+    raise TypeError(f"Can not hash key of type {type(key).__name__}")
+
 
 class Entry(Hashable, Generic[Key, Value]):
     """
@@ -54,8 +85,12 @@ class Entry(Hashable, Generic[Key, Value]):
         function, but rather, you need to make your own. You are welcome to use existing
         functions, but you need to implement it here (and cite it in your
         report/statement file).
+
+        Integer keys hash to themselves, strings use a polynomial rolling hash over
+        their code points, and tuples combine the hashes of their items in the same
+        polynomial fashion so that composite keys (e.g. cache keys) can be stored.
         """
-        return self.get_key()
+        return hash_key(self.get_key())
 
     def __str__(self) -> str:
         return f"({self._key} -> {self._value})"
@@ -47,9 +47,8 @@ class ExtensibleList(Generic[Datum]):
         """
         self._capacity *= 2
         new_list = [None] * self._capacity
-        # Copy elements
-        for i in range(self._size):
-            new_list[i] = self._data[i]
+        # Copy elements (a slice assignment is a single memory move)
+        new_list[: self._size] = self._data[: self._size]
         # Update reference
         self._data = new_list
 
@@ -69,9 +68,12 @@ class ExtensibleList(Generic[Datum]):
 
     def __getitem__(self, index: int) -> Optional[Datum]:
         """
-        Alternative for get_at.
+        Alternative for get_at. The bounds check is inlined as this is the hottest
+        method in the project.
         """
-        return self.get_at(index)
+        if 0 <= index < self._size:
+            return self._data[index]
+        return None
 
     def set_at(self, index: int, element: Datum) -> None:
         """
@@ -83,9 +85,10 @@ class ExtensibleList(Generic[Datum]):
 
     def __setitem__(self, index: int, element: Datum) -> None:
         """
-        Alternative for set_at.
+        Alternative for set_at, with the bounds check inlined like __getitem__.
         """
-        self.set_at(index, element)
+        if 0 <= index < self._size:
+            self._data[index] = element
 
     def append(self, element: Datum) -> None:
         """
@@ -106,9 +109,9 @@ class ExtensibleList(Generic[Datum]):
         if self._capacity == self._size:
             self.__resize()
 
+        # Shuffle the items after index up by one in a single memory move
+        self._data[index + 1 : self._size + 1] = self._data[index : self._size]
         self._size += 1
-        for i in range(self._size - 1, index, -1):
-            self._data[i] = self._data[i - 1]
 
         self._data[index] = element
 
@@ -142,9 +145,8 @@ class ExtensibleList(Generic[Datum]):
         if index >= 0 and index < self._size:
             # Get the element
             elem = self._data[index]
-            # Now shuffle all items back
-            for i in range(index, self._size - 1):
-                self._data[i] = self._data[i + 1]
+            # Now shuffle all items back in a single memory move
+            self._data[index : self._size - 1] = self._data[index + 1 : self._size]
             # Fix the last element
             self._data[self._size - 1] = None
             self._size -= 1
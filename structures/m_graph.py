@@ -6,8 +6,14 @@ from __future__ import annotations
 
 import random
 import re
+from itertools import count
 from pathlib import Path
-from typing import Generic, Optional, TypeVar
+from typing import Any, Callable, Generator, Generic, Optional, TypeVar
+
+from structures.m_disjoint_set import DisjointSet
+from structures.m_extensible_list import ExtensibleList
+from structures.m_map import Map
+from structures.m_stack import Stack
 
 Datum = TypeVar("Datum")
 
@@ -16,6 +22,12 @@ Weighted = tuple[Unweighted, int]
 
 MaybeWeighted = Unweighted | Weighted
 
+_graph_uids = count()
+"""Source of identifiers which are unique to each graph created by this process."""
+
+CHANGE_LOG_LIMIT: int = 4096
+"""Number of changes a graph remembers before forgetting the oldest half."""
+
 
 class Node(Generic[Datum]):
     """
@@ -57,6 +69,10 @@ class LatticeNode(Node, Generic[Datum]):
         self._east = east
         self._south = south
         self._west = west
+        # The LatticeGraph owning this node, notified when the node is disconnected
+        self._graph = None
+        # Whether the node has been disconnected (closed) and not reconnected since
+        self._closed = False
 
     def get_coordinates(self) -> tuple[int, int]:
         """
@@ -99,7 +115,24 @@ class LatticeNode(Node, Generic[Datum]):
     def id_from_coordinates(self, rows: int) -> int:
         return self._col * rows + self._row
 
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def __getstate__(self) -> dict:
+        # Pickling the neighbours themselves would recurse from cell to cell across
+        # the whole lattice. Inside a graph, store their IDs instead; the graph
+        # links them back up when it is unpickled (see LatticeGraph.__setstate__).
+        state = self.__dict__.copy()
+        if self._graph is not None:
+            for side in ("_north", "_east", "_south", "_west"):
+                if state[side] is not None:
+                    state[side] = state[side].get_id()
+        return state
+
     def disconnect(self) -> None:
+        former = [adj.get_id() for adj in self.get_adjacent()]
+        self._closed = True
+
         if self._north is not None:
             self._north._south = None
             self._north = None
@@ -116,6 +149,9 @@ class LatticeNode(Node, Generic[Datum]):
             self._west._east = None
             self._west = None
 
+        if self._graph is not None:
+            self._graph.mark_split(self._id, *former)
+
 
 class Graph(Generic[Datum]):
     def __init__(
@@ -127,6 +163,35 @@ class Graph(Generic[Datum]):
         self._nodes = nodes if nodes is not None else []
         self._edges = edges if edges is not None else []
         self._weighted = weighted
+        self._uid = next(_graph_uids)
+        self._version = 0
+        # Stores (version, node ID) pairs describing each mutation, see mark_modified
+        self._changes = ExtensibleList()
+        # Changes made up to and including this version may have been forgotten
+        self._changes_floor = 0
+        # Union-find forest over the (weak) components. It is exact while
+        # _forest_exact is current, and joins at least every connected pair of nodes
+        # while _forest_version is current, see mark_joined and mark_split
+        self._forest = None
+        self._forest_version = -1
+        self._forest_exact = -1
+        # Component label of each node, valid while _components_version is current
+        self._components = None
+        self._components_version = -1
+        # Strong component label of each node, valid while _strong_version is current
+        self._strong = None
+        self._strong_version = -1
+        # Core number of each node, valid while _cores_version is current
+        self._cores = None
+        self._cores_version = -1
+        # Number of adjacency list entries, valid while _num_edges_version is current
+        self._num_edges = 0
+        self._num_edges_version = -1
+        # Whether any edge weight is negative, valid while _negative_version is current
+        self._negative = False
+        self._negative_version = -1
+        # Indexes built by other modules, each a (version, index) pair, see get_derived
+        self._derived = Map()
         if not self._weighted:
             for i in range(len(self._edges)):
                 self._edges[i] = [
@@ -145,6 +210,157 @@ class Graph(Generic[Datum]):
     def get_num_nodes(self) -> int:
         return len(self._nodes)
 
+    def get_num_edges(self) -> int:
+        """
+        Returns the number of adjacency list entries, i.e. directed edges; every
+        undirected edge counts twice. Counted once per version of the graph.
+        """
+        if self._num_edges_version != self._version:
+            self._num_edges = sum(len(neighbours) for neighbours in self._edges)
+            self._num_edges_version = self._version
+        return self._num_edges
+
+    def has_negative_weights(self) -> bool:
+        """
+        Whether any edge has a negative weight, in which case Dijkstra's algorithm
+        does not apply. Checked once per version of the graph.
+        """
+        if self._negative_version != self._version:
+            self._negative = any(
+                weight < 0 for neighbours in self._edges for _, weight in neighbours
+            )
+            self._negative_version = self._version
+        return self._negative
+
+    def get_derived(self, name: str, build: Callable[[Graph[Datum]], Any]) -> Any:
+        """
+        Returns an index over the graph which is built elsewhere, e.g. the Johnson
+        potentials of algorithms.airlines: build(self) the first time name is asked
+        for after the graph changes, and cached under name until the next change.
+        Being held by the graph, the index reaches worker processes along with it.
+        """
+        cached = self._derived.find(name)
+        if cached is None or cached[0] != self._version:
+            cached = (self._version, build(self))
+            self._derived.insert_kv(name, cached)
+        return cached[1]
+
+    def get_uid(self) -> int:
+        """
+        Returns an identifier unique to this graph among all graphs created by this
+        process. Unlike id(), it is never reused once the graph is garbage collected.
+        """
+        return self._uid
+
+    def get_version(self) -> int:
+        """
+        Returns a counter which increases every time the graph is mutated, so that
+        anything derived from the graph can tell whether it is stale.
+        """
+        return self._version
+
+    def mark_modified(self, *nodes: int) -> None:
+        """
+        Record that the graph has been mutated. Called by every mutating method; call
+        it yourself after changing the graph's internals directly.
+
+        @param: nodes
+            The IDs of the nodes whose adjacency changed. Pass none if the change can
+            not be localised, e.g. the whole graph was reloaded.
+        """
+        self._version += 1
+        if len(nodes) == 0:
+            self._changes.append((self._version, None))
+        for node in nodes:
+            self._changes.append((self._version, node))
+
+        size = self._changes.get_size()
+        if size > CHANGE_LOG_LIMIT:
+            kept = self._changes.copy(size - CHANGE_LOG_LIMIT // 2, size)
+            # The oldest kept version may have lost some of its entries
+            self._changes_floor = kept[0][0]
+            self._changes = kept
+
+    def mark_joined(self, index: int, *linked: int) -> None:
+        """
+        Record that the graph has been mutated only by adding the node index, or
+        edges between it and each of linked. Such a change can only merge
+        components, so the component forest is updated in place rather than rebuilt
+        on the next query.
+        """
+        current = self._forest_version == self._version
+        exact = self._forest_exact == self._version
+        self.mark_modified(index, *linked)
+        if current:
+            self._forest.extend(self.get_num_nodes())
+            for node in linked:
+                self._forest.union(index, node)
+            self._forest_version = self._version
+            if exact:
+                self._forest_exact = self._version
+
+    def mark_split(self, *nodes: int) -> None:
+        """
+        Record that the graph has been mutated only by removing edges between the
+        given nodes. Such a change can only split components: the component forest
+        stops being exact, but may_connect can keep using it until it is rebuilt.
+        """
+        current = self._forest_version == self._version
+        self.mark_modified(*nodes)
+        if current:
+            self._forest_version = self._version
+
+    def get_changes_since(self, version: int) -> Optional[ExtensibleList[int]]:
+        """
+        Returns the IDs of the nodes whose adjacency changed after the given version,
+        possibly with repeats, or None if some change since then was not localised
+        or has been forgotten.
+        """
+        if version < self._changes_floor:
+            return None
+        changed = ExtensibleList()
+        i = self._changes.get_size() - 1
+        while i >= 0 and self._changes[i][0] > version:
+            node = self._changes[i][1]
+            if node is None:
+                return None
+            changed.append(node)
+            i -= 1
+        return changed
+
+    def add_node(self, data: Optional[Datum] = None) -> int:
+        """
+        Add an isolated node holding data and return its ID.
+        """
+        index = len(self._nodes)
+        self._nodes.append(Node(index, data))
+        self._edges.append([])
+        self.mark_joined(index)
+        return index
+
+    def add_edge(self, origin: int, target: int, weight: int = 1) -> None:
+        """
+        Add a directed edge from origin to target. Add the reverse edge as well to
+        model an undirected graph.
+        """
+        if target < 0 or target >= len(self._nodes):
+            raise ValueError(f"No node has ID {target} but an edge refers to it.")
+        self._edges[origin].append((target, weight))
+        self.mark_joined(origin, target)
+
+    def remove_edge(self, origin: int, target: int) -> bool:
+        """
+        Remove one directed edge from origin to target. Returns whether such an edge
+        existed.
+        """
+        neighbours = self._edges[origin]
+        for i in range(len(neighbours)):
+            if neighbours[i][0] == target:
+                del neighbours[i]
+                self.mark_split(origin, target)
+                return True
+        return False
+
     def get_node(self, index: int) -> Optional[Node[Datum]]:
         try:
             return self._nodes[index]
@@ -160,6 +376,218 @@ class Graph(Generic[Datum]):
         else:
             return [self._nodes[neighbour] for neighbour, _ in self._edges[index]]
 
+    def get_neighbour_ids(self, index: int) -> list[int]:
+        """
+        Returns the IDs of the nodes adjacent to the node with the given ID.
+        """
+        return [neighbour for neighbour, _ in self._edges[index]]
+
+    def iter_edges(self) -> Generator[tuple[int, int, int], None, None]:
+        """
+        Yields (origin, target, weight) for every edge, grouped by origin in order of
+        node ID.
+        """
+        for origin in range(len(self._edges)):
+            for target, weight in self._edges[origin]:
+                yield (origin, target, weight)
+
+    def get_component(self, index: int) -> int:
+        """
+        Returns the label of the (weakly) connected component containing the node with
+        the given ID. Labels are dense integers starting at 0.
+        """
+        return self.get_component_index()[index]
+
+    def same_component(self, a: int, b: int) -> bool:
+        """
+        Whether the nodes with IDs a and b lie in the same (weakly) connected
+        component. If not, no path can exist between them in either direction.
+        """
+        return self.__get_forest(exact=True).connected(a, b)
+
+    def may_connect(self, a: int, b: int) -> bool:
+        """
+        A cheaper same_component for pruning searches: False only if no path can
+        exist between the nodes with IDs a and b, but possibly True for nodes which
+        were split apart by edges removed since the component forest was last
+        rebuilt. Removing edges therefore costs nothing until an exact answer is
+        needed.
+        """
+        return self.__get_forest(exact=False).connected(a, b)
+
+    def get_component_index(self) -> ExtensibleList[int]:
+        """
+        Returns the component label of every node, indexed by node ID. The labels are
+        read off the component forest the first time they are needed after the graph
+        changes, and cached until the next change.
+        """
+        if self._components_version != self._version:
+            self._components = self.__label_components(self.__get_forest(exact=True))
+            self._components_version = self._version
+        return self._components
+
+    def __get_forest(self, exact: bool) -> DisjointSet:
+        """
+        Returns the union-find forest of the components, exact or possibly joining
+        nodes which have since been split apart. It is built with a pass over every
+        edge when no such forest is current, i.e. after edges are removed if exact,
+        or after a change neither mark_joined nor mark_split records, and kept up to
+        date through them otherwise.
+        """
+        current = self._forest_exact if exact else self._forest_version
+        if current != self._version:
+            size = self.get_num_nodes()
+            self._forest = DisjointSet(size)
+            for node in range(size):
+                for neighbour in self.get_neighbour_ids(node):
+                    self._forest.union(node, neighbour)
+            self._forest_version = self._version
+            self._forest_exact = self._version
+        return self._forest
+
+    def __label_components(self, forest: DisjointSet) -> ExtensibleList[int]:
+        size = self.get_num_nodes()
+        # Relabel the roots as 0, 1, 2, ... in order of first appearance
+        labels = ExtensibleList(size)
+        components = ExtensibleList(size)
+        next_label = 0
+        for node in range(size):
+            root = forest.find(node)
+            if labels[root] is None:
+                labels[root] = next_label
+                next_label += 1
+            components[node] = labels[root]
+        return components
+
+    def get_strong_component_index(self) -> ExtensibleList[int]:
+        """
+        Returns the label of the strongly connected component of every node, indexed
+        by node ID: two nodes share a label exactly when each can reach the other.
+        Labels are dense integers starting at 0, in reverse topological order of the
+        components. The index is built with Tarjan's algorithm in O(V + E) the first
+        time it is needed after the graph changes, and cached until the next change.
+        """
+        if self._strong_version != self._version:
+            self._strong = self.__build_strong_component_index()
+            self._strong_version = self._version
+        return self._strong
+
+    def __build_strong_component_index(self) -> ExtensibleList[int]:
+        size = self.get_num_nodes()
+        order = ExtensibleList(size)
+        lowest = ExtensibleList(size)
+        open_nodes = ExtensibleList(size)
+        components = ExtensibleList(size)
+        members = Stack()
+        # (node, index of the next adjacency list entry to visit) per active call
+        calls = Stack()
+        counter = 0
+        label = 0
+
+        for root in range(size):
+            if order[root] is not None:
+                continue
+            order[root] = lowest[root] = counter
+            counter += 1
+            members.push(root)
+            open_nodes[root] = True
+            calls.push((root, 0))
+
+            while not calls.is_empty():
+                node, position = calls.pop()
+                neighbours = self._edges[node]
+                descended = False
+                while position < len(neighbours):
+                    neighbour = neighbours[position][0]
+                    position += 1
+                    if order[neighbour] is None:
+                        calls.push((node, position))
+                        order[neighbour] = lowest[neighbour] = counter
+                        counter += 1
+                        members.push(neighbour)
+                        open_nodes[neighbour] = True
+                        calls.push((neighbour, 0))
+                        descended = True
+                        break
+                    if open_nodes[neighbour] and order[neighbour] < lowest[node]:
+                        lowest[node] = order[neighbour]
+                if descended:
+                    continue
+
+                if lowest[node] == order[node]:
+                    # node is the root of a component made of the members above it
+                    while True:
+                        member = members.pop()
+                        open_nodes[member] = False
+                        components[member] = label
+                        if member == node:
+                            break
+                    label += 1
+                if not calls.is_empty():
+                    parent = calls.peek()[0]
+                    if lowest[node] < lowest[parent]:
+                        lowest[parent] = lowest[node]
+        return components
+
+    def get_core_numbers(self) -> ExtensibleList[int]:
+        """
+        Returns the core number of every node, indexed by node ID: the largest k such
+        that the node lies in the k-core, the largest subgraph in which every node
+        has degree k or more (degrees count adjacency list entries). The index is
+        built with the Batagelj-Zaversnik bucket algorithm in O(V + E) the first time
+        it is needed after the graph changes, and cached until the next change.
+        """
+        if self._cores_version != self._version:
+            self._cores = self.__build_core_index()
+            self._cores_version = self._version
+        return self._cores
+
+    def __build_core_index(self) -> ExtensibleList[int]:
+        size = self.get_num_nodes()
+        degrees = ExtensibleList(size)
+        max_degree = 0
+        for node in range(size):
+            degrees[node] = len(self.get_neighbour_ids(node))
+            max_degree = max(max_degree, degrees[node])
+
+        # Bucket sort the nodes by degree: order holds the nodes, positions the
+        # index of each node in order, and starts the first index of each degree
+        starts = ExtensibleList(max_degree + 1)
+        for degree in range(max_degree + 1):
+            starts[degree] = 0
+        for node in range(size):
+            starts[degrees[node]] += 1
+        first = 0
+        for degree in range(max_degree + 1):
+            first, starts[degree] = first + starts[degree], first
+        order = ExtensibleList(size)
+        positions = ExtensibleList(size)
+        for node in range(size):
+            positions[node] = starts[degrees[node]]
+            order[positions[node]] = node
+            starts[degrees[node]] += 1
+        for degree in range(max_degree, 0, -1):
+            starts[degree] = starts[degree - 1]
+        starts[0] = 0
+
+        # Peel the nodes in order of degree. Removing a node lowers the degree of
+        # each neighbour of higher degree, which moves it to the front of its bucket
+        # and then into the bucket below; degrees left behind are core numbers.
+        for i in range(size):
+            node = order[i]
+            for neighbour in self.get_neighbour_ids(node):
+                degree = degrees[neighbour]
+                if degree > degrees[node]:
+                    position = positions[neighbour]
+                    front = starts[degree]
+                    swapped = order[front]
+                    if swapped != neighbour:
+                        order[position], order[front] = swapped, neighbour
+                        positions[swapped], positions[neighbour] = position, front
+                    starts[degree] += 1
+                    degrees[neighbour] = degree - 1
+        return degrees
+
     def generate_random_node_id(self) -> Optional[int]:
         """
         Return a random node identifier from the graph or None if empty.
@@ -203,6 +631,7 @@ class Graph(Generic[Datum]):
         self._edges = adjacency
         self._weighted = weighted
         self.__check_graph()
+        self.mark_modified()
 
     def to_file(self, path: Path) -> None:
         if type(path) == str:
@@ -221,6 +650,11 @@ class LatticeGraph(Graph[Datum]):
     def __init__(self, nodes: list[LatticeNode[Datum]] = None) -> None:
         self._rows = 0
         self._cols = 0
+        # Maps row * cols + col to the ID of the node at those coordinates
+        self._coordinates = None
+        # Bitmask of connected cells, valid while _cell_mask_version is current
+        self._cell_mask = None
+        self._cell_mask_version = -1
         edges = None
 
         if nodes is not None:
@@ -230,14 +664,99 @@ class LatticeGraph(Graph[Datum]):
             edges = [[adj.get_id() for adj in node.get_adjacent()] for node in nodes]
 
         super().__init__(nodes, edges, weighted=False)
+        for node in self._nodes:
+            node._graph = self
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # Replace the neighbour IDs stored by LatticeNode.__getstate__ with the nodes
+        for node in self._nodes:
+            for side in ("_north", "_east", "_south", "_west"):
+                neighbour = getattr(node, side)
+                if neighbour is not None:
+                    setattr(node, side, self._nodes[neighbour])
 
     def get_dimensions(self) -> tuple[int, int]:
         return self._rows, self._cols
 
+    def get_node_at(self, row: int, col: int) -> Optional[LatticeNode[Datum]]:
+        """
+        Returns the node at the given coordinates, or None if there is none (i.e. the
+        cell is a wall or lies outside the lattice).
+        """
+        if row < 0 or row >= self._rows or col < 0 or col >= self._cols:
+            return None
+        if self._coordinates is None:
+            self._coordinates = ExtensibleList(self._rows * self._cols)
+            for node in self._nodes:
+                r, c = node.get_coordinates()
+                self._coordinates[r * self._cols + c] = node.get_id()
+        index = self._coordinates[row * self._cols + col]
+        return self._nodes[index] if index is not None else None
+
     # LatticeNode specific version of get_neighbours
     def get_neighbours(self, index: int) -> list[LatticeNode[Datum]]:
         return self._nodes[index].get_adjacent()
 
+    # LatticeNode specific version of get_neighbour_ids
+    def get_neighbour_ids(self, index: int) -> list[int]:
+        return [adj.get_id() for adj in self._nodes[index].get_adjacent()]
+
+    def get_cell_mask(self) -> tuple[int, int]:
+        """
+        Returns the lattice as a bitmask along with its row stride: bit
+        row * stride + col is set if the node at (row, col) has any neighbours. The
+        stride is cols + 1, so the last bit of each row is always clear and shifting
+        the mask by one never wraps from one row into the next. Cached until the
+        lattice changes.
+        """
+        if self._cell_mask_version != self._version:
+            stride = self._cols + 1
+            cells = bytearray((self._rows * stride + 7) // 8)
+            for node in self._nodes:
+                if (
+                    node.get_north()
+                    or node.get_east()
+                    or node.get_south()
+                    or node.get_west()
+                ):
+                    row, col = node.get_coordinates()
+                    bit = row * stride + col
+                    cells[bit >> 3] |= 1 << (bit & 7)
+            self._cell_mask = int.from_bytes(cells, "little")
+            self._cell_mask_version = self._version
+        return self._cell_mask, self._cols + 1
+
+    def reconnect(self, index: int) -> None:
+        """
+        Reopen a node closed by LatticeNode.disconnect, linking it to every open node
+        at the adjacent coordinates. Directions follow the from_file convention:
+        north is the next column, east the next row.
+        """
+        node = self._nodes[index]
+        node._closed = False
+        row, col = node.get_coordinates()
+        linked = []
+
+        north = self.get_node_at(row, col + 1)
+        if north is not None and not north.is_closed():
+            node._north, north._south = north, node
+            linked.append(north.get_id())
+        east = self.get_node_at(row + 1, col)
+        if east is not None and not east.is_closed():
+            node._east, east._west = east, node
+            linked.append(east.get_id())
+        south = self.get_node_at(row, col - 1)
+        if south is not None and not south.is_closed():
+            node._south, south._north = south, node
+            linked.append(south.get_id())
+        west = self.get_node_at(row - 1, col)
+        if west is not None and not west.is_closed():
+            node._west, west._east = west, node
+            linked.append(west.get_id())
+
+        self.mark_joined(index, *linked)
+
     def from_file(self, path: str) -> None:
         """
         Load the ASCII lattice graph format.
@@ -303,6 +822,10 @@ class LatticeGraph(Graph[Datum]):
         self._cols = colcount
         self._nodes = sorted(list(node_dict.values()), key=lambda x: x.get_id())
         self._edges = [[x for adj in node.get_adjacent()] for node in self._nodes]
+        for node in self._nodes:
+            node._graph = self
+        self._coordinates = None
+        self.mark_modified()
 
     def to_file(self, path: Path) -> None:
         if type(path) == str:
@@ -315,3 +838,27 @@ class LatticeGraph(Graph[Datum]):
             lattice[i] = "".join(lattice[i])
         with path.open("w") as ofile:
             ofile.write("\n".join(lattice))
+
+
+def stream_edges(path: Path) -> Generator[tuple[int, int, int], None, None]:
+    """
+    Yields (origin, target, weight) for every edge listed in a file in the format of
+    Graph.from_file, reading one line at a time rather than building the graph.
+    Unweighted edges have weight 1.
+    """
+    if type(path) == str:
+        path = Path(path)
+    with path.open("r") as ifile:
+        for line in ifile:
+            chunks = line.strip().split(":")
+            if len(chunks) == 1:
+                continue
+            if len(chunks) > 2:
+                raise ValueError(f"Can not interpret line {line} in file {path}")
+            origin = int(chunks[0].strip())
+            for item in chunks[1].split():
+                parts = item.split(",")
+                if len(parts) == 2:
+                    yield (origin, int(parts[0].strip()), int(parts[1].strip()))
+                else:
+                    yield (origin, int(item.strip()), 1)
@@ -0,0 +1,88 @@
+from typing import Generic, TypeVar
+
+from structures.m_entry import Entry
+from structures.m_extensible_list import ExtensibleList
+
+Datum = TypeVar("Datum")
+
+
+class BinaryHeap(Generic[Datum]):
+    """
+    A priority queue backed by an array-based binary min-heap, with the same
+    insert/get_min/remove_min interface as PriorityQueue. Inserting and removing
+    cost O(log n) rather than the O(n) shifting of PriorityQueue's sorted list,
+    which matters once the queue holds many entries. Entries with equal priorities
+    come out in no particular order. Priorities may be anything comparable, e.g.
+    tuples.
+    """
+
+    def __init__(self) -> None:
+        """
+        Construct the heap.
+        """
+        self._entries: ExtensibleList[Entry] = ExtensibleList()
+
+    def insert(self, priority, data: Datum) -> None:
+        """
+        Insert some data to the queue with a given priority.
+        """
+        entries = self._entries
+        entries.append(Entry(priority, data))
+
+        # Sift the new entry up past every parent with a larger priority
+        index = entries.get_size() - 1
+        entry = entries[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if not priority < entries[parent].get_key():
+                break
+            entries[index] = entries[parent]
+            index = parent
+        entries[index] = entry
+
+    def get_min(self) -> Datum:
+        """
+        Return the highest priority value from the queue, but do not remove it.
+        """
+        return self._entries[0].get_value()
+
+    def get_min_priority(self):
+        """
+        Return the priority of the highest priority value in the queue.
+        """
+        return self._entries[0].get_key()
+
+    def remove_min(self) -> Datum:
+        """
+        Remove and return the highest priority value from the queue.
+        """
+        entries = self._entries
+        top = entries[0]
+        last = entries.remove_at(entries.get_size() - 1)
+        size = entries.get_size()
+        if size == 0:
+            return top.get_value()
+
+        # Sift the last entry down from the root past every smaller child
+        priority = last.get_key()
+        index = 0
+        child = 1
+        while child < size:
+            if (
+                child + 1 < size
+                and entries[child + 1].get_key() < entries[child].get_key()
+            ):
+                child += 1
+            if not entries[child].get_key() < priority:
+                break
+            entries[index] = entries[child]
+            index = child
+            child = 2 * index + 1
+        entries[index] = last
+        return top.get_value()
+
+    def get_size(self) -> int:
+        return self._entries.get_size()
+
+    def is_empty(self) -> bool:
+        return self._entries.is_empty()
@@ -0,0 +1,174 @@
+from typing import Callable, Generic, Optional, TypeVar
+
+from structures.m_double_linked_list import DoubleLinkedList, DoubleNode
+from structures.m_entry import Entry
+from structures.m_map import Map
+
+Key = TypeVar("Key")
+Value = TypeVar("Value")
+
+
+class CacheEntry(Entry[Key, Value]):
+    """
+    An entry which additionally remembers the (estimated) number of bytes its value
+    occupies, so the cache can enforce a byte budget.
+    """
+
+    def __init__(self, key: Key, value: Value, size: int) -> None:
+        super().__init__(key, value)
+        self._size = size
+
+    def get_size(self) -> int:
+        return self._size
+
+
+class LRUCache(Generic[Key, Value]):
+    """
+    A bounded key/value cache which evicts the least recently used entries once the
+    entry budget or the byte budget is exceeded. Keys are located through a Map and
+    recency is tracked with a DoubleLinkedList (most recent at the front), so lookups,
+    insertions and evictions are all O(1) expected: the Map grows with its contents
+    to keep its buckets short.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizer: Optional[Callable[[Value], int]] = None,
+    ) -> None:
+        """
+        @param: max_entries
+            The maximum number of entries to hold, or None for no entry limit.
+        @param: max_bytes
+            The maximum total size of the held values, or None for no byte limit.
+        @param: sizer
+            Estimates the size in bytes of a value; required when max_bytes is set.
+        """
+        if max_bytes is not None and sizer is None:
+            raise ValueError("A sizer is required to enforce a byte budget.")
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sizer = sizer
+        self._index: Map[Key, DoubleNode[CacheEntry[Key, Value]]] = Map()
+        self._recency: DoubleLinkedList[CacheEntry[Key, Value]] = DoubleLinkedList()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def find(self, key: Key, default: Optional[Value] = None) -> Optional[Value]:
+        """
+        Return the value cached under key, marking it as most recently used, or
+        default if it is not cached. Pass a default which is never cached to tell a
+        cached None apart from a miss.
+        """
+        node = self._index.find(key)
+        if node is None:
+            self._misses += 1
+            return default
+        self._hits += 1
+        self._recency.move_to_front(node)
+        return node.get_data().get_value()
+
+    def __getitem__(self, key: Key) -> Optional[Value]:
+        """
+        Alternative for find.
+        """
+        return self.find(key)
+
+    def __contains__(self, key: Key) -> bool:
+        """
+        Whether key is cached. Does not affect recency or the hit/miss counters.
+        """
+        return self._index.find(key) is not None
+
+    def insert_kv(self, key: Key, value: Value) -> None:
+        """
+        Cache value under key as the most recently used entry, then evict least
+        recently used entries until both budgets are respected. A value larger than
+        the whole byte budget is not cached at all.
+        """
+        size = self._sizer(value) if self._sizer is not None else 0
+        self.remove(key)
+        if self._max_bytes is not None and size > self._max_bytes:
+            return
+
+        node = DoubleNode(CacheEntry(key, value, size))
+        self._recency.insert_to_front(node)
+        self._index.insert_kv(key, node)
+        self._bytes += size
+
+        while (
+            self._max_entries is not None
+            and self._recency.get_size() > self._max_entries
+        ) or (self._max_bytes is not None and self._bytes > self._max_bytes):
+            self.__evict()
+
+    def __setitem__(self, key: Key, value: Value) -> None:
+        """
+        Alternative for insert_kv.
+        """
+        self.insert_kv(key, value)
+
+    def __evict(self) -> None:
+        """
+        Drop the least recently used entry.
+        """
+        entry = self._recency.remove_from_back().get_data()
+        self._index.remove(entry.get_key())
+        self._bytes -= entry.get_size()
+        self._evictions += 1
+
+    def remove(self, key: Key) -> None:
+        """
+        Drop the entry cached under key, if any. Not counted as an eviction.
+        """
+        node = self._index.find(key)
+        if node is None:
+            return
+        self._recency.remove_node(node)
+        self._index.remove(key)
+        self._bytes -= node.get_data().get_size()
+
+    def remove_if(self, predicate: Callable[[Key], bool]) -> int:
+        """
+        Drop every entry whose key satisfies predicate and return how many were
+        dropped. Not counted as evictions.
+        """
+        removed = 0
+        cur = self._recency.get_head()
+        while cur is not None:
+            nex = cur.get_next()
+            key = cur.get_data().get_key()
+            if predicate(key):
+                self.remove(key)
+                removed += 1
+            cur = nex
+        return removed
+
+    def clear(self) -> None:
+        """
+        Drop every entry. The counters are left untouched.
+        """
+        self._index = Map()
+        self._recency = DoubleLinkedList()
+        self._bytes = 0
+
+    def get_size(self) -> int:
+        return self._recency.get_size()
+
+    def is_empty(self) -> bool:
+        return self._recency.get_size() == 0
+
+    def get_bytes(self) -> int:
+        return self._bytes
+
+    def get_hits(self) -> int:
+        return self._hits
+
+    def get_misses(self) -> int:
+        return self._misses
+
+    def get_evictions(self) -> int:
+        return self._evictions
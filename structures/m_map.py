@@ -10,7 +10,7 @@ Note that if you opt to not use hashing, then you can simply override the
 get_hash function to return -1 for example.
 """
 
-from typing import Callable, Generic, Optional, TypeVar
+from typing import Generic, Optional, TypeVar
 
 from structures.m_entry import Entry
 from structures.m_single_linked_list import SingleLinkedList, SingleNode
@@ -19,7 +19,10 @@ Key = TypeVar("Key")
 Value = TypeVar("Value")
 
 BUCKET_COUNT: int = 250
-"""Number of buckets in the underlying hash table."""
+"""Initial number of buckets in the underlying hash table."""
+
+MAX_LOAD_FACTOR: float = 1.0
+"""Average number of entries per bucket above which the table is grown."""
 
 
 class Map(Generic[Key, Value]):
@@ -35,7 +38,15 @@ class Map(Generic[Key, Value]):
         self._buckets: list[Optional[SingleLinkedList[Entry[Key, Value]]]] = [
             None
         ] * BUCKET_COUNT
-        self._compression_function: Callable[[int], int] = lambda x: x % BUCKET_COUNT
+        self._bucket_count = BUCKET_COUNT
+        self._size = 0
+
+    def _compression_function(self, x: int) -> int:
+        """
+        Map a hash code to a bucket index. A method rather than a lambda stored on
+        the instance, so that maps (and the graphs holding them) can be pickled.
+        """
+        return x % self._bucket_count
 
     def insert(self, entry: Entry[Key, Value]) -> Optional[Value]:
         """
@@ -57,6 +68,31 @@ class Map(Generic[Key, Value]):
             cur = cur.get_next()
 
         self._buckets[bucket].insert_to_front(SingleNode(entry))
+        self._size += 1
+        if self._size > self._bucket_count * MAX_LOAD_FACTOR:
+            self.__grow()
+
+    def __grow(self) -> None:
+        """
+        Roughly double the number of buckets and redistribute the entries, keeping
+        buckets short so lookups stay constant time however large the map gets.
+        The count stays odd so that hashes sharing a power of two factor still
+        spread out.
+        """
+        old_buckets = self._buckets
+        self._bucket_count = 2 * self._bucket_count + 1
+        self._buckets = [None] * self._bucket_count
+        for old_bucket in old_buckets:
+            if old_bucket is None:
+                continue
+            cur = old_bucket.get_head()
+            while cur is not None:
+                entry = cur.get_data()
+                bucket = self._compression_function(entry.get_hash())
+                if self._buckets[bucket] is None:
+                    self._buckets[bucket] = SingleLinkedList()
+                self._buckets[bucket].insert_to_front(SingleNode(entry))
+                cur = cur.get_next()
 
     def insert_kv(self, key: Key, value: Value) -> Optional[Value]:
         """
@@ -83,6 +119,7 @@ class Map(Generic[Key, Value]):
         dummy_entry = Entry(key, None)
         bucket = self._compression_function(dummy_entry.get_hash())
         self._buckets[bucket].find_and_remove_element(Entry(key, value))
+        self._size -= 1
 
     def find(self, key: Key) -> Optional[Value]:
         """
@@ -112,19 +149,10 @@ class Map(Generic[Key, Value]):
         """
         Returns the number of entries in the map.
         """
-        size = 0
-        for i in range(BUCKET_COUNT):
-            bucket = self._buckets[i]
-            if bucket is not None:
-                size += bucket.get_size()
-        return size
+        return self._size
 
     def is_empty(self) -> bool:
         """
         Returns whether the map contains no entries.
         """
-        for i in range(BUCKET_COUNT):
-            bucket = self._buckets[i]
-            if bucket is not None and bucket.get_size() != 0:
-                return False
-        return True
+        return self._size == 0
@@ -1,10 +1,14 @@
 import argparse
 import curses
+import multiprocessing
 import random
 import sys
 import time
+from array import array
 
 from algorithms.airlines import *
+from algorithms.cores import CoreIndex
+from algorithms.dense import has_numpy
 from structures.m_graph import *
 
 
@@ -58,6 +62,305 @@ def test_field_opt(graph: Graph) -> None:
     print("Found candidates: ", str(candidates))
 
 
+def generate_hub_network(num_nodes: int, num_hubs: int, seed: int) -> Graph:
+    """
+    Build a synthetic airline network: the hubs are all linked to each other with
+    cheap flights, every other airport flies to one or two hubs, and a few airports
+    also have a direct regional flight. Flights go both ways.
+    """
+    rng = random.Random(seed)
+    edges = [[] for _ in range(num_nodes)]
+
+    def link(a: int, b: int, cost: int) -> None:
+        edges[a].append((b, cost))
+        edges[b].append((a, cost))
+
+    for a in range(num_hubs):
+        for b in range(a + 1, num_hubs):
+            link(a, b, rng.randint(50, 150))
+    for node in range(num_hubs, num_nodes):
+        for hub in rng.sample(range(num_hubs), rng.randint(1, min(2, num_hubs))):
+            link(node, hub, rng.randint(80, 400))
+        if rng.random() < 0.1:
+            link(node, rng.randrange(num_hubs, num_nodes), rng.randint(40, 200))
+    return Graph([Node(i) for i in range(num_nodes)], edges)
+
+
+def benchmark_budget_engines(num_nodes: int, seed: int, queries: int = 5) -> None:
+    """
+    Time the label setting and layered engines of calculate_flight_budget on
+    synthetic hub networks, across stopover budgets, checking that they agree, that
+    no destination is over either budget, and that choose_budget_engine picks the
+    faster engine (give or take a quarter, and 0.1ms, of timing noise).
+    """
+    print("==== Benchmarking Budget Engines ====")
+    for num_hubs in (max(1, num_nodes // 200), max(1, num_nodes // 20)):
+        graph = generate_hub_network(num_nodes, num_hubs, seed)
+        rng = random.Random(seed)
+        origins = [rng.randrange(num_nodes) for _ in range(queries)]
+        print(
+            f"nodes = {num_nodes}, hubs = {num_hubs}, "
+            f"average degree = {graph.get_num_edges() / num_nodes:.2f}"
+        )
+        for stopovers in range(0, 6):
+            timings = {}
+            results = {}
+            for engine in ("labels", "layered"):
+                start = time.perf_counter()
+                found = [
+                    calculate_flight_budget(graph, o, stopovers, 2000, None, engine)
+                    for o in origins
+                ]
+                timings[engine] = (time.perf_counter() - start) / queries
+                for destinations in found:
+                    for i in range(destinations.get_size()):
+                        destination = destinations[i]
+                        assert destination.get_cost_money() <= 2000, destination
+                        assert destination.get_cost_stopover() <= stopovers, destination
+                results[engine] = [str(destinations) for destinations in found]
+            picked = choose_budget_engine(graph, stopovers)
+            print(
+                f"  B_s = {stopovers}: labels {timings['labels'] * 1000:8.2f} ms, "
+                f"layered {timings['layered'] * 1000:8.2f} ms, "
+                f"auto picks {picked}, "
+                f"agree = {results['labels'] == results['layered']}"
+            )
+            assert results["labels"] == results["layered"], stopovers
+            other = "layered" if picked == "labels" else "labels"
+            assert (
+                timings[picked] <= timings[other] * 1.25 + 0.0001
+            ), f"B_s = {stopovers}: auto picks {picked}, but {other} is faster"
+
+
+def check_core_index(num_nodes: int, updates: int, seed: int) -> None:
+    """
+    Apply random edge insertions, edge deletions and node additions through a
+    CoreIndex, checking after each one that its core numbers and hubs match a
+    fresh Graph.get_core_numbers.
+    """
+    print("==== Checking the Core Index ====")
+    rng = random.Random(seed)
+    graph = Graph([Node(i) for i in range(num_nodes)], [[] for _ in range(num_nodes)])
+    index = CoreIndex(graph)
+    edges = []
+    for update in range(updates):
+        roll = rng.random()
+        if roll < 0.02:
+            index.add_node()
+        elif roll < 0.6 or not edges:
+            origin = rng.randrange(graph.get_num_nodes())
+            target = rng.randrange(graph.get_num_nodes())
+            index.add_edge(origin, target)
+            edges.append((origin, target))
+        else:
+            origin, target = edges.pop(rng.randrange(len(edges)))
+            assert index.remove_edge(target, origin), (update, origin, target)
+
+        expected = graph.get_core_numbers()
+        for node in range(graph.get_num_nodes()):
+            assert index.get_core_number(node) == expected[node], (
+                f"Update {update}: node {node} has core number "
+                f"{index.get_core_number(node)}, expected {expected[node]}"
+            )
+        min_degree = rng.randint(0, 6)
+        hubs = index.get_hubs(min_degree)
+        hubs = sorted(hubs[i] for i in range(hubs.get_size()))
+        expected = enumerate_hubs(graph, min_degree)
+        assert hubs == [expected[i] for i in range(expected.get_size())], update
+    print("Core numbers matched after", updates, "updates")
+
+
+def generate_negative_graph(num_nodes: int, rng: random.Random) -> Graph:
+    """
+    Build a small random directed graph with negative weights. Half the graphs
+    shift non-negative weights by node potentials, which can not form a negative
+    cycle; the others lower a few weights outright, which often does.
+    """
+    edges = [[] for _ in range(num_nodes)]
+    potentials = [rng.randint(0, 30) for _ in range(num_nodes)]
+    shifted = rng.random() < 0.5
+    for _ in range(rng.randint(0, num_nodes * 3)):
+        origin, target = rng.randrange(num_nodes), rng.randrange(num_nodes)
+        weight = rng.randint(0, 15)
+        if shifted:
+            weight += potentials[origin] - potentials[target]
+        elif rng.random() < 0.3:
+            weight -= rng.randint(1, 20)
+        edges[origin].append((target, weight))
+    return Graph([Node(i) for i in range(num_nodes)], edges)
+
+
+def bellman_ford(graph: Graph, origin: int) -> list:
+    """
+    Textbook Bellman-Ford: V rounds relaxing every edge, then every node still
+    relaxable, and everything reachable from one, is marked
+    TraversalFailure.NEGATIVE_CYCLE. Unreachable nodes get sys.maxsize.
+    """
+    graph_size = graph.get_num_nodes()
+    distances = [None] * graph_size
+    distances[origin] = 0
+    for _ in range(graph_size):
+        for source, target, weight in graph.iter_edges():
+            if distances[source] is not None and (
+                distances[target] is None
+                or distances[source] + weight < distances[target]
+            ):
+                distances[target] = distances[source] + weight
+
+    unbounded = [False] * graph_size
+    stack = []
+    for source, target, weight in graph.iter_edges():
+        relaxable = distances[source] is not None and (
+            distances[source] + weight < distances[target]
+        )
+        if relaxable and not unbounded[target]:
+            unbounded[target] = True
+            stack.append(target)
+    while stack:
+        for neighbour in graph.get_neighbour_ids(stack.pop()):
+            if not unbounded[neighbour]:
+                unbounded[neighbour] = True
+                stack.append(neighbour)
+
+    for node in range(graph_size):
+        if unbounded[node]:
+            distances[node] = TraversalFailure.NEGATIVE_CYCLE
+        elif distances[node] is None:
+            distances[node] = sys.maxsize
+    return distances
+
+
+def check_spfa(trials: int, seed: int) -> None:
+    """
+    Compare spfa_distances against bellman_ford on random small graphs with
+    negative weights, including negative cycles.
+    """
+    print("==== Checking SPFA against Bellman-Ford ====")
+    rng = random.Random(seed)
+    cyclic = 0
+    for trial in range(trials):
+        graph = generate_negative_graph(rng.randint(1, 14), rng)
+        origin = rng.randrange(graph.get_num_nodes())
+        expected = bellman_ford(graph, origin)
+        found = spfa_distances(graph, origin)
+        found = [found[i].get_value() for i in range(found.get_size())]
+        assert found == expected, f"Trial {trial}: {found} vs {expected}"
+        cyclic += TraversalFailure.NEGATIVE_CYCLE in expected
+    print("SPFA matched on", trials, "graphs,", cyclic, "with negative cycles")
+
+
+def check_johnson(trials: int, seed: int) -> None:
+    """
+    Compare all_city_logistics with one bellman_ford per origin on random small
+    graphs with negative weights, then again after adding an edge so that the
+    reweighting cached on the graph has to be rebuilt. Also check that the
+    reweighting finds exactly the nodes whose strong component has a negative
+    cycle: those reachable from themselves through one.
+    """
+    print("==== Checking Johnson's Algorithm against Bellman-Ford ====")
+    rng = random.Random(seed)
+    cyclic = 0
+    for trial in range(trials):
+        graph = generate_negative_graph(rng.randint(1, 12), rng)
+        for update in range(2):
+            if update == 1:
+                graph.add_edge(
+                    rng.randrange(graph.get_num_nodes()),
+                    rng.randrange(graph.get_num_nodes()),
+                    rng.randint(-10, 10),
+                )
+            costs = all_city_logistics(graph, engine="sssp")
+            on_cycle = 0
+            for origin in range(graph.get_num_nodes()):
+                expected = bellman_ford(graph, origin)
+                on_cycle += expected[origin] == TraversalFailure.NEGATIVE_CYCLE
+                for target in range(graph.get_num_nodes()):
+                    cost = expected[target]
+                    if cost == sys.maxsize:
+                        cost = TraversalFailure.DISCONNECTED
+                    found = costs.find(f"{origin}_{target}")
+                    assert found == cost, (
+                        f"Trial {trial}: {origin} to {target} costs {found}, "
+                        f"expected {cost}"
+                    )
+            if graph.has_negative_weights():
+                reweighting = get_reweighting(graph)
+                assert reweighting.get_num_cyclic() == on_cycle, trial
+            cyclic += on_cycle > 0
+    print("Johnson matched on", trials * 2, "graphs,", cyclic, "with negative cycles")
+
+
+def check_all_city_workers(trials: int, seed: int) -> None:
+    """
+    Compare all_city_logistics spread over two worker processes with a single
+    process on random graphs with negative weights, large enough to be split into
+    several tasks, under each available start method. The cached reweighting has
+    to reach the workers with the graph.
+    """
+    print("==== Checking All City Logistics across worker processes ====")
+    rng = random.Random(seed)
+    graphs = [generate_negative_graph(rng.randint(20, 40), rng) for _ in range(trials)]
+    expected = [all_city_logistics(graph, workers=1) for graph in graphs]
+    for method in ("fork", "spawn"):
+        if method not in multiprocessing.get_all_start_methods():
+            print(method, "is not available: skipped")
+            continue
+        for trial in range(trials):
+            graph = graphs[trial]
+            costs = all_city_logistics(graph, workers=2, start_method=method)
+            for origin in range(graph.get_num_nodes()):
+                for target in range(graph.get_num_nodes()):
+                    key = f"{origin}_{target}"
+                    assert costs.find(key) == expected[trial].find(key), (
+                        f"{method}, trial {trial}: {key} costs {costs.find(key)}, "
+                        f"expected {expected[trial].find(key)}"
+                    )
+        print(method, "workers matched a single process on", trials, "graphs")
+
+
+def check_lazy_costs(trials: int, seed: int) -> None:
+    """
+    Look up random pairs, in random order, in a LazyCostMap with room for only a
+    few rows, and compare them with the eager map of all_city_logistics on random
+    graphs with negative weights. Then add an edge, which must drop the held rows,
+    and compare again. Keys naming no pair must give None.
+    """
+    print("==== Checking the Lazy Cost Map against the eager one ====")
+    rng = random.Random(seed)
+    hits = evictions = 0
+    for trial in range(trials):
+        graph = generate_negative_graph(rng.randint(1, 20), rng)
+        size = graph.get_num_nodes()
+        # Room for three rows, so that rows are evicted and recomputed
+        lazy = LazyCostMap(graph, 3 * sys.getsizeof(array("q", bytes(8 * size))))
+        for update in range(2):
+            if update == 1:
+                graph.add_edge(
+                    rng.randrange(size), rng.randrange(size), rng.randint(-5, 15)
+                )
+            eager = all_city_logistics(graph, workers=1)
+            for _ in range(4 * size * size):
+                key = f"{rng.randrange(size)}_{rng.randrange(size)}"
+                assert lazy.find(key) == eager.find(key), (
+                    f"Trial {trial}: {key} costs {lazy.find(key)}, "
+                    f"expected {eager.find(key)}"
+                )
+            assert lazy.get_num_rows() <= 3, trial
+        for key in (f"{size}_0", f"0_{size}", "0-0", "a_0", 0):
+            assert lazy.find(key) is None, f"Trial {trial}: {key} names a pair"
+        hits += lazy.get_hits()
+        evictions += lazy.get_evictions()
+    print(
+        "Lazy costs matched on",
+        trials * 2,
+        "graphs, with",
+        hits,
+        "row hits and",
+        evictions,
+        "evictions",
+    )
+
+
 def test_all_city(graph: Graph) -> None:
     """
     A simple execution of the all city logistics task.
@@ -80,6 +383,30 @@ def test_all_city(graph: Graph) -> None:
         print("Cost from ", node_a, " to ", node_b, " with key ", key, " is = ", cost)
 
 
+def compare_all_city_engines(graph: Graph) -> None:
+    """
+    Time each all_city_logistics engine on graph and check that they produce the
+    same map. Skipped if numpy, which the Floyd-Warshall engine needs, is missing.
+    """
+    print("==== Comparing All City Engines ====")
+    if not has_numpy():
+        print("numpy is not installed: skipping the Floyd-Warshall comparison")
+        return
+    maps = {}
+    for engine in ("sssp", "floyd_warshall"):
+        start = time.perf_counter()
+        maps[engine] = all_city_logistics(graph, engine=engine)
+        print(f"{engine}: {time.perf_counter() - start:.3f} s")
+    for origin in range(graph.get_num_nodes()):
+        for target in range(graph.get_num_nodes()):
+            key = f"{origin}_{target}"
+            assert maps["sssp"].find(key) == maps["floyd_warshall"].find(key), (
+                f"{key}: sssp found {maps['sssp'].find(key)}, floyd_warshall "
+                f"found {maps['floyd_warshall'].find(key)}"
+            )
+    print("Engines agree on all", graph.get_num_nodes() ** 2, "pairs")
+
+
 # The actual program we're running here
 if __name__ == "__main__":
     # Get and parse the command line arguments
@@ -87,9 +414,7 @@ if __name__ == "__main__":
         description="COMP3506/7505 Assignment Two: Bogan Airlines"
     )
 
-    parser.add_argument(
-        "--graph", type=str, required=True, help="Path to input graph file"
-    )
+    parser.add_argument("--graph", type=str, help="Path to input graph file")
     parser.add_argument(
         "--cycle-detect", action="store_true", help="Run cycle detection"
     )
@@ -103,6 +428,39 @@ if __name__ == "__main__":
     parser.add_argument(
         "--all-city", action="store_true", help="Run the all city logistics"
     )
+    parser.add_argument(
+        "--budget-benchmark",
+        type=int,
+        help="Benchmark the BBBB engines on synthetic hub networks of this many nodes",
+    )
+    parser.add_argument(
+        "--cores",
+        type=int,
+        help="Check the core index against Graph.get_core_numbers over this many "
+        "random updates",
+    )
+    parser.add_argument(
+        "--spfa-check",
+        type=int,
+        help="Check SPFA against Bellman-Ford on this many random graphs",
+    )
+    parser.add_argument(
+        "--johnson-check",
+        type=int,
+        help="Check all pairs costs against Bellman-Ford on this many random graphs",
+    )
+    parser.add_argument(
+        "--all-city-workers",
+        type=int,
+        help="Check all city logistics on two worker processes, under fork and "
+        "spawn, against one process on this many random graphs",
+    )
+    parser.add_argument(
+        "--lazy-check",
+        type=int,
+        help="Check the lazy all pairs cost map against the eager one on this many "
+        "random graphs",
+    )
     parser.add_argument("--seed", type=int, required=True, help="Seed the PRNG")
 
     args = parser.parse_args()
@@ -116,6 +474,29 @@ if __name__ == "__main__":
     # graph
     random.seed(args.seed)
 
+    # The benchmark and checks build their own graphs
+    if args.budget_benchmark:
+        benchmark_budget_engines(args.budget_benchmark, args.seed)
+        sys.exit(0)
+    if args.cores:
+        check_core_index(50, args.cores, args.seed)
+        sys.exit(0)
+    if args.spfa_check:
+        check_spfa(args.spfa_check, args.seed)
+        sys.exit(0)
+    if args.johnson_check:
+        check_johnson(args.johnson_check, args.seed)
+        sys.exit(0)
+    if args.all_city_workers:
+        check_all_city_workers(args.all_city_workers, args.seed)
+        sys.exit(0)
+    if args.lazy_check:
+        check_lazy_costs(args.lazy_check, args.seed)
+        sys.exit(0)
+    if args.graph is None:
+        print("Error: --graph is required.")
+        sys.exit(-1)
+
     # Load the graph
     my_graph = None
     my_graph = Graph()
@@ -144,3 +525,4 @@ if __name__ == "__main__":
 
     elif args.all_city:
         test_all_city(my_graph)
+        compare_all_city_engines(my_graph)
@@ -1,9 +1,17 @@
 import argparse
 import curses
+import multiprocessing
+import os
 import random
 import sys
+import tempfile
 import time
 
+from algorithms.flow_field import FlowField
+from algorithms.incremental import DStarLitePlanner
+from algorithms.long_path import long_path_traversal
+from algorithms.parallel import run_batch
+from algorithms.reduction import ReducedLattice
 from algorithms.pathfinding import *
 from structures.m_graph import *
 
@@ -178,6 +186,260 @@ class MazeDraw:
         curses.endwin()
 
 
+def check_replanning(graph: LatticeGraph, origin: int, goal: int, changes: int) -> None:
+    """
+    Disconnect and reconnect random cells, checking after each change that the D*
+    Lite plan is as long as a fresh breadth first search path.
+    """
+    planner = DStarLitePlanner(graph, origin, goal)
+    closed = []
+    for change in range(changes):
+        if closed and random.random() < 0.3:
+            graph.reconnect(closed.pop(random.randrange(len(closed))))
+        else:
+            cell = graph.generate_random_node_id()
+            if cell not in (origin, goal) and not graph.get_node(cell).is_closed():
+                graph.get_node(cell).disconnect()
+                closed.append(cell)
+
+        planned = planner.plan()
+        expected, _ = bfs_traversal(graph, origin, goal, record_visits=False)
+        if isinstance(expected, TraversalFailure) or isinstance(
+            planned, TraversalFailure
+        ):
+            assert planned == expected, f"Change {change}: {planned} vs {expected}"
+        else:
+            assert planned.get_size() == expected.get_size(), (
+                f"Change {change}: planned {planned.get_size()} cells, "
+                f"BFS found {expected.get_size()}"
+            )
+    print("Replanning matched BFS for", changes, "changes")
+
+
+def check_batch(graph: LatticeGraph, queries: int) -> None:
+    """
+    Run random bit-parallel BFS queries through run_batch on two workers, under
+    each available start method, and check that every result matches running the
+    same query in this process.
+    """
+    pairs = []
+    for _ in range(queries):
+        pairs.append(
+            (graph.generate_random_node_id(), graph.generate_random_node_id(), False)
+        )
+
+    def describe(result):
+        path, _ = result
+        if isinstance(path, TraversalFailure):
+            return path
+        return [path[i] for i in range(path.get_size())]
+
+    expected = [describe(bitset_bfs_traversal(graph, *args)) for args in pairs]
+    for method in ("fork", "spawn"):
+        if method not in multiprocessing.get_all_start_methods():
+            print(method, "is not available: skipped")
+            continue
+        # Small chunks, so that the queries are spread over the pool
+        results = run_batch(
+            graph, bitset_bfs_traversal, pairs, 2, chunk_size=4, start_method=method
+        )
+        assert results.get_size() == queries
+        for i in range(queries):
+            assert describe(results[i]) == expected[i], (
+                f"{method}: query {pairs[i][:2]} found {describe(results[i])}, "
+                f"expected {expected[i]}"
+            )
+        print(method, "batch matched serial results on", queries, "queries")
+
+
+def bfs_distances(graph: LatticeGraph, origin: int) -> list:
+    """
+    Textbook breadth first search: the number of steps from origin to every node,
+    indexed by node ID, with None for nodes which can not be reached.
+    """
+    distances = [None] * graph.get_num_nodes()
+    distances[origin] = 0
+    queue = [origin]
+    for node in queue:
+        for neighbour in graph.get_node(node).get_adjacent():
+            if distances[neighbour.get_id()] is None:
+                distances[neighbour.get_id()] = distances[node] + 1
+                queue.append(neighbour.get_id())
+    return distances
+
+
+def assert_path(
+    graph: LatticeGraph, path: ExtensibleList, origin: int, goal: int
+) -> None:
+    """
+    Check that path runs from origin to goal through adjacent cells.
+    """
+    assert path[0] == origin, f"Path starts at {path[0]}, not {origin}"
+    assert path[path.get_size() - 1] == goal, f"Path does not end at {goal}"
+    for i in range(1, path.get_size()):
+        adjacent = [adj.get_id() for adj in graph.get_node(path[i - 1]).get_adjacent()]
+        assert path[i] in adjacent, f"Path steps from {path[i - 1]} to {path[i]}"
+
+
+def check_nearest_goals(graph: LatticeGraph, queries: int) -> None:
+    """
+    Run nearest_goals_traversal from random origins to random goal sets, closing a
+    random cell now and then, and check the goals it finds against a breadth first
+    search: as many as can be reached up to k, at the k smallest distances, with
+    shortest paths.
+    """
+    for query in range(queries):
+        if random.random() < 0.3:
+            graph.get_node(graph.generate_random_node_id()).disconnect()
+        origin = graph.generate_random_node_id()
+        goals = [graph.generate_random_node_id() for _ in range(random.randint(1, 8))]
+        k = random.randint(1, 4)
+        distances = bfs_distances(graph, origin)
+        reachable = sorted(
+            distances[goal] for goal in set(goals) if distances[goal] is not None
+        )
+
+        found, _ = nearest_goals_traversal(graph, origin, goals, k, False)
+        if not reachable:
+            assert found == TraversalFailure.DISCONNECTED, f"Query {query}: {found}"
+            continue
+        assert found.get_size() == min(k, len(reachable)), f"Query {query}: {found}"
+        for i in range(found.get_size()):
+            goal, path = found[i].get_key(), found[i].get_value()
+            assert goal in goals, f"Query {query}: {goal} is not a goal"
+            assert_path(graph, path, origin, goal)
+            assert path.get_size() - 1 == reachable[i], (
+                f"Query {query}: goal {i} found {path.get_size() - 1} steps away, "
+                f"expected {reachable[i]}"
+            )
+    print("Nearest goals matched BFS on", queries, "queries")
+
+
+def check_flow_field(graph: LatticeGraph, changes: int) -> None:
+    """
+    Build a FlowField towards random goals, then close a random cell repeatedly.
+    Before the first change and after each one, check that the field went stale,
+    that its distances match a breadth first search from every goal and that its
+    paths follow them, and that writing it with to_file and loading it with
+    from_file gives back the same field.
+    """
+    goals = [graph.generate_random_node_id() for _ in range(random.randint(1, 4))]
+    field = FlowField(graph, goals)
+    handle, path = tempfile.mkstemp(suffix=".txt")
+    os.close(handle)
+    try:
+        for change in range(changes + 1):
+            if change > 0:
+                graph.get_node(graph.generate_random_node_id()).disconnect()
+                assert not field.is_valid(), f"Change {change}: field not stale"
+
+            from_goals = [bfs_distances(graph, goal) for goal in goals]
+            for node in range(graph.get_num_nodes()):
+                reached = [d[node] for d in from_goals if d[node] is not None]
+                expected = min(reached) if reached else None
+                assert field.get_distance(node) == expected, (
+                    f"Change {change}: node {node} is {field.get_distance(node)} "
+                    f"steps from a goal, expected {expected}"
+                )
+            origin = graph.generate_random_node_id()
+            found = field.path_from(origin)
+            if field.get_distance(origin) is None:
+                assert found == TraversalFailure.DISCONNECTED, f"Change {change}"
+            else:
+                goal = found[found.get_size() - 1]
+                assert goal in goals, f"Change {change}: {goal} is not a goal"
+                assert_path(graph, found, origin, goal)
+                assert found.get_size() - 1 == field.get_distance(origin)
+
+            field.to_file(path)
+            loaded = FlowField.from_file(graph, path)
+            assert loaded.is_valid()
+            loaded_goals = loaded.get_goals()
+            assert [loaded_goals[i] for i in range(loaded_goals.get_size())] == goals
+            for node in range(graph.get_num_nodes()):
+                assert loaded.get_distance(node) == field.get_distance(node)
+                assert loaded.get_direction(node) == field.get_direction(node)
+    finally:
+        os.remove(path)
+    print("Flow field matched BFS over", changes, "changes")
+
+
+def check_bitset_bfs(graph: LatticeGraph, queries: int) -> None:
+    """
+    Run bitset_bfs_traversal between random cells, closing and reopening random
+    cells in between so that the cell mask has to follow, and check it against a
+    breadth first search: a shortest path when there is one, and the visited cells
+    being exactly those no further away than the goal, nearest first.
+    """
+    closed = []
+    for query in range(queries):
+        if closed and random.random() < 0.2:
+            graph.reconnect(closed.pop(random.randrange(len(closed))))
+        elif random.random() < 0.3:
+            cell = graph.generate_random_node_id()
+            graph.get_node(cell).disconnect()
+            closed.append(cell)
+        origin = graph.generate_random_node_id()
+        goal = graph.generate_random_node_id()
+        distances = bfs_distances(graph, origin)
+
+        found, visited = bitset_bfs_traversal(graph, origin, goal)
+        if distances[goal] is None:
+            assert found == TraversalFailure.DISCONNECTED, f"Query {query}: {found}"
+        else:
+            assert_path(graph, found, origin, goal)
+            assert found.get_size() - 1 == distances[goal], (
+                f"Query {query}: path of {found.get_size() - 1} steps, BFS found "
+                f"{distances[goal]}"
+            )
+        if visited is None or visited.is_empty():
+            # Pruned up front by the component forest
+            assert distances[goal] is None, f"Query {query}: nothing visited"
+            continue
+        limit = distances[goal] if distances[goal] is not None else len(distances)
+        expected = [d for d in distances if d is not None and d <= limit]
+        order = [distances[visited[i]] for i in range(visited.get_size())]
+        assert sorted(order) == order == sorted(expected), f"Query {query}"
+    print("Bit-parallel BFS matched BFS on", queries, "queries")
+
+
+def check_reduced_lattice(graph: LatticeGraph, queries: int) -> None:
+    """
+    Reduce the lattice around random origin and goal cells and check the paths
+    ReducedLattice.find_path expands against a breadth first search, then close a
+    random cell and check again with the same reduction, which has to be rebuilt.
+    """
+    ratios = 0.0
+    for query in range(queries):
+        origin = graph.generate_random_node_id()
+        goal = graph.generate_random_node_id()
+        reduction = ReducedLattice(graph, (origin, goal))
+        ratios += reduction.get_reduction_ratio()
+        for attempt in range(2):
+            if attempt == 1:
+                cell = graph.generate_random_node_id()
+                if cell in (origin, goal):
+                    continue
+                graph.get_node(cell).disconnect()
+                assert not reduction.is_valid(), f"Query {query}: not stale"
+            distance = bfs_distances(graph, origin)[goal]
+            found = reduction.find_path(origin, goal)
+            if distance is None:
+                assert found == TraversalFailure.DISCONNECTED, f"Query {query}"
+                continue
+            assert_path(graph, found, origin, goal)
+            assert found.get_size() - 1 == distance, (
+                f"Query {query}: path of {found.get_size() - 1} steps, BFS found "
+                f"{distance}"
+            )
+    print(
+        "Reduced lattice paths matched BFS on",
+        queries,
+        "queries, average reduction ratio",
+        round(ratios / max(queries, 1), 3),
+    )
+
+
 # The actual program we're running here
 if __name__ == "__main__":
     # Get and parse the command line arguments
@@ -194,6 +456,39 @@ if __name__ == "__main__":
     parser.add_argument(
         "--maximum", action="store_true", help="Run maximum traversal search"
     )
+    parser.add_argument(
+        "--long", action="store_true", help="Run long simple path search"
+    )
+    parser.add_argument(
+        "--replan",
+        type=int,
+        help="Check D* Lite against BFS over this many random cell changes",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        help="Check run_batch against serial results on this many random queries",
+    )
+    parser.add_argument(
+        "--nearest",
+        type=int,
+        help="Check nearest goals search against BFS on this many random queries",
+    )
+    parser.add_argument(
+        "--flow",
+        type=int,
+        help="Check a flow field against BFS over this many random cell changes",
+    )
+    parser.add_argument(
+        "--bitset",
+        type=int,
+        help="Check bit-parallel BFS against BFS on this many random queries",
+    )
+    parser.add_argument(
+        "--reduce",
+        type=int,
+        help="Check reduced lattice paths against BFS on this many random queries",
+    )
     parser.add_argument(
         "--viz",
         action="store_true",
@@ -212,12 +507,50 @@ if __name__ == "__main__":
     # graph to represent the origin/goal nodes
     random.seed(args.seed)
 
+    if args.replan is not None:
+        my_graph = LatticeGraph()
+        my_graph.from_file(args.graph)
+        origin = my_graph.generate_random_node_id()
+        goal = my_graph.generate_random_node_id()
+        check_replanning(my_graph, origin, goal, args.replan)
+        sys.exit(0)
+
+    if args.batch is not None:
+        my_graph = LatticeGraph()
+        my_graph.from_file(args.graph)
+        check_batch(my_graph, args.batch)
+        sys.exit(0)
+
+    if args.nearest is not None:
+        my_graph = LatticeGraph()
+        my_graph.from_file(args.graph)
+        check_nearest_goals(my_graph, args.nearest)
+        sys.exit(0)
+
+    if args.flow is not None:
+        my_graph = LatticeGraph()
+        my_graph.from_file(args.graph)
+        check_flow_field(my_graph, args.flow)
+        sys.exit(0)
+
+    if args.bitset is not None:
+        my_graph = LatticeGraph()
+        my_graph.from_file(args.graph)
+        check_bitset_bfs(my_graph, args.bitset)
+        sys.exit(0)
+
+    if args.reduce is not None:
+        my_graph = LatticeGraph()
+        my_graph.from_file(args.graph)
+        check_reduced_lattice(my_graph, args.reduce)
+        sys.exit(0)
+
     # Check that we're not trying to do more than one algorithm at a time...
-    exclusion = sum([args.maximum, args.greedy, args.dfs, args.bfs])
+    exclusion = sum([args.maximum, args.greedy, args.dfs, args.bfs, args.long])
     if exclusion != 1:
         print(
             "Error: Program expects one type of traversal. Please \
-        try again with one of {--dfs, --bfs, --greedy, --maximum} only."
+        try again with one of {--dfs, --bfs, --greedy, --maximum, --long} only."
         )
         sys.exit(-1)
 
@@ -239,6 +572,8 @@ if __name__ == "__main__":
             path, visited = greedy_traversal(my_graph, origin, goal)
         elif args.maximum:
             path, visited = max_traversal(my_graph, origin, goal)
+        elif args.long:
+            path, visited = long_path_traversal(my_graph, origin, goal)
 
         # Run the viz!
         maze.run_viz(path, visited)
@@ -287,6 +622,18 @@ if __name__ == "__main__":
                 print("Cannot run MaxTraversal on anything other than LatticeGraph.")
                 sys.exit(-1)
             path, visited = max_traversal(my_graph, origin, goal)
+        elif args.long:
+            if not isinstance(my_graph, LatticeGraph):
+                print("Cannot run LongPath on anything other than LatticeGraph.")
+                sys.exit(-1)
+            path, visited = long_path_traversal(my_graph, origin, goal)
+            if path != TraversalFailure.DISCONNECTED:
+                print(
+                    "Path length: ",
+                    path.get_size(),
+                    " Visited by DFS: ",
+                    visited.get_size(),
+                )
 
         print("===Traversal Complete===")
         print("Origin: ", str(origin))
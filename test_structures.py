@@ -1,10 +1,12 @@
 import argparse
+import pickle
 import random
 import sys
 import time
 
 from structures.m_entry import *
 from structures.m_extensible_list import ExtensibleList
+from structures.m_lru_cache import LRUCache
 from structures.m_map import Map
 from structures.m_pqueue import PriorityQueue
 from structures.m_single_linked_list import SingleLinkedList, SingleNode
@@ -42,6 +44,24 @@ def test_map() -> None:
     my_map.insert_kv(2, "Barry rules")
     my_map[3] = "value_for_key_3"
     assert my_map.get_size() == 4
+
+    # Enough entries to make the table grow several times
+    for key in range(100, 5100):
+        my_map.insert_kv(key, str(key))
+    assert my_map.get_size() == 5004
+    for key in range(100, 5100):
+        assert my_map.find(key) == str(key)
+    assert my_map.find(10) == "value_for_key_10"
+    for key in range(100, 5100, 2):
+        my_map.remove(key)
+    assert my_map.get_size() == 2504
+    assert my_map.find(100) is None
+    assert my_map.find(101) == "101"
+
+    # Worker processes receive maps (inside graphs) by pickling
+    copied = pickle.loads(pickle.dumps(my_map))
+    assert copied.get_size() == 2504
+    assert copied.find(101) == "101"
     ###
     # DO RIGOROUS TESTING HERE!
     ###
@@ -67,6 +87,32 @@ def test_sort() -> None:
     ###
 
 
+def test_lru_cache() -> None:
+    """
+    A simple set of tests for the LRU cache.
+    """
+    print("==== Executing LRU Cache Tests ====")
+    my_cache = LRUCache(max_entries=2)
+    my_cache.insert_kv(1, "one")
+    my_cache.insert_kv((2, "two"), "two")
+    assert my_cache.find(1) == "one"
+    my_cache.insert_kv("three", "three")
+    # (2, "two") was the least recently used entry
+    assert my_cache.find((2, "two")) is None
+    assert my_cache.find("three") == "three"
+    assert my_cache.get_size() == 2
+    assert my_cache.get_hits() == 2
+    assert my_cache.get_misses() == 1
+    assert my_cache.get_evictions() == 1
+
+    sized_cache = LRUCache(max_bytes=10, sizer=len)
+    sized_cache.insert_kv(1, "aaaa")
+    sized_cache.insert_kv(2, "bbbbbb")
+    sized_cache.insert_kv(3, "cc")
+    assert sized_cache.find(1) is None
+    assert sized_cache.get_bytes() == 8
+
+
 # The actual program we're running here
 if __name__ == "__main__":
     # Get and parse the command line arguments
@@ -77,7 +123,8 @@ if __name__ == "__main__":
     parser.add_argument("--pq", action="store_true", help="Run priority queue tests?")
     parser.add_argument("--map", action="store_true", help="Run map tests?")
     parser.add_argument("--sort", action="store_true", help="Run sort tests?")
-    parser.set_defaults(pq=False, map=False)
+    parser.add_argument("--lru", action="store_true", help="Run LRU cache tests?")
+    parser.set_defaults(pq=False, map=False, lru=False)
 
     args = parser.parse_args()
 
@@ -93,3 +140,5 @@ if __name__ == "__main__":
         test_map()
     if args.sort:
         test_sort()
+    if args.lru:
+        test_lru_cache()